@@ -0,0 +1,171 @@
+"""
+イベントループを止めずに run を実行する。
+
+PaperGeneratorInterface.run_async から使う。run はスレッドまたはプロセスの executor で実行し、
+同時に実行する数を max_concurrency に制限する。待っている数、実行中の数などは metrics で参照できる。
+
+    renderer = AsyncRenderer(max_concurrency=4, executor='process')
+    await pg.run_async('paper.pdf', renderer, timeout=30)
+    print(renderer.metrics())
+
+タイムアウトや取り消しの時点で実行中の run は途中で止められないため、終わるまで枠を使い続ける。
+まだ executor で始まっていない run は取り消される。
+プロセスの executor では生成器を pickle して渡すため、計測やキャッシュの統計は呼び出し元に反映されない。
+出力先がファイルオブジェクトやソケットの場合は、ワーカーが返した PDF を呼び出し元のプロセスで書き込む。
+"""
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+import asyncio
+import time
+import weakref
+
+import output_sink
+
+
+def _run_generator(generator, path):
+    return generator.run(path)
+
+
+def _render_bytes(generator):
+    # memoryview は pickle できない
+    return bytes(generator.run(None))
+
+
+def _write_target(target, data: bytes):
+    with output_sink.open_binary(target) as output:
+        output.write(data)
+
+
+class AsyncRenderer:
+    def __init__(self, max_concurrency: int = 4, executor='thread', max_workers: int = None):
+        """
+        max_concurrency: 同時に実行する run の数の上限
+        executor: 'thread'、'process' または concurrent.futures.Executor
+        max_workers: executor を作る場合のワーカー数。省略時は max_concurrency
+        """
+        self.max_concurrency = max_concurrency
+        if isinstance(executor, Executor):
+            self._executor = executor
+            self._owns_executor = False
+        elif executor == 'thread':
+            self._executor = ThreadPoolExecutor(max_workers or max_concurrency, thread_name_prefix='paper-render')
+            self._owns_executor = True
+        elif executor == 'process':
+            self._executor = ProcessPoolExecutor(max_workers or max_concurrency)
+            self._owns_executor = True
+        else:
+            raise ValueError(f'{executor} is not a kind of executor.')
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.queued = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.timed_out = 0
+        self.busy_seconds = 0.0
+
+    async def run(self, generator, path, timeout: float = None):
+        """
+        generator.run(path) を executor で実行し、その戻り値を返す。
+        timeout: 待ち時間を含めた秒数。超えた場合は asyncio.TimeoutError
+        """
+        try:
+            if timeout is None:
+                return await self._run(generator, path)
+            return await asyncio.wait_for(self._run(generator, path), timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+
+    async def _run(self, generator, path):
+        self.queued += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queued -= 1
+
+        self.in_flight += 1
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        # ファイルオブジェクトやソケットは他のプロセスに渡せないため、
+        # スレッド以外の executor ではワーカーが PDF のバイト列を返し、ここで書き込む
+        in_thread = isinstance(self._executor, ThreadPoolExecutor)
+        try:
+            if in_thread or output_sink.is_path(path):
+                job = self._executor.submit(_run_generator, generator, path)
+            else:
+                job = self._executor.submit(_render_bytes, generator)
+        except BaseException:
+            self._release(start)
+            raise
+        # 枠は呼び出し元が待つのをやめても、run が実際に終わるまで解放しない
+        job.add_done_callback(lambda _: self._on_done(loop, start))
+        try:
+            result = await asyncio.shield(asyncio.wrap_future(job))
+            if not in_thread and not output_sink.is_path(path):
+                if path is None:
+                    result = memoryview(result)
+                else:
+                    await asyncio.to_thread(_write_target, path, result)
+                    result = None
+        except asyncio.CancelledError:
+            # まだ始まっていなければ取り消す
+            job.cancel()
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        self.completed += 1
+        return result
+
+    def _on_done(self, loop, start: float):
+        # executor のスレッドから呼ばれる
+        try:
+            loop.call_soon_threadsafe(self._release, start)
+        except RuntimeError:
+            # イベントループが既に閉じている
+            pass
+
+    def _release(self, start: float):
+        self.in_flight -= 1
+        self.busy_seconds += time.perf_counter() - start
+        self._semaphore.release()
+
+    def metrics(self):
+        return {
+            'max_concurrency': self.max_concurrency,
+            'queued': self.queued,
+            'in_flight': self.in_flight,
+            'completed': self.completed,
+            'failed': self.failed,
+            'cancelled': self.cancelled,
+            'timed_out': self.timed_out,
+            'busy_seconds': self.busy_seconds,
+        }
+
+    def shutdown(self, wait: bool = True):
+        if self._owns_executor:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+# run_async で renderer を省略した場合の AsyncRenderer と、それらが共有するスレッドの executor
+_default_renderers = weakref.WeakKeyDictionary()
+_default_executor = None
+
+
+def get_default_renderer():
+    """
+    run_async で renderer を省略した場合に使う、スレッドの AsyncRenderer。
+    同時実行数の枠は実行中のイベントループごとに持つ。
+    閉じたループで解放できなかった枠を、別のループの run_async が待ち続けないようにするため
+    """
+    global _default_executor
+    loop = asyncio.get_running_loop()
+    renderer = _default_renderers.get(loop)
+    if renderer is None:
+        if _default_executor is None:
+            _default_executor = ThreadPoolExecutor(4, thread_name_prefix='paper-render')
+        renderer = _default_renderers[loop] = AsyncRenderer(executor=_default_executor)
+    return renderer
@@ -0,0 +1,55 @@
+"""
+PaperGeneratorInterface の実装(バックエンド)の登録先。
+
+バックエンドは名前で引き、実装のモジュールは最初に使う時に読み込む。
+LaTeX だけを出力する場合は ReportLab や pypdf を読み込まずに済む。
+
+    from backends import create_generator
+    pg = create_generator('latex')
+    pg = create_generator('pdf', font='HeiseiMin-W3')
+
+独自の実装は register_backend('名前', 'モジュール:クラス') で追加する。
+"""
+import importlib
+import threading
+
+# {名前: 'モジュール:クラス' またはクラス}
+_backends = {
+    'pdf': 'paper_generator:PaperGenerator',
+    'latex': 'latex_paper_generator:LatexPaperGenerator',
+}
+# 読み込むモジュールが register_backend を呼んでもよいように RLock にする
+_lock = threading.RLock()
+
+
+def register_backend(name: str, target):
+    """
+    target: 'モジュール:クラス' の文字列、または PaperGeneratorInterface を継承したクラス
+    """
+    with _lock:
+        if name in _backends:
+            print(f'{name} is already registed. It is replaced with {target}.')
+        _backends[name] = target
+
+
+def backend_names():
+    with _lock:
+        return sorted(_backends)
+
+
+def get_backend(name: str):
+    """
+    name のバックエンドのクラス。初めて使う場合はここでモジュールを読み込む
+    """
+    with _lock:
+        if name not in _backends:
+            raise ValueError(f'{name} is not a registered backend. Use one of {sorted(_backends)}.')
+        target = _backends[name]
+        if isinstance(target, str):
+            module_name, class_name = target.split(':')
+            target = _backends[name] = getattr(importlib.import_module(module_name), class_name)
+        return target
+
+
+def create_generator(name: str, *args, **kw):
+    return get_backend(name)(*args, **kw)
@@ -0,0 +1,206 @@
+"""
+複数の文書をプロセスプールで並列に生成する。
+
+文書の仕様(spec)は次のような dict で、1行1文書の JSONL としても読み込める。
+
+    {
+        "path": "out/report_0001.pdf",
+        "calls": [
+            ["set_title", "論文タイトル"],
+            ["set_abstract", "要旨"],
+            ["add_chapter", "チャプターA", 0],
+            ["add_sentence", "本文"],
+            ["add_table", [["列A", "列B"], [1, 2.5]], "表サンプル"],
+            ["add_image", "./image/sample.jpg", "サンプル画像"],
+            ["add_ref", "Ogata S.", "Automatic Paper Generation with Python", 2025],
+            ["add_author", "azarashin", "pit-creation"],
+            ["set_double_column", true]
+        ]
+    }
+
+calls には PaperGeneratorInterface の内容を追加するメソッド(run と run_async を除く)を呼び出し順に並べる。
+"""
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+import traceback
+
+from paper_generator_interface import PaperGeneratorInterface
+from backends import get_backend
+from font_registry import font_registry, register_font, prewarm, set_subset_cache
+from font_subset_cache import COMMON_GLYPHS, SubsetCache
+
+
+class BatchResult:
+    def __init__(self, index: int, path: str, seconds: float, error: str = None, fonts: dict = None):
+        """
+        fonts: サブセットのキャッシュを使う場合、フォントごとのサブセットの統計(SubsetCache.stats)
+        """
+        self.index = index
+        self.path = path
+        self.seconds = seconds
+        self.error = error
+        self.fonts = fonts
+
+    def ok(self):
+        return self.error is None
+
+    def to_dict(self):
+        return {'index': self.index, 'path': self.path, 'seconds': self.seconds, 'error': self.error,
+                'fonts': self.fonts}
+
+    def __str__(self):
+        if self.error is None:
+            return f'{self.path}: {self.seconds:.3f}s'
+        return f'{self.path}: failed ({self.error.splitlines()[-1]})'
+
+
+# 文書の仕様から呼べる PaperGeneratorInterface のメソッド(run、run_async などは呼べない)
+_CALLS = (
+    'set_title', 'set_sub_title', 'set_abstract', 'add_chapter', 'add_sentence',
+    'add_image', 'add_table', 'add_ref', 'add_author', 'set_double_column',
+)
+
+# ワーカープロセスごとのフォント設定
+_worker_font = None
+_worker_path_to_font = None
+
+
+def apply_spec(pg: PaperGeneratorInterface, spec: dict):
+    """
+    spec の calls を順に pg へ適用する
+    """
+    for call in spec.get('calls', []):
+        name, args = call[0], call[1:]
+        if name not in _CALLS:
+            raise ValueError(f'{name} is not supported in document specs.')
+        getattr(pg, name)(*args)
+
+
+class InvalidSpec:
+    """
+    read_specs で読み込めなかった行。生成せず、error を持つ BatchResult にする
+    """
+    def __init__(self, error: str):
+        self.error = error
+
+
+def read_specs(path: str):
+    """
+    JSONL ファイルから文書の仕様を1件ずつ読み込む。
+    JSON として読めない行は InvalidSpec にする(他の行の生成は続ける)
+    """
+    with open(path, encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                yield InvalidSpec(f'line {number}: {e}')
+
+
+def _init_worker(font: str, path_to_font: str):
+    global _worker_font, _worker_path_to_font
+    _worker_font = font
+    _worker_path_to_font = path_to_font
+    # フォントはワーカーごとに1回だけ登録する
+    register_font(font, path_to_font)
+
+
+def _render(job):
+    index, spec = job
+    path = None
+    start = time.perf_counter()
+    # ワーカーは1件ずつ生成するので、統計はこの文書の分だけになる
+    subset_cache = font_registry.subset_cache()
+    if subset_cache is not None:
+        subset_cache.reset_stats()
+    try:
+        if isinstance(spec, InvalidSpec):
+            raise ValueError(f'The spec is not valid JSON ({spec.error}).')
+        if not isinstance(spec, dict):
+            raise ValueError(f'The spec is not a JSON object: {spec!r:.80}')
+        path = spec.get('path')
+        pg = get_backend('pdf')(_worker_font, _worker_path_to_font)
+        apply_spec(pg, spec)
+        pg.run(path)
+    except Exception:
+        return BatchResult(index, path, time.perf_counter() - start, traceback.format_exc())
+    fonts = subset_cache.stats() if subset_cache is not None else None
+    return BatchResult(index, path, time.perf_counter() - start, fonts=fonts)
+
+
+def _render_chunk(jobs):
+    return [_render(job) for job in jobs]
+
+
+def run_batch(specs, font='HeiseiMin-W3', path_to_font=None, max_workers=None, chunksize=1,
+              subset_cache=None):
+    """
+    specs (list または iterable) の各文書をプロセスプールで生成し、
+    入力と同じ順に BatchResult を返す。
+    1つの文書で例外が発生しても、他の文書の生成は継続する。
+    subset_cache: TTF のサブセットを再利用する font_subset_cache.SubsetCache
+    """
+    return list(iter_batch(specs, font, path_to_font, max_workers, chunksize, subset_cache))
+
+
+def iter_batch(specs, font='HeiseiMin-W3', path_to_font=None, max_workers=None, chunksize=1,
+               subset_cache=None):
+    """
+    run_batch と同じだが、結果を生成された順(入力順)に1件ずつ返す。
+    specs は必要な分だけ読み進め、ワーカーに渡した未完了のチャンクはワーカー数の2倍までにする
+    """
+    if subset_cache is not None:
+        # 共通の文字のサブセットは fork する前に作っておく
+        set_subset_cache(subset_cache)
+    # fork で起動するワーカーは、親プロセスで読み込んだフォントを共有できる
+    prewarm([(font, path_to_font)])
+    workers = max_workers or os.cpu_count() or 1
+    jobs = enumerate(specs)
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=_init_worker,
+                             initargs=(font, path_to_font)) as executor:
+        while True:
+            while len(pending) < workers * 2:
+                chunk = list(itertools.islice(jobs, chunksize))
+                if not chunk:
+                    break
+                pending.append(executor.submit(_render_chunk, chunk))
+            if not pending:
+                break
+            yield from pending.popleft().result()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='JSONL の文書仕様から PDF をまとめて生成する')
+    parser.add_argument('specs', help='1行1文書の JSONL ファイル')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--chunksize', type=int, default=1)
+    parser.add_argument('--font', default='HeiseiMin-W3')
+    parser.add_argument('--path-to-font', default=None)
+    parser.add_argument('--subset-cache', default=None, help='TTF のサブセットを保存するディレクトリ')
+    parser.add_argument('--common-glyphs', default=None, choices=sorted(COMMON_GLYPHS),
+                        help='各文書で共通に埋め込む文字')
+    args = parser.parse_args()
+
+    subset_cache = None
+    if args.subset_cache or args.common_glyphs:
+        common_glyphs = COMMON_GLYPHS[args.common_glyphs]() if args.common_glyphs else None
+        subset_cache = SubsetCache(args.subset_cache, common_glyphs=common_glyphs)
+
+    failed = 0
+    for result in iter_batch(read_specs(args.specs), args.font, args.path_to_font,
+                             args.workers, args.chunksize, subset_cache):
+        print(json.dumps(result.to_dict(), ensure_ascii=False))
+        if not result.ok():
+            failed += 1
+    sys.exit(1 if failed else 0)
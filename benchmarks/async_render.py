@@ -0,0 +1,79 @@
+"""
+run_async で複数の文書を同時に生成し、出力先ごと・executor ごとの時間を比べる。
+BytesIO やパスを出力先にした場合に、呼び出し元から PDF を参照できることも確かめる。
+
+    python benchmarks/async_render.py --documents 8 --concurrency 4
+"""
+import argparse
+import asyncio
+import io
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from async_renderer import AsyncRenderer
+from paper_generator import PaperGenerator
+
+SENTENCE = 'run_async の計測に使う本文です。イベントループを止めずに複数の文書を生成する。' * 4
+
+
+def create_generator(chapters: int):
+    pg = PaperGenerator()
+    pg.set_title('run_async の計測')
+    for chapter in range(chapters):
+        pg.add_chapter(f'チャプター{chapter + 1}', 0)
+        for _ in range(10):
+            pg.add_sentence(SENTENCE)
+    return pg
+
+
+def read_output(target):
+    if target is None:
+        return None
+    if isinstance(target, io.BytesIO):
+        return target.getvalue()
+    with open(target, 'rb') as f:
+        return f.read()
+
+
+async def measure(renderer, targets, chapters: int):
+    start = time.perf_counter()
+    results = await asyncio.gather(*(create_generator(chapters).run_async(target, renderer) for target in targets))
+    seconds = time.perf_counter() - start
+    for target, result in zip(targets, results):
+        pdf = bytes(result) if target is None else read_output(target)
+        assert pdf.startswith(b'%PDF'), f'{target!r} did not receive the PDF'
+    return seconds
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--documents', type=int, default=8)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--chapters', type=int, default=5)
+    args = parser.parse_args()
+
+    async def main(directory):
+        outputs = {
+            'memoryview': lambda: [None] * args.documents,
+            'BytesIO': lambda: [io.BytesIO() for _ in range(args.documents)],
+            'path': lambda: [os.path.join(directory, f'{i}.pdf') for i in range(args.documents)],
+        }
+        for executor in ('thread', 'process'):
+            renderer = AsyncRenderer(args.concurrency, executor)
+            try:
+                # ワーカーの起動とフォントの読み込みは計測に含めない
+                await measure(renderer, [None] * args.concurrency, 1)
+                for label, targets in outputs.items():
+                    seconds = await measure(renderer, targets(), args.chapters)
+                    print(f'{executor:7s} {label:10s}: {seconds:6.2f}s  {args.documents / seconds:6.1f} docs/s')
+            finally:
+                renderer.shutdown()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # AsyncRenderer の同時実行数の枠は1つのイベントループで使う
+        asyncio.run(main(directory))
@@ -0,0 +1,63 @@
+"""
+本文を Paragraph で組む場合と CJKParagraph (set_cjk_paragraphs) で組む場合の、
+段落の wrap にかかる時間と run 全体の時間を比べる。
+
+    python benchmarks/cjk_paragraph.py --paragraphs 500
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from reportlab.platypus import Paragraph
+from cjk_paragraph import CJKParagraph
+from font_registry import register_font
+from paper_generator import PaperGenerator
+from paper_style import get_style_sheet
+
+SENTENCE = ('日本語の本文が長く続く段落の例です。「かぎ括弧」や、句読点の処理を確認する。'
+            'English words と数字 12345 も混ざる。')
+
+
+def measure_wrap(cls, paragraphs: int, repeat: int):
+    style = get_style_sheet('HeiseiMin-W3').body
+    flowables = [cls(SENTENCE * (i % 8 + 1), style) for i in range(paragraphs)]
+    start = time.perf_counter()
+    # multiBuild のパスごとに同じ幅で組み直す場合と同じ
+    for _ in range(repeat):
+        for flowable in flowables:
+            flowable.wrap(240, 800)
+    return time.perf_counter() - start
+
+
+def measure_run(mode: bool, paragraphs: int, double_column: bool):
+    pg = PaperGenerator()
+    pg.set_cjk_paragraphs(mode)
+    pg.set_double_column(double_column)
+    pg.set_title('CJKParagraph の計測')
+    for i in range(paragraphs):
+        if i % 50 == 0:
+            pg.add_chapter(f'チャプター{i // 50}', 0)
+        pg.add_sentence(SENTENCE * (i % 8 + 1))
+    start = time.perf_counter()
+    pg.run()
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--paragraphs', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    register_font('HeiseiMin-W3')
+
+    for cls in (Paragraph, CJKParagraph):
+        seconds = measure_wrap(cls, args.paragraphs, args.repeat)
+        print(f'wrap {cls.__name__:12s}: {seconds * 1000:8.1f}ms ({args.paragraphs} paragraphs x {args.repeat})')
+    for double_column in (False, True):
+        for mode in (False, True):
+            seconds = measure_run(mode, args.paragraphs, double_column)
+            label = ('CJKParagraph' if mode else 'Paragraph') + (' double' if double_column else ' single')
+            print(f'run  {label:19s}: {seconds * 1000:8.1f}ms')
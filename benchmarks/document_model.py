@@ -0,0 +1,75 @@
+"""
+文書モデル(document_model)のノード1個あたりのメモリと、to_bytes / from_bytes の速度を測る。
+比較として、同じ内容を以前のように追加時点で Paragraph にした場合のメモリも測る。
+
+    python benchmarks/document_model.py --nodes 100000
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from document_model import Document
+from paper_style import get_style_sheet
+from reportlab.platypus import Paragraph
+
+SENTENCE = 'これは文書モデルの計測用の本文です。論文本文として長い文章が続くことを想定しています。'
+
+
+def build(nodes: int):
+    document = Document()
+    for i in range(nodes):
+        if i % 20 == 0:
+            document.add_chapter(f'チャプター{i}', (i // 20) % 3)
+        elif i % 100 == 99:
+            document.add_table([['ID', '値'], [i, i * 0.5], [i + 1, i * 0.25]], f'表{i}')
+        else:
+            document.add_sentence(f'{i}: {SENTENCE}')
+    return document
+
+
+def measure_memory(create):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = create()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return result, used
+
+
+def best_time(func, repeat: int):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--nodes', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    document, node_bytes = measure_memory(lambda: build(args.nodes))
+    count = len(list(document.contents()))
+
+    style = get_style_sheet('Helvetica').body
+    texts = [f'{i}: {SENTENCE}' for i in range(args.nodes)]
+    _, paragraph_bytes = measure_memory(lambda: [Paragraph(text, style) for text in texts])
+
+    build_seconds, _ = best_time(lambda: build(args.nodes), args.repeat)
+    dump_seconds, data = best_time(document.to_bytes, args.repeat)
+    load_seconds, loaded = best_time(lambda: Document.from_bytes(data), args.repeat)
+    assert len(list(loaded.contents())) == count
+
+    print(f'nodes        : {count}')
+    print(f'memory       : {node_bytes / count:8.1f} B/node  (Paragraph: {paragraph_bytes / args.nodes:8.1f} B/node)')
+    print(f'build        : {build_seconds:8.3f}s  {count / build_seconds:12.0f} nodes/s')
+    print(f'to_bytes     : {dump_seconds:8.3f}s  {count / dump_seconds:12.0f} nodes/s  {len(data) / dump_seconds / 2**20:8.1f} MiB/s')
+    print(f'from_bytes   : {load_seconds:8.3f}s  {count / load_seconds:12.0f} nodes/s  {len(data) / load_seconds / 2**20:8.1f} MiB/s')
+    print(f'serialized   : {len(data) / 2**20:8.2f} MiB  {len(data) / count:8.1f} B/node')
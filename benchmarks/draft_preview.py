@@ -0,0 +1,63 @@
+"""
+通常の run と下書き (set_draft) の run にかかる時間を比べる。
+
+    python benchmarks/draft_preview.py --chapters 20 --font-path font.ttf
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from build_profiler import BuildProfiler
+from paper_generator import PaperGenerator
+
+SENTENCE = '下書きの計測に使う本文です。目次のページ番号、画像、フォントの埋め込みを省いた場合の時間を比べる。' * 4
+IMAGE = os.path.join(ROOT, 'image', 'sample.jpg')
+
+
+def measure(font: str, path_to_font: str, chapters: int, draft: dict = None, profile: bool = False):
+    pg = PaperGenerator(font, path_to_font)
+    if draft is not None:
+        pg.set_draft(True, **draft)
+    if profile:
+        pg.set_profiler(BuildProfiler())
+    pg.set_double_column(True)
+    pg.set_title('下書きの計測')
+    for chapter in range(chapters):
+        pg.add_chapter(f'チャプター{chapter + 1}', 0)
+        for section in range(3):
+            pg.add_chapter(f'セクション{section + 1}', 1)
+            for _ in range(10):
+                pg.add_sentence(SENTENCE)
+            if os.path.exists(IMAGE):
+                pg.add_image(IMAGE, f'図 {chapter + 1}-{section + 1}')
+            pg.add_table([['名前', '値'], ['a', 1.5], ['b', 20.25]], f'表 {chapter + 1}-{section + 1}')
+    start = time.perf_counter()
+    pdf = pg.run()
+    return time.perf_counter() - start, len(pdf)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--chapters', type=int, default=20)
+    parser.add_argument('--font', default='HeiseiMin-W3')
+    parser.add_argument('--font-path', default=None, help='TTF のパス(下書きでは CID フォントに置き換える)')
+    args = parser.parse_args()
+
+    # フォントの読み込みは計測に含めない
+    measure(args.font, args.font_path, 1)
+    cases = [
+        ('full', None, False),
+        ('draft', {}, False),
+        ('draft pages 1-5', {'pages': (1, 5)}, False),
+        ('draft chapter 2', {'chapters': ['2']}, False),
+        ('draft + profiler', {}, True),
+    ]
+    full = None
+    for label, draft, profile in cases:
+        seconds, size = measure(args.font, args.font_path, args.chapters, draft, profile)
+        full = full or seconds
+        print(f'{label:16s}: {seconds * 1000:8.1f}ms ({seconds / full:5.1%}) {size / 1024:8.1f}KiB')
@@ -0,0 +1,72 @@
+"""
+TTF のサブセットのキャッシュ(font_subset_cache)の効果を測る。
+同じフォントで内容の異なる文書を続けて生成し、キャッシュなし、キャッシュあり、
+共通の文字を先に割り当てた場合の1文書あたりの時間と、埋め込んだフォントデータのバイト数を比べる。
+
+    python benchmarks/font_subsets.py --documents 20 --font IPAMincho --path-to-font ipam.ttf --common-glyphs jis1
+
+--path-to-font を省略すると ReportLab に付属する Vera.ttf (ASCII のみ)を使う。
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import reportlab
+from font_registry import register_font, set_subset_cache
+from font_subset_cache import COMMON_GLYPHS, SubsetCache
+from paper_generator import PaperGenerator
+
+
+def sample_text(chars: str, length: int, seed: int):
+    rng = random.Random(seed)
+    return ''.join(rng.choice(chars) for _ in range(length))
+
+
+def render(args, seed: int):
+    pg = PaperGenerator(args.font, args.path_to_font)
+    pg.set_title(sample_text(args.chars, 10, seed))
+    pg.set_abstract(sample_text(args.chars, 100, seed + 1))
+    for i in range(args.chapters):
+        pg.add_chapter(sample_text(args.chars, 8, seed + i), 0)
+        pg.add_sentence(sample_text(args.chars, 400, seed * 100 + i))
+    pg.run(io.BytesIO())
+
+
+def measure(args, cache):
+    if cache is not None:
+        set_subset_cache(cache)
+    start = time.perf_counter()
+    for seed in range(args.documents):
+        render(args, seed)
+    return (time.perf_counter() - start) / args.documents
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--documents', type=int, default=20)
+    parser.add_argument('--chapters', type=int, default=5)
+    parser.add_argument('--font', default='Vera')
+    parser.add_argument('--path-to-font', default=None)
+    parser.add_argument('--common-glyphs', default='ascii', choices=sorted(COMMON_GLYPHS))
+    args = parser.parse_args()
+    if args.path_to_font is None:
+        args.path_to_font = os.path.join(os.path.dirname(reportlab.__file__), 'fonts', 'Vera.ttf')
+    common_glyphs = COMMON_GLYPHS[args.common_glyphs]()
+    font = register_font(args.font, args.path_to_font)
+    # 本文には共通の文字のうちフォントにあるもの(Paragraph のマークアップに使う文字を除く)を使う
+    args.chars = ''.join(c for c in common_glyphs if ord(c) in font.face.charToGlyph and c not in '<>&')
+
+    print(f'{args.font}: {len(args.chars)} glyphs, {args.documents} documents')
+    plain = measure(args, None)
+    print(f'no cache      : {plain * 1000:8.1f}ms/doc')
+    for label, cache in [('cache', SubsetCache()),
+                         ('common glyphs', SubsetCache(common_glyphs=common_glyphs))]:
+        seconds = measure(args, cache)
+        stats = cache.stats()[args.font]
+        print(f'{label:14s}: {seconds * 1000:8.1f}ms/doc  hits {stats["hits"]:4d}  misses {stats["misses"]:4d}  '
+              f'embedded {stats["bytes"] / args.documents / 1024:8.1f}KiB/doc')
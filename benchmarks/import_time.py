@@ -0,0 +1,59 @@
+"""
+python -X importtime で各モジュールの読み込み時間を測り、予算を超えていないか確認する。
+あわせて、軽く保ちたいモジュールが ReportLab などの重い依存を読み込んでいないかも確認する。
+超えた場合は終了コード 1 で終わるので、CI で使える。
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --scale 2      # 遅いマシンでは予算を2倍にする
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# {モジュール: 予算のミリ秒}
+BUDGETS = {
+    'backends': 30,
+    'latex_paper_generator': 80,
+    'batch_generator': 150,
+    'paper_generator': 600,
+}
+# 読み込んではいけない重い依存
+HEAVY = ('reportlab', 'pypdf', 'numpy', 'PIL')
+LIGHT = ('backends', 'latex_paper_generator', 'batch_generator')
+
+
+def import_time(module: str):
+    """
+    戻り値: (累積の読み込み時間(ミリ秒), {モジュール: 累積の読み込み時間(ミリ秒)})
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative) / 1000
+    return times[module], times
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--scale', type=float, default=1.0, help='予算に掛ける倍率')
+    parser.add_argument('--repeat', type=int, default=3, help='測定回数(最小値を使う)')
+    args = parser.parse_args()
+
+    failed = False
+    for module, budget in BUDGETS.items():
+        measured = [import_time(module) for _ in range(args.repeat)]
+        milliseconds, times = min(measured, key=lambda m: m[0])
+        heavy = sorted({name.split('.')[0] for name in times} & set(HEAVY)) if module in LIGHT else []
+        over = milliseconds > budget * args.scale
+        failed = failed or over or bool(heavy)
+        status = 'NG' if over or heavy else 'ok'
+        print(f'{status} {module:22s}: {milliseconds:8.1f}ms (budget {budget * args.scale:6.0f}ms)'
+              + (f'  imports {", ".join(heavy)}' if heavy else ''))
+    sys.exit(1 if failed else 0)
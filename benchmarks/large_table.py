@@ -0,0 +1,51 @@
+"""
+行数の多い表を LongTable (従来)と LargeTable (set_large_tables)で組む時間を比べる。
+LargeTable は行数に比例する時間で組めることを確認する。
+
+    python benchmarks/large_table.py --rows 1000 4000 16000 100000 --legacy-limit 4000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from paper_generator import PaperGenerator
+
+
+def make_data(rows: int):
+    rng = random.Random(rows)
+    data = [['ID', '名前', '値', '備考']]
+    for i in range(rows):
+        data.append([i, f'項目{i}', round(rng.random() * 1000, 3), '長い備考の文字列' * 3 if i % 100 == 0 else ''])
+    return data
+
+
+def measure(rows: int, large: bool, double_column: bool):
+    pg = PaperGenerator()
+    pg.set_single_pass(True)
+    pg.set_double_column(double_column)
+    pg.set_large_tables(1 if large else 0)
+    pg.add_chapter('付録', 0)
+    pg.add_table(make_data(rows), '大きな表')
+    start = time.perf_counter()
+    pg.run()
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 4000, 16000])
+    parser.add_argument('--legacy-limit', type=int, default=4000, help='LongTable で組む最大の行数')
+    parser.add_argument('--double-column', action='store_true')
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        large = measure(rows, True, args.double_column)
+        line = f'{rows:7d} rows: LargeTable {large:7.2f}s ({large / rows * 1e6:6.1f}us/row)'
+        if rows <= args.legacy_limit:
+            legacy = measure(rows, False, args.double_column)
+            line += f'  LongTable {legacy:7.2f}s ({legacy / rows * 1e6:6.1f}us/row)'
+        print(line)
@@ -0,0 +1,39 @@
+"""
+set_parallel_chapters で最上位の章を並列に組んだ場合と、同じレイアウトを直列に組んだ場合の比較。
+
+    python benchmarks/parallel_chapters.py --chapters 20 --workers 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from paper_generator import PaperGenerator
+from sample_tester import generate_scaled_sample
+
+
+def measure(workers: int, chapters: int, path: str):
+    pg = PaperGenerator()
+    pg.set_parallel_chapters(workers)
+    start = time.perf_counter()
+    generate_scaled_sample(pg, path, chapters=chapters, depth=3, paragraphs=20, table_rows=100,
+                           table_columns=5, images=chapters, refs=30,
+                           image_path=os.path.join(ROOT, 'image', 'sample.jpg'))
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--chapters', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        serial = measure(1, args.chapters, os.path.join(directory, 'serial.pdf'))
+        parallel = measure(max(2, args.workers), args.chapters, os.path.join(directory, 'parallel.pdf'))
+    print(f'serial   : {serial:8.3f}s')
+    print(f'parallel : {parallel:8.3f}s  (x{serial / parallel:.2f}, {max(2, args.workers)} workers)')
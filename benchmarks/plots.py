@@ -0,0 +1,53 @@
+"""
+add_plot で点の数を増やした場合の、add_plot と run にかかる時間と PDF の大きさを計測する。
+--raw を指定すると、間引かずに描く場合(点の数が --raw 以下のもの)と比べる。
+
+    python benchmarks/plots.py --points 10000 100000 1000000 --raw 100000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np
+
+from paper_generator import PaperGenerator
+
+
+def measure(kind: str, points: int, decimation: str, columns: int = None):
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 100, points)
+    y = np.sin(x) + rng.normal(0, 0.2, points)
+    if kind == 'scatter':
+        x = rng.normal(size=points)
+        y = x + rng.normal(0, 0.5, points)
+    pg = PaperGenerator()
+    pg.add_chapter('グラフ', 0)
+    start = time.perf_counter()
+    pg.add_plot(x, y, f'{kind} {points}', kind=kind, decimation=decimation, columns=columns)
+    added = time.perf_counter()
+    pdf = pg.run()
+    end = time.perf_counter()
+    return added - start, end - added, len(pdf)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--points', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--raw', type=int, default=100000, help='間引かずに描いて比べる点の数の上限')
+    args = parser.parse_args()
+
+    measure('line', 10, 'minmax')    # フォントの読み込みは計測に含めない
+    cases = [('line', 'minmax'), ('line', 'lttb'), ('scatter', None), ('bar', None)]
+    for points in args.points:
+        for kind, decimation in cases:
+            add, run, size = measure(kind, points, decimation or 'minmax')
+            label = f'{kind} {decimation or ""}'
+            print(f'{points:9d} {label:14s}: add {add * 1000:7.1f}ms run {run * 1000:7.1f}ms {size / 1024:8.1f}KiB')
+            if points <= args.raw and kind != 'bar':
+                # columns を点の数にすると間引かない
+                add, run, size = measure(kind, points, decimation or 'minmax', columns=points * 2)
+                print(f'{points:9d} {label + " raw":14s}: add {add * 1000:7.1f}ms run {run * 1000:7.1f}ms '
+                      f'{size / 1024:8.1f}KiB')
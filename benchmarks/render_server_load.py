@@ -0,0 +1,115 @@
+"""
+render_server に並行して要求を送り、応答時間の p50 / p99 とスループットを測る。
+比較として、1件ごとに Python を起動して生成する場合の時間も測る。
+
+    python benchmarks/render_server_load.py --requests 200 --concurrency 8 --workers 4
+    python benchmarks/render_server_load.py --unix-socket /tmp/paper_generator.sock   # 起動済みのサーバー
+"""
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from render_client import RenderClient, RenderQueueFull
+
+SPEC = {
+    'calls': [
+        ['set_title', '負荷試験'],
+        ['set_abstract', '小さな文書を繰り返し生成する。'],
+        ['add_author', 'azarashin', 'pit-creation'],
+        ['add_chapter', 'チャプターA', 0],
+        ['add_sentence', 'これは負荷試験の本文です。' * 5],
+        ['add_table', [['列A', '列B'], [1, 2.5], [3, 4.25]], '表'],
+        ['add_chapter', 'チャプターB', 0],
+        ['add_sentence', 'これは負荷試験の本文です。' * 5],
+        ['add_ref', 'Ogata S.', 'Automatic Paper Generation with Python', 2025],
+    ]
+}
+
+
+def percentile(values, p: float):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def start_server(args, unix_socket: str):
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, 'render_server.py'), '--unix-socket', unix_socket,
+         '--workers', str(args.workers), '--max-queue', str(args.max_queue)],
+        stdout=subprocess.PIPE, text=True, cwd=ROOT)
+    process.stdout.readline()   # 'listening on ...'
+    return process
+
+
+def cold_start_seconds(directory: str):
+    """
+    1件ごとに Python を起動して生成する場合の時間
+    """
+    spec_path = os.path.join(directory, 'spec.json')
+    with open(spec_path, 'w', encoding='utf-8') as f:
+        json.dump(dict(SPEC, path=os.path.join(directory, 'cold.pdf')), f, ensure_ascii=False)
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c',
+                    'import json, sys\n'
+                    'from batch_generator import apply_spec\n'
+                    'from paper_generator import PaperGenerator\n'
+                    'spec = json.load(open(sys.argv[1], encoding="utf-8"))\n'
+                    'pg = PaperGenerator()\n'
+                    'apply_spec(pg, spec)\n'
+                    'pg.run(spec["path"])\n', spec_path], check=True, cwd=ROOT, capture_output=True)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--max-queue', type=int, default=64)
+    parser.add_argument('--unix-socket', default=None, help='起動済みのサーバーを使う場合に指定する')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        unix_socket = args.unix_socket or os.path.join(directory, 'render.sock')
+        server = None if args.unix_socket else start_server(args, unix_socket)
+        client = RenderClient(unix_socket=unix_socket)
+
+        def request(_):
+            start = time.perf_counter()
+            try:
+                client.render(SPEC)
+            except RenderQueueFull:
+                return None
+            return time.perf_counter() - start
+
+        try:
+            start = time.perf_counter()
+            with ThreadPoolExecutor(args.concurrency) as executor:
+                results = list(executor.map(request, range(args.requests)))
+            elapsed = time.perf_counter() - start
+            stats = client.stats()
+        finally:
+            if server:
+                # SIGINT で終了処理(ワーカープロセスの停止)を行わせ、終わるまで待つ
+                server.send_signal(signal.SIGINT)
+                try:
+                    server.wait(30)
+                except subprocess.TimeoutExpired:
+                    server.kill()
+                    server.wait()
+        cold = cold_start_seconds(directory)
+
+    latencies = [r for r in results if r is not None]
+    print(f'requests   : {len(results)} (rejected {len(results) - len(latencies)}), concurrency {args.concurrency}')
+    print(f'throughput : {len(latencies) / elapsed:8.1f} docs/s')
+    print(f'latency    : p50 {percentile(latencies, 50) * 1000:8.1f}ms  p99 {percentile(latencies, 99) * 1000:8.1f}ms')
+    print(f'cold start : {cold * 1000:8.1f}ms per document (new Python process)')
+    print(f'server     : {json.dumps(stats)}')
@@ -0,0 +1,89 @@
+"""
+差し込み印刷の文書を、記録ごとに PaperGenerator を作り直して組む場合と、
+compile_template のテンプレートに差し込んで組む場合の処理量(文書/秒)を比べる。
+テンプレートは単一パスで組むため、作り直す場合は multiBuild と単一パスの両方を計測する。
+
+    python benchmarks/report_template.py --records 10000 --baseline 200 --workers 4
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from paper_generator import PaperGenerator
+
+PARAGRAPH = '毎月お送りしている報告書の固定の本文です。集計の方法と用語の説明を記載しています。' * 4
+
+
+def add_static(pg, slot):
+    """
+    固定部分を追加する。slot(名前, 内容の呼び出し)で差し込む位置の内容を追加する
+    """
+    pg.set_title('月次利用報告書')
+    pg.set_sub_title('差し込み印刷のサンプル')
+    pg.add_author('集計担当', 'pit-creation')
+    pg.set_abstract('本報告書は、ご利用状況を月ごとにまとめたものです。')
+    pg.add_chapter('はじめに', 0)
+    for _ in range(6):
+        pg.add_sentence(PARAGRAPH)
+    pg.add_table([['区分', '単価'], ['基本', 1200.0], ['追加', 350.5], ['割引', -100.25]], '料金表')
+    pg.add_chapter('ご利用状況', 0)
+    slot('summary')
+    pg.add_chapter('明細', 1)
+    slot('details')
+    pg.add_chapter('お問い合わせ', 0)
+    for _ in range(3):
+        pg.add_sentence(PARAGRAPH)
+    pg.add_ref('pit-creation', '料金規約', 2025)
+
+
+def record(i: int):
+    items = [[f'項目{j + 1}', (i * 7 + j * 13) % 100, ((i + j) % 50) * 12.5] for j in range(5 + i % 10)]
+    return {
+        'summary': f'お客様番号 {i:06d} の今月のご利用は {len(items)} 件、合計 {sum(r[2] for r in items):.2f} 円です。',
+        'details': [['add_table', [['項目', '回数', '金額']] + items, '今月の明細'],
+                    ['add_sentence', '金額は税込みです。']],
+    }
+
+
+def render_baseline(values: dict, single_pass: bool):
+    pg = PaperGenerator()
+    # テンプレートは常に単一パスで組むため、再利用の効果は single pass の結果と比べる
+    pg.set_single_pass(single_pass)
+
+    def slot(name):
+        content = values[name]
+        for call in ([['add_sentence', content]] if isinstance(content, str) else content):
+            getattr(pg, call[0])(*call[1:])
+    add_static(pg, slot)
+    return pg.run()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--records', type=int, default=10000)
+    parser.add_argument('--baseline', type=int, default=200, help='作り直して組む場合に計測する記録の数')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    render_baseline(record(0), False)   # フォントの読み込みは計測に含めない
+    for label, single_pass in (('multiBuild', False), ('single pass', True)):
+        start = time.perf_counter()
+        for i in range(args.baseline):
+            render_baseline(record(i), single_pass)
+        seconds = time.perf_counter() - start
+        print(f'rebuild each ({label:11s}): {args.baseline / seconds:8.1f} docs/s ({args.baseline} records, 1 process)')
+
+    pg = PaperGenerator()
+    add_static(pg, pg.add_slot)
+    start = time.perf_counter()
+    template = pg.compile_template()
+    print(f'compile                   : {(time.perf_counter() - start) * 1000:8.1f}ms')
+    workers = args.workers or os.cpu_count() or 1
+    for workers, count in ((1, args.baseline), (workers, args.records)):
+        start = time.perf_counter()
+        failed = sum(not result.ok() for result in template.render_batch(map(record, range(count)), workers=workers))
+        seconds = time.perf_counter() - start
+        print(f'template x{workers:<3d}             : {count / seconds:8.1f} docs/s ({count} records, {failed} failed)')
@@ -0,0 +1,153 @@
+"""
+generate_scaled_sample を使ったベンチマーク。
+
+シナリオごと・バックエンド(PaperGenerator / LatexPaperGenerator)ごとに別プロセスで文書を生成し、
+時間、ピーク RSS、出力サイズを記録する。保存したベースラインと比較し、
+しきい値を超えて悪化した項目があれば終了コード 1 で終わる。
+
+    python benchmarks/suite.py --update-baseline     # ベースラインを記録
+    python benchmarks/suite.py                       # ベースラインと比較
+    python benchmarks/suite.py --scenario large --backend pdf --repeat 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# generate_scaled_sample の引数
+SCENARIOS = {
+    'small': dict(chapters=3, depth=3, paragraphs=10, table_rows=3, table_columns=3, images=1, refs=3),
+    'medium': dict(chapters=10, depth=3, paragraphs=20, table_rows=50, table_columns=5, images=5, refs=30),
+    'large': dict(chapters=40, depth=4, paragraphs=30, table_rows=200, table_columns=6, images=20, refs=200),
+    'deep': dict(chapters=10, depth=8, paragraphs=5, table_rows=0, table_columns=0, images=0, refs=10),
+    'tables': dict(chapters=5, depth=1, paragraphs=2, table_rows=1000, table_columns=8, images=0, refs=0),
+    'images': dict(chapters=5, depth=1, paragraphs=2, table_rows=0, table_columns=0, images=50, refs=0),
+}
+COLUMNS = {'single': False, 'double': True}
+BACKENDS = {'pdf': '.pdf', 'latex': '.tex'}
+# 計測のばらつきとして無視する差
+NOISE = {'seconds': 0.02, 'peak_rss_bytes': 2**20, 'output_bytes': 0}
+
+
+def _child(scenario: str, columns: str, backend: str, path: str):
+    """
+    別プロセスで1回だけ生成し、結果を JSON で標準出力に書く
+    """
+    import resource
+    import time
+    from sample_tester import generate_scaled_sample
+
+    if backend == 'pdf':
+        from paper_generator import PaperGenerator
+        pg = PaperGenerator()
+    else:
+        from latex_paper_generator import LatexPaperGenerator
+        pg = LatexPaperGenerator()
+    start = time.perf_counter()
+    generate_scaled_sample(pg, path, double_column=COLUMNS[columns],
+                           image_path=os.path.join(ROOT, 'image', 'sample.jpg'),
+                           **SCENARIOS[scenario])
+    seconds = time.perf_counter() - start
+    # Linux では KiB、macOS ではバイト
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != 'darwin':
+        rss *= 1024
+    print(json.dumps({'seconds': seconds, 'peak_rss_bytes': rss, 'output_bytes': os.path.getsize(path)}))
+
+
+def measure(scenario: str, columns: str, backend: str, repeat: int, directory: str):
+    path = os.path.join(directory, f'{scenario}_{columns}{BACKENDS[backend]}')
+    results = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--child', scenario, columns, backend, path],
+            check=True, capture_output=True, text=True, cwd=directory).stdout
+        results.append(json.loads(output.splitlines()[-1]))
+    # 時間とメモリは最も良い回を採用する
+    return {
+        'seconds': min(r['seconds'] for r in results),
+        'peak_rss_bytes': min(r['peak_rss_bytes'] for r in results),
+        'output_bytes': results[-1]['output_bytes'],
+    }
+
+
+def compare(current: dict, baseline: dict, thresholds: dict):
+    """
+    戻り値: しきい値を超えて悪化した項目のリスト [(キー, 項目, ベースライン, 今回, 比率)]
+    """
+    regressions = []
+    for key, result in current.items():
+        if key not in baseline:
+            continue
+        for metric, threshold in thresholds.items():
+            before = baseline[key][metric]
+            after = result[metric]
+            if after > before * (1 + threshold) and after - before > NOISE[metric]:
+                regressions.append((key, metric, before, after, after / before if before else float('inf')))
+    return regressions
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        _child(*sys.argv[2:6])
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description='generate_scaled_sample を使ったベンチマーク')
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS), help='省略時はすべて')
+    parser.add_argument('--columns', action='append', choices=sorted(COLUMNS), help='省略時は両方')
+    parser.add_argument('--backend', action='append', choices=sorted(BACKENDS), help='省略時は両方')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--update-baseline', action='store_true', help='今回の結果をベースラインとして保存する')
+    parser.add_argument('--time-threshold', type=float, default=0.10, help='許容する時間の悪化の割合')
+    parser.add_argument('--rss-threshold', type=float, default=0.10, help='許容するピーク RSS の悪化の割合')
+    parser.add_argument('--size-threshold', type=float, default=0.02, help='許容する出力サイズの悪化の割合')
+    parser.add_argument('--output', help='今回の結果を JSON で書き出す')
+    args = parser.parse_args()
+
+    current = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for scenario in args.scenario or SCENARIOS:
+            for columns in args.columns or COLUMNS:
+                for backend in args.backend or BACKENDS:
+                    key = f'{scenario}/{columns}/{backend}'
+                    current[key] = measure(scenario, columns, backend, args.repeat, directory)
+                    result = current[key]
+                    print(f'{key:24s} {result["seconds"]:8.3f}s  rss {result["peak_rss_bytes"] / 2**20:7.1f}MiB  '
+                          f'output {result["output_bytes"] / 2**10:9.1f}KiB')
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=2)
+
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding='utf-8') as f:
+                baseline = json.load(f)
+        baseline.update(current)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2)
+        print(f'baseline saved to {args.baseline}')
+        sys.exit(0)
+
+    if not os.path.exists(args.baseline):
+        print(f'{args.baseline} does not exist. Run with --update-baseline first.')
+        sys.exit(0)
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare(current, baseline, {
+        'seconds': args.time_threshold,
+        'peak_rss_bytes': args.rss_threshold,
+        'output_bytes': args.size_threshold,
+    })
+    for key, metric, before, after, ratio in regressions:
+        print(f'REGRESSION {key} {metric}: {before:.3f} -> {after:.3f} (x{ratio:.2f})')
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,59 @@
+"""
+大きな表のセルを Paragraph で持つ場合と、文字列のまま持つ場合(set_compact_table)の比較。
+add_table とレイアウト(PDF 出力)の時間、およびピークメモリを測る。
+
+    python benchmarks/table_cells.py --rows 5000
+
+tracemalloc を使うため、時間は通常の実行より長く出る。
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from paper_generator import PaperGenerator
+
+
+def make_rows(rows: int):
+    random.seed(0)
+    data = [['ID', '値', '件数', '区分']]
+    for i in range(rows):
+        data.append([i, round(random.uniform(0, 1000), 2), random.randint(0, 10**6), random.choice(['説明A', '説明B', '説明C'])])
+    return data
+
+
+def measure(compact: bool, data, directory: str):
+    tracemalloc.start()
+    pg = PaperGenerator()
+    pg.set_single_pass(True)
+    pg.set_compact_table(compact)
+    start = time.perf_counter()
+    pg.add_table(data, '大きな表')
+    add_time = time.perf_counter() - start
+    _, add_peak = tracemalloc.get_traced_memory()
+
+    path = os.path.join(directory, f'table_{"compact" if compact else "paragraph"}.pdf')
+    start = time.perf_counter()
+    pg.run(path)
+    layout_time = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return add_time, layout_time, add_peak, peak, os.path.getsize(path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=5000)
+    args = parser.parse_args()
+
+    data = make_rows(args.rows)
+    with tempfile.TemporaryDirectory() as directory:
+        for compact in (False, True):
+            add_time, layout_time, add_peak, peak, size = measure(compact, data, directory)
+            print(f'{"compact  " if compact else "paragraph"}: add_table {add_time:7.3f}s  layout {layout_time:7.3f}s  '
+                  f'peak after add_table {add_peak / 2**20:7.1f}MiB  peak {peak / 2**20:7.1f}MiB  pdf {size / 2**10:8.0f}KiB')
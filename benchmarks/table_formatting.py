@@ -0,0 +1,95 @@
+"""
+表の数値整形のベンチマーク。
+従来のセルごとの Decimal による整形と、
+table_formatter による列単位の一括整形を比較する。
+
+    python benchmarks/table_formatting.py --rows 100000 --columns 5
+"""
+from decimal import Decimal, InvalidOperation
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from table_formatter import get_scale, format_column
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def legacy_quantize(values):
+    """
+    従来の PaperGenerator の整形で使っていた、列の量子化の単位(例: [12, 2.3, 0.03] => 0.01)
+    """
+    max_frac = 0
+    for v in values:
+        try:
+            d = Decimal(str(v))
+        except InvalidOperation:
+            continue
+        if d.is_finite() and d.as_tuple().exponent < 0:
+            max_frac = max(max_frac, -d.as_tuple().exponent)
+    return Decimal(1).scaleb(-max_frac)
+
+
+def legacy_format(columns):
+    result = []
+    for values in columns:
+        quant = legacy_quantize(values)
+        texts = []
+        for value in values:
+            if type(value) is int and quant >= 1:
+                texts.append(str(value))
+            else:
+                texts.append(f'{Decimal(value).quantize(quant):f}')
+        result.append(texts)
+    return result
+
+
+def batch_format(columns):
+    return [format_column(values, get_scale(values)) for values in columns]
+
+
+def make_columns(rows: int, columns: int):
+    random.seed(0)
+    result = []
+    for i in range(columns):
+        if i % 2 == 0:
+            result.append([round(random.uniform(-1000, 1000), random.randint(0, 4)) for _ in range(rows)])
+        else:
+            result.append([random.randint(-10**6, 10**6) for _ in range(rows)])
+    return result
+
+
+def measure(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--columns', type=int, default=5)
+    args = parser.parse_args()
+
+    columns = make_columns(args.rows, args.columns)
+    cells = args.rows * args.columns
+
+    legacy_time, expected = measure(legacy_format, columns)
+    print(f'legacy (Decimal per cell) : {legacy_time:8.3f}s  {cells / legacy_time:12.0f} cells/s')
+
+    batch_time, actual = measure(batch_format, columns)
+    assert actual == expected, 'batch formatting differs from legacy formatting'
+    print(f'batch (list columns)      : {batch_time:8.3f}s  {cells / batch_time:12.0f} cells/s  x{legacy_time / batch_time:.1f}')
+
+    if numpy is not None:
+        arrays = [numpy.array(values) for values in columns]
+        numpy_time, actual = measure(batch_format, arrays)
+        assert actual == expected, 'NumPy formatting differs from legacy formatting'
+        print(f'batch (NumPy columns)     : {numpy_time:8.3f}s  {cells / numpy_time:12.0f} cells/s  x{legacy_time / numpy_time:.1f}')
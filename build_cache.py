@@ -0,0 +1,102 @@
+"""
+PaperGenerator.run の出力のキャッシュ。
+
+文書の入力(表題、著者、要旨、add_* で追加した内容、参照する画像の内容、フォントファイル、
+スタイルのパラメータ、出力に影響する設定)のハッシュをキーにして、生成した PDF をディスクに保存する。
+同じ入力で run した場合は保存した PDF をコピーするだけで終わる。
+
+set_parallel_chapters で章ごとに組む場合は、章の断片も章の内容のハッシュをキーにして保存し、
+変更のない章は組み直さずに再利用する。
+
+    cache = BuildCache('.build_cache', max_bytes=1024**3)
+    pg.set_build_cache(cache)
+    pg.run('paper.pdf')
+    print(cache.stats())
+"""
+import io
+import os
+import pickle
+import shutil
+import threading
+
+from disk_cache import DiskCache, hash_bytes
+
+
+class BuildCache:
+    def __init__(self, directory: str, max_bytes: int = 1024 * 1024 * 1024):
+        self._store = DiskCache(directory, max_bytes)
+        self._lock = threading.Lock()
+        self._counts = {'document_hits': 0, 'document_misses': 0, 'fragment_hits': 0, 'fragment_misses': 0}
+
+    def __getstate__(self):
+        # プロセス間で受け渡せるよう、ロックは渡さない
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def key(self, *chunks):
+        """
+        chunks (bytes または str) から作ったキー
+        """
+        return hash_bytes(*chunks)
+
+    # --- 文書全体 ---
+
+    def restore_document(self, key: str, output):
+        """
+        key の PDF があれば output (パスまたはファイルオブジェクト)に書き出して True を返す
+        """
+        cached = self._store.get(key, '.pdf')
+        if cached is not None:
+            try:
+                if isinstance(output, (str, os.PathLike)):
+                    shutil.copyfile(cached, output)
+                else:
+                    with open(cached, 'rb') as f:
+                        shutil.copyfileobj(f, output)
+            except FileNotFoundError:
+                # 他のプロセスが削除した
+                cached = None
+        self._count('document', cached is not None)
+        return cached is not None
+
+    def save_document(self, key: str, output):
+        """
+        output: 生成した PDF のパスまたは BytesIO
+        """
+        if isinstance(output, io.BytesIO):
+            self._store.put(key, output.getvalue(), '.pdf')
+            return
+        with open(output, 'rb') as f:
+            self._store.put(key, f.read(), '.pdf')
+
+    # --- 章の断片 ---
+
+    def get_fragment(self, key: str):
+        """
+        戻り値: 保存した (PDF, ページ数, 目次の項目)。無ければ None
+        """
+        data = self._store.get_bytes(key, '.fragment')
+        self._count('fragment', data is not None)
+        return pickle.loads(data) if data is not None else None
+
+    def put_fragment(self, key: str, fragment):
+        self._store.put(key, pickle.dumps(fragment, protocol=pickle.HIGHEST_PROTOCOL), '.fragment')
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counts)
+        store = self._store.stats()
+        stats.update(bytes=store['bytes'], max_bytes=store['max_bytes'], evictions=store['evictions'])
+        return stats
+
+    def clear(self):
+        self._store.clear()
+
+    def _count(self, kind: str, hit: bool):
+        with self._lock:
+            self._counts[f'{kind}_hits' if hit else f'{kind}_misses'] += 1
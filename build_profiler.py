@@ -0,0 +1,259 @@
+"""
+PDF 生成の計測。
+
+PaperGenerator.set_profiler で指定すると、run の各段階(本文の組み立て、multiBuild の各パス、
+目次の描画、ファイルへの書き出し)の時間とメモリ確保量、目次の通知にかかった時間、
+flowable ごとの wrap / split / draw の時間とページ数を記録する。
+
+    profiler = BuildProfiler(json_path='build_report.json')
+    pg.set_profiler(profiler)
+    report = pg.run('paper.pdf')
+"""
+from contextlib import contextmanager
+import json
+import time
+import tracemalloc
+
+
+class FlowableStats:
+    __slots__ = ('type', 'chapter', 'wrap', 'split', 'draw', 'calls')
+
+    def __init__(self, type_name: str, chapter: str):
+        self.type = type_name
+        self.chapter = chapter
+        self.wrap = 0.0
+        self.split = 0.0
+        self.draw = 0.0
+        self.calls = 0
+
+    def total(self):
+        return self.wrap + self.split + self.draw
+
+    def to_dict(self):
+        return {
+            'type': self.type,
+            'chapter': self.chapter,
+            'wrap_seconds': self.wrap,
+            'split_seconds': self.split,
+            'draw_seconds': self.draw,
+            'total_seconds': self.total(),
+            'calls': self.calls,
+        }
+
+
+class BuildProfiler:
+    def __init__(self, json_path: str = None, track_allocations: bool = False, slowest: int = 20):
+        """
+        json_path: 指定すると run の終了時に計測結果を JSON で書き出す
+        track_allocations: True の場合、tracemalloc で段階ごとのメモリ確保量を記録する
+        slowest: 記録する時間のかかった flowable の数
+        """
+        self.json_path = json_path
+        self.track_allocations = track_allocations
+        self.slowest = slowest
+        self._reset()
+
+    def _reset(self):
+        self._phases = []
+        self._flowables = []
+        self._spooled = []
+        self._restore = []
+        self._passes = 0
+        self._pages = 0
+        self._toc_notifications = 0
+        self._toc_seconds = 0.0
+        self._pass_phase = None
+        self._started = None
+        self._report = None
+        self._tracing = False
+        self._notes = []
+
+    # --- run の開始と終了 ---
+
+    def start(self):
+        self._reset()
+        if self.track_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+        self._started = time.perf_counter()
+
+    def finish(self):
+        """
+        計測を終了し、結果の dict を返す
+        """
+        total = time.perf_counter() - self._started
+        self._stop()
+
+        by_type = {}
+        for stats in self._flowables:
+            entry = by_type.setdefault(stats.type, {
+                'count': 0, 'wrap_seconds': 0.0, 'split_seconds': 0.0, 'draw_seconds': 0.0})
+            entry['count'] += 1
+            entry['wrap_seconds'] += stats.wrap
+            entry['split_seconds'] += stats.split
+            entry['draw_seconds'] += stats.draw
+        slowest = sorted(self._flowables, key=lambda stats: stats.total(), reverse=True)[:self.slowest]
+
+        self._report = {
+            'total_seconds': total,
+            'pages': self._pages,
+            'passes': self._passes,
+            'phases': self._phases,
+            'toc_notifications': {'count': self._toc_notifications, 'seconds': self._toc_seconds},
+            'flowables_by_type': by_type,
+            'slowest_flowables': [stats.to_dict() for stats in slowest],
+            'notes': self._notes,
+        }
+        if self.json_path:
+            with open(self.json_path, 'w', encoding='utf-8') as f:
+                json.dump(self._report, f, ensure_ascii=False, indent=2)
+        return self._report
+
+    def abort(self):
+        """
+        run が失敗した場合に計測を終了する。結果は作らない
+        """
+        self._stop()
+
+    def _stop(self):
+        # 差し替えた flowable のメソッドを元に戻す
+        for flowable, names in self._restore:
+            for name in names:
+                flowable.__dict__.pop(name, None)
+        self._restore = []
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+
+    def report(self):
+        return self._report
+
+    # --- 段階ごとの計測 ---
+
+    @contextmanager
+    def phase(self, name: str):
+        self._begin_phase(name)
+        try:
+            yield
+        finally:
+            self._end_phase()
+
+    def _begin_phase(self, name: str):
+        entry = {'name': name, 'seconds': 0.0}
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+            entry['_memory'] = tracemalloc.get_traced_memory()[0]
+        entry['_start'] = time.perf_counter()
+        self._phases.append(entry)
+
+    def _end_phase(self):
+        entry = self._phases[-1]
+        entry['seconds'] = time.perf_counter() - entry.pop('_start')
+        if '_memory' in entry:
+            current, peak = tracemalloc.get_traced_memory()
+            before = entry.pop('_memory')
+            entry['allocated_bytes'] = current - before
+            entry['peak_bytes'] = peak - before
+
+    # --- MyDocTemplate からの通知 ---
+
+    def attach(self, doc):
+        """
+        doc の各パス(build の呼び出し)とファイルへの書き出しを計測する
+        """
+        def on_progress(kind, value):
+            if kind == 'STARTED':
+                self._passes += 1
+                self._begin_phase(f'pass {self._passes}')
+            elif kind == 'FINISHED':
+                self._end_phase()
+                self._pages = doc.canv.getPageNumber() - 1
+        doc.setProgressCallBack(on_progress)
+
+    def attach_canvas(self, canvas):
+        save = canvas.save
+
+        def timed_save():
+            with self.phase('write'):
+                save()
+        canvas.save = timed_save
+
+    def set_pages(self, pages: int, passes: int):
+        """
+        doc の通知を使わずに組んだ場合(章の並列化など)のページ数とパス数
+        """
+        self._pages = pages
+        self._passes = passes
+
+    def add_note(self, text: str):
+        """
+        計測できなかった内容などの注記を結果に加える
+        """
+        self._notes.append(text)
+
+    def add_toc_notification(self, seconds: float):
+        self._toc_notifications += 1
+        self._toc_seconds += seconds
+
+    # --- flowable ごとの計測 ---
+
+    def instrument(self, flowables, chapter_levels: dict, chapter: str = None, position: int = None):
+        """
+        flowables の wrap / split / drawOn を計測するものに差し替える。
+        章の見出しの Paragraph を手がかりに、各 flowable がどの章のものかを記録する。
+        chapter: flowables の先頭の章(本文を少しずつ展開する場合、前の部分の最後の章)
+        position: ディスクから展開した本文の flowable の場合、その通し番号。
+                  multiBuild のパスごとに作り直される flowable を、前のパスの同じ番号の計測に合算する
+        戻り値: flowables の最後の章
+        """
+        for i, flowable in enumerate(flowables):
+            if flowable.__class__.__name__ == 'Paragraph' and flowable.style.name in chapter_levels:
+                chapter = flowable.getPlainText()
+            if 'wrap' in flowable.__dict__:
+                # 同じ run の前のパスで差し替え済み
+                continue
+            if position is not None and position + i < len(self._spooled):
+                stats = self._spooled[position + i]
+            else:
+                stats = FlowableStats(flowable.__class__.__name__, chapter)
+                self._flowables.append(stats)
+                if position is not None:
+                    self._spooled.append(stats)
+            self._instrument(flowable, stats)
+        return chapter
+
+    def _instrument(self, flowable, stats):
+        wrap, split, draw_on = flowable.wrap, flowable.split, flowable.drawOn
+        profiler = self
+
+        def timed_wrap(*args, **kw):
+            start = time.perf_counter()
+            try:
+                return wrap(*args, **kw)
+            finally:
+                stats.wrap += time.perf_counter() - start
+                stats.calls += 1
+
+        def timed_split(*args, **kw):
+            start = time.perf_counter()
+            try:
+                parts = split(*args, **kw)
+            finally:
+                stats.split += time.perf_counter() - start
+            # 分割された後の部分も、元の flowable の時間として数える
+            for part in parts:
+                if part is not flowable:
+                    profiler._instrument(part, stats)
+            return parts
+
+        def timed_draw_on(*args, **kw):
+            start = time.perf_counter()
+            try:
+                return draw_on(*args, **kw)
+            finally:
+                stats.draw += time.perf_counter() - start
+
+        flowable.wrap = timed_wrap
+        flowable.split = timed_split
+        flowable.drawOn = timed_draw_on
+        self._restore.append((flowable, ('wrap', 'split', 'drawOn')))
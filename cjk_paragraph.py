@@ -0,0 +1,205 @@
+"""
+日本語の本文用の段落。
+
+Paragraph は行を組むたびに文字列の幅を求め直し、multiBuild のパスごとに組み直す。
+CJKParagraph は次のようにして行を組む時間を短くする。
+
+- 文字の幅はフォントごとに1回だけ求めて覚えておく
+- 段落の文字の幅の累積和を1回だけ作り、各行の末尾は二分探索で求める
+- 禁則(行頭・行末に置けない文字、英数字の単語の途中)は行の末尾から数文字戻るだけで処理する
+- 組んだ結果はフレームの幅ごとに覚えておく(multiBuild の次のパスでは組み直さない)
+
+マークアップは解釈しない。本文に '<' や '&' を含む場合は Paragraph を使う(create_paragraph)。
+フレームに収まらない段落は、行の境界で分割して次のフレームに送る。
+"""
+from bisect import bisect_right
+from itertools import accumulate
+import re
+
+from reportlab import rl_config
+from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_RIGHT
+from reportlab.pdfbase.pdfmetrics import getAscent, stringWidth
+from reportlab.platypus import Flowable, Paragraph
+
+# 行頭に置かない文字
+NO_START = set(
+    '、。，．・：；？！゛゜ヽヾゝゞ々ー〜…‥'
+    '）〕］｝〉》」』】’”'
+    'ぁぃぅぇぉっゃゅょゎゕゖァィゥェォッャュョヮヵヶ'
+    ',.:;?!)]}%'
+)
+# 行末に置かない文字
+NO_END = set('（〔［｛〈《「『【‘“([{')
+# 行末からはみ出して置く(ぶら下げる)文字
+HANGING = set('、。，．,.')
+
+# 1行の末尾から禁則のために戻る文字数の上限(これを超える場合は禁則を諦める)
+_MAX_BACKTRACK = 8
+_SPACES = re.compile(r'[ \t\r\n]+')
+
+# {フォント名: {文字: フォントサイズ 1 での幅}}
+_glyph_widths = {}
+
+
+def glyph_widths(font_name: str, text: str):
+    """
+    text の各文字のフォントサイズ 1 での幅のリスト。幅はフォントごとに覚えておく
+    """
+    table = _glyph_widths.setdefault(font_name, {})
+    try:
+        return [table[c] for c in text]
+    except KeyError:
+        for c in set(text).difference(table):
+            table[c] = stringWidth(c, font_name, 1)
+        return [table[c] for c in text]
+
+
+def _is_word(c: str):
+    # 英数字の単語は途中で改行しない
+    return c.isascii() and (c.isalnum() or c in '-_\'/@#$%+*=')
+
+
+def create_paragraph(text: str, style):
+    """
+    マークアップを含まない text は CJKParagraph、含む場合は Paragraph にする
+    """
+    if '<' in text or '&' in text:
+        return Paragraph(text, style)
+    return CJKParagraph(text, style)
+
+
+class CJKParagraph(Flowable):
+    def __init__(self, text: str, style, _first_line: bool = True, _widths=None):
+        Flowable.__init__(self)
+        self.style = style
+        self.text = text if _widths is not None else _SPACES.sub(' ', text).strip(' ')
+        self._first_line = _first_line
+        if _widths is None:
+            _widths = glyph_widths(style.fontName, self.text)
+        self._widths = _widths
+        # 累積和の先頭は 0
+        self._offsets = list(accumulate(_widths, initial=0))
+        self._wrapped = {}  # {幅: 行の (開始, 終了) のリスト}
+        self._lines = []
+
+    def __repr__(self):
+        return f'CJKParagraph({self.text[:20]!r}...)'
+
+    def getPlainText(self):
+        return self.text
+
+    def wrap(self, availWidth, availHeight):
+        self.width = availWidth
+        self._lines = self._wrap_lines(availWidth)
+        self.height = len(self._lines) * self.style.leading
+        return self.width, self.height
+
+    def split(self, availWidth, availHeight):
+        lines = self._wrap_lines(availWidth)
+        count = int((availHeight + 1e-6) // self.style.leading)
+        if count <= 0:
+            return []
+        if count >= len(lines):
+            return [self]
+        end = lines[count][0]
+        first = CJKParagraph(self.text[:end], self.style, self._first_line, self._widths[:end])
+        rest = CJKParagraph(self.text[end:], self.style, False, self._widths[end:])
+        # Paragraph の分割と同じく、分割した間には余白を入れない
+        first.spaceAfter = 0
+        rest.spaceBefore = 0
+        return [first, rest]
+
+    def _wrap_lines(self, availWidth):
+        lines = self._wrapped.get(availWidth)
+        if lines is None:
+            lines = self._wrapped[availWidth] = self._break_lines(availWidth)
+        return lines
+
+    def _line_width(self, availWidth, first: bool):
+        style = self.style
+        width = availWidth - style.leftIndent - style.rightIndent
+        if first:
+            width -= style.firstLineIndent
+        return width / style.fontSize
+
+    def _break_lines(self, availWidth):
+        text = self.text
+        offsets = self._offsets
+        size = len(text)
+        lines = []
+        start = 0
+        first = self._first_line
+        while start < size:
+            while start < size and text[start] == ' ':
+                start += 1
+            if start >= size:
+                break
+            # start から入る文字数を累積和の二分探索で求める
+            end = bisect_right(offsets, offsets[start] + self._line_width(availWidth, first) + 1e-9) - 1
+            if end >= size:
+                lines.append((start, size))
+                break
+            end = self._adjust_break(start, max(end, start + 1))
+            lines.append((start, end))
+            start = end
+            first = False
+        return lines
+
+    def _adjust_break(self, start: int, end: int):
+        """
+        end の文字から次の行にする場合の禁則を処理した、次の行の開始位置
+        """
+        text = self.text
+        if text[end] == ' ':
+            return end
+        if text[end] in HANGING and (end + 1 >= len(text) or text[end + 1] not in NO_START):
+            return end + 1
+        lower = max(start + 1, end - _MAX_BACKTRACK)
+        position = end
+        while position > lower and not self._can_break(position):
+            position -= 1
+        return position if self._can_break(position) else end
+
+    def _can_break(self, position: int):
+        text = self.text
+        before, after = text[position - 1], text[position]
+        if after in NO_START or before in NO_END:
+            return False
+        return not (_is_word(before) and _is_word(after))
+
+    def draw(self):
+        style = self.style
+        canvas = self.canv
+        text = self.text
+        offsets = self._offsets
+        font_size = style.fontSize
+        if rl_config.paraFontSizeHeightOffset:
+            y = self.height - font_size
+        else:
+            y = self.height - getAscent(style.fontName, font_size)
+        canvas.setFillColor(style.textColor)
+        tx = canvas.beginText()
+        tx.setFont(style.fontName, font_size, style.leading)
+        first = self._first_line
+        last = len(self._lines) - 1
+        for i, (start, end) in enumerate(self._lines):
+            # 行末の空白は幅に含めない
+            stop = end
+            while stop > start and text[stop - 1] == ' ':
+                stop -= 1
+            x = style.leftIndent + (style.firstLineIndent if first else 0)
+            available = self._line_width(self.width, first) * font_size
+            used = (offsets[stop] - offsets[start]) * font_size
+            char_space = 0
+            if style.alignment == TA_CENTER:
+                x += (available - used) / 2
+            elif style.alignment == TA_RIGHT:
+                x += available - used
+            elif style.alignment == TA_JUSTIFY and i < last and stop - start > 1 and used < available:
+                char_space = (available - used) / (stop - start - 1)
+            tx.setTextOrigin(x, y)
+            tx.setCharSpace(char_space)
+            tx.textOut(text[start:stop])
+            y -= style.leading
+            first = False
+        canvas.drawText(tx)
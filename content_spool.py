@@ -0,0 +1,59 @@
+"""
+本文の内容をディスクに書き出しておくためのファイル。
+
+内容は document_model のノードで、pickle にして追記し、
+ファイル上の位置を指定して順に読み出す。
+"""
+import os
+import pickle
+import tempfile
+
+
+class ContentSpool:
+    def __init__(self, path: str = None):
+        if path is None:
+            fd, path = tempfile.mkstemp(prefix='paper_generator_', suffix='.spool')
+            os.close(fd)
+            self._temporary = True
+        else:
+            self._temporary = False
+        self.path = path
+        self.count = 0
+        self._writer = open(path, 'wb')
+        self._reader = None
+
+    def append(self, record):
+        pickle.dump(record, self._writer, protocol=pickle.HIGHEST_PROTOCOL)
+        self.count += 1
+
+    def read(self, offset: int, count: int):
+        """
+        offset の位置から最大 count 件を読み出す。
+        戻り値: (読み出した内容のリスト, 次の位置)
+        """
+        if not self._writer.closed:
+            self._writer.flush()
+        if self._reader is None:
+            self._reader = open(self.path, 'rb')
+        self._reader.seek(offset)
+        records = []
+        for _ in range(count):
+            try:
+                records.append(pickle.load(self._reader))
+            except EOFError:
+                break
+        return records, self._reader.tell()
+
+    def close(self):
+        self._writer.close()
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+        if self._temporary and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
@@ -0,0 +1,175 @@
+"""
+ディスク上のキャッシュ。キーごとに1ファイルを保存し、合計サイズが上限を超えたら
+最後に使われた時刻(mtime)が古いものから削除する(LRU)。
+複数のプロセスから同じディレクトリを共有しても壊れないよう、書き込みは一時ファイルからの
+置き換えで行い、他のプロセスが削除したファイルは無視する。
+"""
+import hashlib
+import os
+import tempfile
+import threading
+
+
+def hash_bytes(*chunks):
+    """
+    chunks (bytes または str) をまとめた sha256 の16進文字列
+    """
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        digest.update(chunk)
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def hash_file(path: str):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+_file_digests = {}      # {(パス, サイズ, 更新時刻): 内容のハッシュ}
+_file_digests_lock = threading.Lock()
+
+
+def digest_file(path: str):
+    """
+    hash_file と同じだが、サイズと更新時刻が変わっていないファイルは前回の結果を返す
+    """
+    stat = os.stat(path)
+    file_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _file_digests_lock:
+        digest = _file_digests.get(file_key)
+    if digest is None:
+        digest = hash_file(path)
+        with _file_digests_lock:
+            _file_digests[file_key] = digest
+    return digest
+
+
+class DiskCache:
+    def __init__(self, directory: str, max_bytes: int = 512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(size for _, size, _ in self._entries())
+
+    def __getstate__(self):
+        # プロセス間で受け渡せるよう、ロックは渡さない
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def path_of(self, key: str, suffix: str = ''):
+        return os.path.join(self.directory, key + suffix)
+
+    def get(self, key: str, suffix=''):
+        """
+        キャッシュされたファイルのパスを返す。無ければ None。
+        suffix: 拡張子、または候補の拡張子のタプル(最初に見つかったものを返し、ヒット・ミスは1回と数える)
+        """
+        for suffix in ((suffix,) if isinstance(suffix, str) else suffix):
+            path = self.path_of(key, suffix)
+            try:
+                # 使われた時刻を更新し、LRU の順番を後ろにする
+                os.utime(path)
+            except FileNotFoundError:
+                continue
+            with self._lock:
+                self.hits += 1
+            return path
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def get_bytes(self, key: str, suffix: str = ''):
+        path = self.get(key, suffix)
+        if path is None:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, data: bytes, suffix: str = ''):
+        """
+        data を保存してそのパスを返す
+        """
+        path = self.path_of(key, suffix)
+        fd, temp = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        try:
+            previous = os.path.getsize(path)
+        except FileNotFoundError:
+            previous = 0
+        os.replace(temp, path)
+        with self._lock:
+            self._size += len(data) - previous
+        self._evict(keep=path)
+        return path
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+            }
+
+    def clear(self):
+        for path, _, _ in self._entries():
+            self._remove(path)
+        with self._lock:
+            self._size = 0
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.startswith('.tmp-'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _remove(self, path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _evict(self, keep: str = None):
+        if self._size <= self.max_bytes:
+            return
+        # 他のプロセスの書き込みも反映するため、ディレクトリから数え直す
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        size = sum(entry[1] for entry in entries)
+        for path, entry_size, _ in entries:
+            if size <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            self._remove(path)
+            size -= entry_size
+            with self._lock:
+                self.evictions += 1
+        with self._lock:
+            self._size = size
@@ -0,0 +1,350 @@
+"""
+PaperGeneratorInterface の各実装が共有する文書モデル。
+
+set_title や add_chapter などで与えられた内容を、そのまま小さなノードとして記録する。
+flowable や LaTeX への変換は run の時点で各実装が行うため、同じ Document を
+何度でも、また別の実装でも出力できる。
+
+ノードは __slots__ を持ち、pickle では (クラス, 引数のタプル) になる。
+Document.to_bytes / Document.from_bytes でワーカープロセスへの受け渡しやキャッシュに使える。
+
+章・図・表の番号は文書の構造として追加時に決める。
+"""
+import pickle
+
+from table_formatter import to_columns, get_scale, format_column
+import plot_decimation
+
+CHAPTER_LEVELS = 8
+
+
+class AuthorNode:
+    __slots__ = ('name', 'organization')
+
+    def __init__(self, name: str, organization: str):
+        self.name = name
+        self.organization = organization
+
+    def __reduce__(self):
+        return (AuthorNode, (self.name, self.organization))
+
+    def __str__(self):
+        return f'{self.name}, {self.organization}'
+
+
+class RefNode:
+    __slots__ = ('author', 'title', 'year')
+
+    def __init__(self, author: str, title: str, year: int = None):
+        self.author = author
+        self.title = title
+        self.year = year
+
+    def __reduce__(self):
+        return (RefNode, (self.author, self.title, self.year))
+
+    def __str__(self):
+        if self.year == None:
+            return f'{self.author}, {self.title}.'
+        return f'{self.author}, {self.title}, {self.year}.'
+
+
+class ChapterNode:
+    __slots__ = ('rank', 'title', 'number')
+
+    def __init__(self, rank: int, title: str, number: str):
+        """
+        number: 章番号(例: '2.1')
+        """
+        self.rank = rank
+        self.title = title
+        self.number = number
+
+    def __reduce__(self):
+        return (ChapterNode, (self.rank, self.title, self.number))
+
+    def heading(self):
+        """
+        番号付きの見出し(例: '2.1. 見出し')
+        """
+        return f'{self.number}. {self.title}'
+
+
+class SentenceNode:
+    __slots__ = ('text',)
+
+    def __init__(self, text: str):
+        self.text = text
+
+    def __reduce__(self):
+        return (SentenceNode, (self.text,))
+
+
+class ImageNode:
+    __slots__ = ('path', 'title', 'index')
+
+    def __init__(self, path: str, title: str, index: int):
+        self.path = path
+        self.title = title
+        self.index = index
+
+    def __reduce__(self):
+        return (ImageNode, (self.path, self.title, self.index))
+
+
+class TableNode:
+    __slots__ = ('columns', 'title', 'index', 'texts')
+
+    def __init__(self, columns: list, title: str, index: int, texts: list = None):
+        """
+        columns: [(見出し, 値の列)]
+        texts: 列ごとの数値の文字列(format_texts)。Document.format_tables で求めておく
+        """
+        self.columns = columns
+        self.title = title
+        self.index = index
+        self.texts = texts
+
+    def __reduce__(self):
+        return (TableNode, (self.columns, self.title, self.index, self.texts))
+
+    def format_texts(self):
+        """
+        列ごとに、数値を小数部の桁数をそろえた文字列にしたリスト(数値でないセルは None)
+        """
+        if self.texts is not None:
+            return self.texts
+        return [format_column(values, get_scale(values)) for _, values in self.columns]
+
+    def rows(self):
+        """
+        見出しを1行目とする行のリスト
+        """
+        return [[header for header, _ in self.columns]] + [list(row) for row in zip(*[values for _, values in self.columns])]
+
+
+class PlotNode:
+    __slots__ = ('kind', 'series', 'labels', 'title', 'index')
+
+    def __init__(self, kind: str, series: list, labels: list, title: str, index: int):
+        """
+        kind: 'line'、'scatter' または 'bar'
+        series: 間引いた後の系列ごとの (x のリスト, y のリスト)。棒グラフの x は棒の位置
+        labels: 棒グラフの棒の名前(なければ None)
+        index: 図番号(add_image の図と同じ番号の列)
+        """
+        self.kind = kind
+        self.series = series
+        self.labels = labels
+        self.title = title
+        self.index = index
+
+    def __reduce__(self):
+        return (PlotNode, (self.kind, self.series, self.labels, self.title, self.index))
+
+
+class SlotNode:
+    __slots__ = ('name',)
+
+    def __init__(self, name: str):
+        """
+        name: ReportTemplate で内容を差し込む位置の名前
+        """
+        self.name = name
+
+    def __reduce__(self):
+        return (SlotNode, (self.name,))
+
+
+def split_chapters(nodes):
+    """
+    本文のノードを最上位の章(レベル 0)ごとのリストに分ける。
+    最初の章より前のノードがあれば、それも1つのリストとする。
+    """
+    chapters = []
+    for node in nodes:
+        if not chapters or (isinstance(node, ChapterNode) and node.rank == 0):
+            chapters.append([])
+        chapters[-1].append(node)
+    return chapters
+
+
+class Document:
+    def __init__(self, title: str = '', abstract: str = ''):
+        self.title = title
+        self.sub_title = None
+        self.abstract = abstract
+        self.double_column = False
+        self.authors = []
+        self.refs = []
+        self.headings = []          # [(レベル, 番号付きの見出し)]
+        self.images = {}            # {題名: 図番号}
+        self.tables = {}            # {題名: 表番号}
+        self._contents = []
+        self._spool = None
+        self._chapter_numbers = [0] * CHAPTER_LEVELS
+
+    def set_spool(self, spool):
+        """
+        spool: ContentSpool。指定すると本文のノードをメモリに持たず、ディスクに書き出す。
+               None の場合はメモリに戻す。それまでに追加したノードも移し替える。
+        """
+        nodes = list(self.contents())
+        if self._spool is not None:
+            self._spool.close()
+        self._spool = spool
+        self._contents = []
+        for node in nodes:
+            self._append(node)
+
+    @property
+    def spool(self):
+        return self._spool
+
+    # --- 内容の追加 ---
+
+    def add_author(self, name: str, organization: str):
+        self.authors.append(AuthorNode(name, organization))
+
+    def add_ref(self, author: str, title: str, year: int = None):
+        self.refs.append(RefNode(author, title, year))
+
+    def add_chapter(self, title: str, rank: int = 0):
+        self._chapter_numbers[rank] += 1
+        number = '.'.join([str(d) for d in self._chapter_numbers[:rank + 1]])
+        for i in range(rank + 1, len(self._chapter_numbers)):
+            self._chapter_numbers[i] = 0
+        node = ChapterNode(rank, title, number)
+        self.headings.append((rank, node.heading()))
+        self._append(node)
+        return node
+
+    def add_sentence(self, text: str):
+        node = SentenceNode(text)
+        self._append(node)
+        return node
+
+    def add_image(self, path: str, title: str):
+        node = ImageNode(path, title, len(self.images) + 1)
+        self._append(node)
+        if title in self.images:
+            print(f'{title} is already registed.')
+        else:
+            self.images[title] = node.index
+        return node
+
+    def add_plot(self, x, y, title: str, kind: str = 'line', decimation: str = 'minmax', columns: int = None):
+        """
+        点は追加時に plot_decimation で間引く。図番号は add_image の図と同じ番号の列で付ける
+        """
+        if kind not in plot_decimation.KINDS:
+            raise ValueError(f'{kind} is not a kind of plot. Use one of {", ".join(plot_decimation.KINDS)}.')
+        if columns is not None and columns < 3:
+            raise ValueError(f'columns must be 3 or more, not {columns}.')
+        ys = plot_decimation.split_series(y)
+        if x is not None:
+            # x は系列ごとに使うため、イテレータはリストにしておく
+            x = x if hasattr(x, '__len__') else list(x)
+            for i, values in enumerate(ys):
+                if len(values) != len(x):
+                    raise ValueError(f'Series {i + 1} of {title} has {len(values)} points but x has {len(x)}.')
+        series = []
+        labels = None
+        if kind == 'bar':
+            columns = columns or plot_decimation.BAR_COLUMNS
+            if len({len(values) for values in ys}) > 1:
+                raise ValueError(f'The bar series of {title} must have the same length.')
+            positions, bars = plot_decimation.decimate_bars(ys, columns)
+            series = [(positions, values) for values in bars]
+            if x is not None:
+                names = list(x)
+                labels = [str(names[i]) for i in positions]
+        elif kind == 'scatter':
+            columns = columns or plot_decimation.SCATTER_COLUMNS
+            for values in ys:
+                series.append(plot_decimation.decimate_scatter(x, values, columns))
+        else:
+            columns = columns or plot_decimation.COLUMNS
+            for values in ys:
+                series.append(plot_decimation.decimate(x, values, columns, decimation))
+        for i, (_, values) in enumerate(series):
+            # 空の系列は ReportLab で描けない(折れ線は Polyline の作成に失敗する)
+            if not values:
+                raise ValueError(f'Series {i + 1} of {title} has no finite points to plot.')
+        node = PlotNode(kind, series, labels, title, len(self.images) + 1)
+        self._append(node)
+        if title in self.images:
+            print(f'{title} is already registed.')
+        else:
+            self.images[title] = node.index
+        return node
+
+    def add_table(self, data, title: str):
+        """
+        data: 1行目を見出しとする行のリスト、列名→値の列の dict、
+              または名前付きフィールドを持つ NumPy の構造化配列
+        空の表は追加せず None を返す
+        """
+        columns = to_columns(data)
+        if len(columns) == 0:
+            return None
+        node = TableNode(columns, title, len(self.tables) + 1)
+        self._append(node)
+        if title in self.tables:
+            print(f'{title} is already registed.')
+        else:
+            self.tables[title] = node.index
+        return node
+
+    def add_slot(self, name: str):
+        node = SlotNode(name)
+        self._append(node)
+        return node
+
+    def _append(self, node):
+        if self._spool is not None:
+            self._spool.append(node)
+        else:
+            self._contents.append(node)
+
+    # --- 内容の参照 ---
+
+    def contents(self, batch: int = 256):
+        """
+        本文のノードを追加した順に返すイテレータ
+        """
+        if self._spool is None:
+            yield from self._contents
+            return
+        offset = 0
+        while True:
+            nodes, offset = self._spool.read(offset, batch)
+            if not nodes:
+                return
+            yield from nodes
+
+    # --- シリアライズ ---
+
+    def format_tables(self):
+        """
+        表の数値の文字列を求めて TableNode に保持する。
+        同じ文書を複数の実装で出力する場合に、整形を1回で済ませるために使う。
+        set_spool でディスクに書き出した本文には保持されない
+        """
+        for node in self.contents():
+            if isinstance(node, TableNode) and node.texts is None:
+                node.texts = node.format_texts()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # ディスクに書き出した本文も読み込んで含める
+        state['_contents'] = list(self.contents())
+        state['_spool'] = None
+        return state
+
+    def to_bytes(self):
+        return pickle.dumps(self, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def from_bytes(data):
+        return pickle.loads(data)
@@ -0,0 +1,122 @@
+"""
+プロセス全体で共有するフォントの登録先。
+
+TTFont の生成は TTF ファイル全体を読み込んで解析するため重い。
+(フォント名, フォントファイル) の組ごとに1回だけ読み込み、以降は登録済みのフォントを返す。
+
+fork する前(例えばプロセスプールを作る前)に prewarm しておくと、
+解析済みのフォントをワーカープロセスが copy-on-write で共有できる。
+環境変数 PAPER_GENERATOR_FONTS に "名前=パス" (CID フォントは名前のみ) を
+os.pathsep 区切りで指定すると、import 時に読み込む。
+"""
+import os
+import threading
+import time
+
+
+class FontRegistry:
+    def __init__(self):
+        self._fonts = {}        # {(name, path): font}
+        self._load_times = {}   # {(name, path): 読み込みにかかった秒数}
+        self._subset_cache = None
+        self._lock = threading.Lock()
+
+    def register(self, font: str, path_to_font: str = None):
+        """
+        フォントを登録して返す。同じ (名前, パス) の組が登録済みならそれを返す。
+        """
+        key = (font, os.path.abspath(path_to_font) if path_to_font else None)
+        with self._lock:
+            if key in self._fonts:
+                return self._fonts[key]
+            for name, path in self._fonts:
+                if name == font:
+                    print(f'{font} is already registed with {path}. It is replaced with {path_to_font}.')
+            # ReportLab のフォントまわりは最初に登録する時に読み込む
+            from reportlab.pdfbase import pdfmetrics
+            from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+            from reportlab.pdfbase.ttfonts import TTFont
+            start = time.perf_counter()
+            if path_to_font:
+                loaded = TTFont(font, path_to_font)
+            else:
+                loaded = UnicodeCIDFont(font)
+            pdfmetrics.registerFont(loaded)
+            if path_to_font and self._subset_cache is not None:
+                self._subset_cache.install(loaded, path_to_font)
+                self._subset_cache.prebuild(loaded)
+            self._fonts[key] = loaded
+            self._load_times[key] = time.perf_counter() - start
+            return loaded
+
+    def prewarm(self, fonts):
+        """
+        fonts: [(名前, パス)] または [名前] のリスト
+        """
+        for font in fonts:
+            if isinstance(font, str):
+                self.register(font)
+            else:
+                self.register(*font)
+
+    def set_subset_cache(self, cache, prebuild: bool = True):
+        """
+        登録済みと今後登録する TTF のサブセットを cache (font_subset_cache.SubsetCache) 経由で作る。
+        prebuild: cache.common_glyphs のサブセットを今作っておく
+        """
+        with self._lock:
+            self._subset_cache = cache
+            fonts = [(path, font) for (_, path), font in self._fonts.items() if path]
+        for path, font in fonts:
+            cache.install(font, path)
+            if prebuild:
+                cache.prebuild(font)
+
+    def subset_cache(self):
+        return self._subset_cache
+
+    def is_registered(self, font: str, path_to_font: str = None):
+        return (font, os.path.abspath(path_to_font) if path_to_font else None) in self._fonts
+
+    def load_times(self):
+        """
+        戻り値: {(名前, パス): 読み込みにかかった秒数}
+        """
+        with self._lock:
+            return dict(self._load_times)
+
+    def total_load_time(self):
+        return sum(self.load_times().values())
+
+
+def _parse_fonts(value: str):
+    fonts = []
+    for entry in value.split(os.pathsep):
+        entry = entry.strip()
+        if not entry:
+            continue
+        if '=' in entry:
+            name, path = entry.split('=', 1)
+            fonts.append((name, path))
+        else:
+            fonts.append(entry)
+    return fonts
+
+
+font_registry = FontRegistry()
+
+
+def register_font(font: str, path_to_font: str = None):
+    return font_registry.register(font, path_to_font)
+
+
+def prewarm(fonts):
+    font_registry.prewarm(fonts)
+
+
+def set_subset_cache(cache, prebuild: bool = True):
+    font_registry.set_subset_cache(cache, prebuild)
+
+
+if os.environ.get('PAPER_GENERATOR_FONTS'):
+    prewarm(_parse_fonts(os.environ['PAPER_GENERATOR_FONTS']))
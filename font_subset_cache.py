@@ -0,0 +1,177 @@
+"""
+TrueType フォントのサブセットのキャッシュ。
+
+path_to_font で TTF を使うと、ReportLab は文書ごとに使われた文字から 256 文字ずつの
+サブセットを作って埋め込む。サブセットの作成は文書ごとに最初からやり直すため、
+大きな日本語フォントでは重い。ここではサブセットのフォントデータを
+(フォントファイルのハッシュ, サブセットの文字の並び) をキーにしてメモリとディスクに保存する。
+
+サブセットに文字が割り当てられる順番は文書ごとに異なるため、そのままでは同じサブセットは
+あまり現れない。common_glyphs を指定すると、各文書でまずその文字(例: JIS 第1水準の漢字)を
+決まった順番でサブセットに割り当てるため、文書をまたいで同じサブセットが使われる。
+その代わり、使われていない共通の文字も埋め込まれる。
+
+    cache = SubsetCache('.subset_cache', common_glyphs=jis_level1_text())
+    set_subset_cache(cache)           # font_registry で登録したすべての TTF に適用する
+    ...
+    print(cache.stats())              # フォントごとの作成数、ヒット数、埋め込んだバイト数
+"""
+from collections import OrderedDict
+import threading
+import time
+
+from disk_cache import DiskCache, hash_bytes, digest_file
+
+
+def _jis_rows(rows):
+    chars = []
+    for row in rows:
+        for cell in range(1, 95):
+            try:
+                chars.append(bytes([0xA0 + row, 0xA0 + cell]).decode('euc_jp'))
+            except UnicodeDecodeError:
+                pass
+    return ''.join(chars)
+
+
+def ascii_text():
+    return ''.join(chr(c) for c in range(0x21, 0x7F))
+
+
+def kana_text():
+    """
+    JIS X 0208 の記号、英数字、ひらがな、カタカナ(1～5区)
+    """
+    return _jis_rows(range(1, 6))
+
+
+def jis_level1_text():
+    """
+    ASCII、kana_text と JIS 第1水準の漢字(16～47区)
+    """
+    return ascii_text() + kana_text() + _jis_rows(range(16, 48))
+
+
+# batch_generator の --common-glyphs で選べる文字
+COMMON_GLYPHS = {
+    'ascii': ascii_text,
+    'kana': lambda: ascii_text() + kana_text(),
+    'jis1': jis_level1_text,
+}
+
+
+class SubsetCache:
+    def __init__(self, directory: str = None, max_bytes: int = 256 * 1024 * 1024,
+                 memory_items: int = 256, common_glyphs: str = None):
+        """
+        directory: 指定するとディスクにも保存し、プロセスをまたいで再利用する
+        memory_items: メモリに保持するサブセットの数
+        common_glyphs: 各文書で最初にサブセットへ割り当てる文字
+        """
+        self._store = DiskCache(directory, max_bytes) if directory else None
+        self.memory_items = memory_items
+        self.common_glyphs = common_glyphs
+        self._memory = OrderedDict()
+        self._fonts = {}    # {フォント名: 統計}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # プロセス間で受け渡せるよう、ロックは渡さない
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def install(self, font, path_to_font: str):
+        """
+        font (TTFont) のサブセットの作成をこのキャッシュ経由にする
+        """
+        face = font.face
+        if getattr(face, '_subset_cache', None) is self:
+            return
+        make_subset = face.__class__.makeSubset
+        split_string = font.__class__.splitString
+        font_digest = digest_file(path_to_font)
+        name = font.fontName
+        cache = self
+        with self._lock:
+            self._fonts.setdefault(name, {'subsets': 0, 'hits': 0, 'misses': 0, 'bytes': 0, 'seconds': 0.0})
+
+        def cached_make_subset(subset):
+            return cache._get(name, font_digest, subset, lambda: make_subset(face, subset))
+
+        def seeded_split_string(text, doc, encoding='utf-8'):
+            if cache.common_glyphs and doc not in font.state:
+                # 文書で最初の文字列の前に、共通の文字を決まった順番で割り当てる
+                split_string(font, cache.common_glyphs, doc)
+            return split_string(font, text, doc, encoding)
+
+        face.makeSubset = cached_make_subset
+        face._subset_cache = self
+        font.splitString = seeded_split_string
+
+    def prebuild(self, font):
+        """
+        common_glyphs のサブセットを作っておく。fork する前に呼ぶとワーカーでも再利用できる
+        """
+        if not self.common_glyphs:
+            return 0
+
+        class _Document:
+            pass
+        doc = _Document()
+        font.splitString('', doc)
+        subsets = font.state.pop(doc).subsets
+        for subset in subsets:
+            font.face.makeSubset(subset)
+        return len(subsets)
+
+    def stats(self):
+        """
+        戻り値: {フォント名: {'subsets': 埋め込んだサブセットの数, 'hits', 'misses',
+                              'bytes': 埋め込んだフォントデータのバイト数(圧縮前), 'seconds': 作成にかかった秒数}}
+        """
+        with self._lock:
+            return {name: dict(stats) for name, stats in self._fonts.items()}
+
+    def reset_stats(self):
+        with self._lock:
+            for stats in self._fonts.values():
+                stats.update(subsets=0, hits=0, misses=0, bytes=0, seconds=0.0)
+
+    def _get(self, name: str, font_digest: str, subset, make):
+        key = hash_bytes(font_digest, ','.join(map(str, subset)))
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+        if data is None and self._store is not None:
+            data = self._store.get_bytes(key, '.ttf')
+            if data is not None:
+                self._remember(key, data)
+        hit = data is not None
+        seconds = 0.0
+        if not hit:
+            start = time.perf_counter()
+            data = make()
+            seconds = time.perf_counter() - start
+            self._remember(key, data)
+            if self._store is not None:
+                self._store.put(key, data, '.ttf')
+        with self._lock:
+            stats = self._fonts[name]
+            stats['subsets'] += 1
+            stats['hits' if hit else 'misses'] += 1
+            stats['bytes'] += len(data)
+            stats['seconds'] += seconds
+        return data
+
+    def _remember(self, key: str, data: bytes):
+        with self._lock:
+            self._memory[key] = data
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
@@ -0,0 +1,52 @@
+"""
+add_image で埋め込む画像の前処理キャッシュ。
+
+元画像を描画サイズと DPI から決まる画素数まで縮小・再エンコードし、
+内容のハッシュと描画サイズをキーにしてディスクに保存する。
+同じ内容の画像は同じファイルを返すため、ReportLab は1つの文書内で
+それを1つの XObject として共有する。
+"""
+from PIL import Image as PILImage
+import io
+
+from disk_cache import DiskCache, hash_bytes, digest_file
+
+
+class ImageCache:
+    def __init__(self, directory: str, max_bytes: int = 512 * 1024 * 1024, dpi: int = 150, quality: int = 85):
+        self._store = DiskCache(directory, max_bytes)
+        self.dpi = dpi
+        self.quality = quality
+
+    def get(self, path: str, width: float, height: float):
+        """
+        width x height (pt) で描画する画像のパスを返す。
+        必要なら縮小・再エンコードしてキャッシュに保存する。
+        """
+        pixels = (max(1, round(width * self.dpi / 72)), max(1, round(height * self.dpi / 72)))
+        key = hash_bytes(digest_file(path), f'{pixels[0]}x{pixels[1]}', str(self.quality))
+        # 形式は元画像を開くまで分からないため、どちらの拡張子も1回の検索で探す
+        cached = self._store.get(key, ('.jpg', '.png'))
+        if cached:
+            return cached
+        data, suffix = self._convert(path, pixels)
+        return self._store.put(key, data, suffix)
+
+    def stats(self):
+        return self._store.stats()
+
+    def _convert(self, path: str, pixels):
+        with PILImage.open(path) as img:
+            img.draft('RGB', pixels)    # JPEG はデコード時に縮小できる
+            # 縮小のみ行い、元画像より大きくはしない
+            size = (min(pixels[0], img.width), min(pixels[1], img.height))
+            has_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+            img = img.convert('RGBA' if has_alpha else 'RGB')
+            if size != img.size:
+                img = img.resize(size, PILImage.LANCZOS)
+            buffer = io.BytesIO()
+            if has_alpha:
+                img.save(buffer, 'PNG', optimize=True)
+                return buffer.getvalue(), '.png'
+            img.save(buffer, 'JPEG', quality=self.quality, optimize=True)
+            return buffer.getvalue(), '.jpg'
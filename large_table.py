@@ -0,0 +1,219 @@
+"""
+行数の多い表を組む flowable。
+
+LongTable は列幅を求めるためにすべてのセルを wrap し、ページをまたぐたびに残りの行を分割し直すため、
+行数が増えると時間が急に増える。LargeTable は次のようにして、行数に比例する時間で組む。
+
+- セルの文字列の幅は、文字の幅(cjk_paragraph.glyph_widths)の和として1回だけ求める
+- 列幅は見本の行(等間隔に選んだ行と、列ごとに最も長い文字列の行)の幅から決める
+- 行の高さを1回の走査で求めて累積和にし、フレームに入る行数は二分探索で求める
+- 分割した各部分は行の範囲だけを持ち、見出しの行を繰り返して描画する
+
+セルはマークアップを解釈せず、文字列のまま描画する。列幅に入らない文字列は折り返す。
+"""
+from bisect import bisect_right
+from itertools import accumulate
+
+from reportlab.lib import colors
+from reportlab.pdfbase.pdfmetrics import getAscent
+from reportlab.platypus import Flowable
+
+from cjk_paragraph import glyph_widths
+
+_PADDING = 6            # セルの左右の余白
+_TOP_PADDING = 3
+_BOTTOM_PADDING = 3
+_HEADER_BOTTOM_PADDING = 8
+
+
+def _text_width(text: str, font_name: str):
+    return sum(glyph_widths(font_name, text))
+
+
+def _fit_widths(natural, available: float, keep=()):
+    """
+    列の幅の合計が available を超える場合、幅の狭い列はそのままにして、広い列を同じ幅に縮める。
+    keep の列(数値の列)は、残りの列に幅が残る限り縮めない
+    """
+    if sum(natural) <= available:
+        return list(natural)
+    widths = list(natural)
+    remaining = available
+    rest = sorted(range(len(natural)), key=lambda i: natural[i])
+    kept = sum(natural[i] for i in keep)
+    if len(keep) < len(natural) and kept <= available * 0.75:
+        remaining -= kept
+        rest = [i for i in rest if i not in keep]
+    while rest:
+        share = remaining / len(rest)
+        if natural[rest[0]] > share:
+            for i in rest:
+                widths[i] = share
+            break
+        remaining -= natural[rest[0]]
+        rest.pop(0)
+    return widths
+
+
+def _wrap_text(text: str, font_name: str, width: float):
+    """
+    text を幅 width (フォントサイズ 1 での幅)ごとの行に分ける
+    """
+    offsets = list(accumulate(glyph_widths(font_name, text), initial=0))
+    lines = []
+    start = 0
+    while start < len(text):
+        end = max(start + 1, bisect_right(offsets, offsets[start] + width + 1e-9) - 1)
+        lines.append(text[start:end])
+        start = end
+    return lines or ['']
+
+
+class _TableLayout:
+    """
+    LargeTable の各部分が共有する、セルの文字列と幅、フレームの幅ごとの行の高さ
+    """
+    def __init__(self, header, rows, alignments, font_name: str, font_size: float, leading: float,
+                 sample: int):
+        self.header = header
+        self.rows = rows
+        self.alignments = alignments
+        self.font_name = font_name
+        self.font_size = font_size
+        self.leading = leading
+        self.ascent = getAscent(font_name, font_size)
+        # セルの文字列の幅(フォントサイズ 1)。1回だけ求める
+        self.header_widths = [_text_width(text, font_name) for text in header]
+        self.cell_widths = [[_text_width(text, font_name) for text in row] for row in rows]
+        self.natural_widths = self._estimate_widths(sample)
+        self._layouts = {}  # {フレームの幅: (列幅, 見出しの高さ, 行の高さの累積和)}
+
+    def _estimate_widths(self, sample: int):
+        columns = len(self.header)
+        step = max(1, len(self.rows) // sample) if sample else 0
+        indexes = set(range(0, len(self.rows), step)) if step else set()
+        for column in range(columns):
+            if self.rows:
+                # 文字数が最も多いセルの行も見本に含める
+                indexes.add(max(range(len(self.rows)), key=lambda i: len(self.rows[i][column])))
+        widths = []
+        for column in range(columns):
+            width = max([self.header_widths[column]] + [self.cell_widths[i][column] for i in indexes])
+            widths.append(width * self.font_size + 2 * _PADDING)
+        return widths
+
+    def layout(self, available_width: float):
+        layout = self._layouts.get(available_width)
+        if layout is None:
+            numbers = [i for i, alignment in enumerate(self.alignments) if alignment == 'RIGHT']
+            column_widths = _fit_widths(self.natural_widths, available_width, numbers)
+            # フォントサイズ 1 での、セルの中の幅
+            inner = [(width - 2 * _PADDING) / self.font_size for width in column_widths]
+            header_height = self._row_height(self.header, self.header_widths, inner) + \
+                _HEADER_BOTTOM_PADDING - _BOTTOM_PADDING
+            heights = [self._row_height(row, widths, inner)
+                       for row, widths in zip(self.rows, self.cell_widths)]
+            layout = self._layouts[available_width] = (column_widths, header_height,
+                                                       list(accumulate(heights, initial=0)))
+        return layout
+
+    def _row_height(self, row, widths, inner):
+        lines = 1
+        for text, width, limit in zip(row, widths, inner):
+            if width > limit:
+                lines = max(lines, len(_wrap_text(text, self.font_name, limit)))
+        return lines * self.leading + _TOP_PADDING + _BOTTOM_PADDING
+
+
+class LargeTable(Flowable):
+    def __init__(self, header, rows, alignments, font_name: str, font_size: float = 9, leading: float = 11,
+                 sample: int = 200, _layout=None, _start: int = 0, _end: int = None):
+        """
+        header: 見出しの文字列のリスト
+        rows: 行ごとのセルの文字列のリスト
+        alignments: 列ごとの 'LEFT'、'RIGHT' または 'CENTER'
+        sample: 列幅を見積もるために使う行数
+        """
+        Flowable.__init__(self)
+        if _layout is None:
+            _layout = _TableLayout(header, rows, alignments, font_name, font_size, leading, sample)
+        self._layout = _layout
+        self._start = _start
+        self._end = len(_layout.rows) if _end is None else _end
+        self.hAlign = 'CENTER'
+
+    def __repr__(self):
+        return f'LargeTable(rows {self._start}-{self._end})'
+
+    def wrap(self, availWidth, availHeight):
+        column_widths, header_height, tops = self._layout.layout(availWidth)
+        self._column_widths = column_widths
+        self._header_height = header_height
+        self._tops = tops
+        self.width = sum(column_widths)
+        self.height = header_height + tops[self._end] - tops[self._start]
+        return self.width, self.height
+
+    def split(self, availWidth, availHeight):
+        _, header_height, tops = self._layout.layout(availWidth)
+        space = availHeight - header_height
+        # フレームに入る最後の行を二分探索で求める
+        end = bisect_right(tops, tops[self._start] + space + 1e-6) - 1
+        if end <= self._start:
+            return []
+        if end >= self._end:
+            return [self]
+        return [LargeTable(None, None, None, None, _layout=self._layout, _start=self._start, _end=end),
+                LargeTable(None, None, None, None, _layout=self._layout, _start=end, _end=self._end)]
+
+    def draw(self):
+        layout = self._layout
+        canvas = self.canv
+        tops = self._tops
+        lefts = list(accumulate(self._column_widths, initial=0))
+        top = self.height
+
+        canvas.saveState()
+        canvas.setFillColor(colors.lightgrey)
+        canvas.rect(0, top - self._header_height, self.width, self._header_height, stroke=0, fill=1)
+
+        canvas.setFillColor(colors.black)
+        tx = canvas.beginText()
+        tx.setFont(layout.font_name, layout.font_size, layout.leading)
+        self._draw_row(tx, layout.header, layout.header_widths, ['CENTER'] * len(lefts), top, lefts)
+        borders = [top, top - self._header_height]
+        y = borders[-1]
+        for i in range(self._start, self._end):
+            self._draw_row(tx, layout.rows[i], layout.cell_widths[i], layout.alignments, y, lefts)
+            y -= tops[i + 1] - tops[i]
+            borders.append(y)
+        canvas.drawText(tx)
+
+        canvas.setStrokeColor(colors.grey)
+        canvas.setLineWidth(0.5)
+        lines = [(0, border, self.width, border) for border in borders]
+        lines += [(x, borders[0], x, borders[-1]) for x in lefts]
+        canvas.lines(lines)
+        canvas.restoreState()
+
+    def _draw_row(self, tx, row, widths, alignments, top: float, lefts):
+        layout = self._layout
+        size = layout.font_size
+        baseline = top - _TOP_PADDING - layout.ascent
+        for text, width, alignment, left, right in zip(row, widths, alignments, lefts, lefts[1:]):
+            inner = (right - left - 2 * _PADDING) / size
+            if width <= inner:
+                lines = [(text, width)]
+            else:
+                lines = [(line, _text_width(line, layout.font_name))
+                         for line in _wrap_text(text, layout.font_name, inner)]
+            for n, (line, line_width) in enumerate(lines):
+                line_width *= size
+                if alignment == 'RIGHT':
+                    x = right - _PADDING - line_width
+                elif alignment == 'CENTER':
+                    x = left + (right - left - line_width) / 2
+                else:
+                    x = left + _PADDING
+                tx.setTextOrigin(x, baseline - n * layout.leading)
+                tx.textOut(line)
@@ -1,118 +1,218 @@
+import io
+import os
+
 from paper_generator_interface import PaperGeneratorInterface
-from sample_tester import generate_sample
+import output_sink
+from document_model import Document, ChapterNode, SentenceNode, ImageNode, TableNode, split_chapters
 
 
 class LatexPaperGenerator(PaperGeneratorInterface):
     def __init__(self):
-        self.title = ""
-        self.sub_title = ""
-        self.abstract = ""
-
-        self.contents = []
+        self.document = Document()
+        self.split_sections = False
 
-        self.chapters = []     # [(rank, chapter_title)]
-        self.sentences = []    # [(rank, sentence)]
-        self.images = []       # [(path, title)]
-        self.tables = []       # [(data, title)]
+    def get_document(self):
+        return self.document
 
-        self.refs = []         # [(author, title, year)]
-        self.authors = []      # [(author, title, year)]
-        self.double_column = False
+    def set_document(self, document: Document):
+        """
+        document: 別の生成器や Document.from_bytes で得た Document。これまでに追加した内容と置き換える
+        """
+        self.document = document
 
     def set_title(self, title: str):
-        self.title = title
+        self.document.title = title
 
     def set_sub_title(self, sub_title: str):
-        self.sub_title = sub_title
+        self.document.sub_title = sub_title
 
     def set_abstract(self, abstract: str):
-        self.abstract = abstract
+        self.document.abstract = abstract
 
     def add_chapter(self, chapter: str, rank: int):
-        if rank == 1:
-            self.contents.append("\\section{{{}}}".format(chapter))
-        elif rank == 2:
-            self.contents.append("\\subsection{{{}}}".format(chapter))
-        else:
-            self.contents.append("\\paragraph{{{}}}".format(chapter))
+        self.document.add_chapter(chapter, rank)
 
     def add_sentence(self, sentence: str):
-        self.contents.append(sentence)
+        self.document.add_sentence(sentence)
 
     def add_image(self, path: str, title: str):
-        self.contents.append("\\begin{figure}[h]")
-        self.contents.append("\\centering")
-        self.contents.append("\\includegraphics[width=0.8\\linewidth]{{{}}}".format(path))
-        self.contents.append("\\caption{{{}}}".format(title))
-        self.contents.append("\\end{figure}")
+        self.document.add_image(path, title)
 
     def add_table(self, data: list, title: str):
-        cols = len(data[0])
-        self.contents.append("\\begin{table}[h]")
-        self.contents.append("\\centering")
-        self.contents.append("\\caption{{{}}}".format(title))
-        self.contents.append("\\begin{tabular}{" + "l"*cols + "}")
-        self.contents.append("\\toprule")
-        for row in data:
-            self.contents.append(" & ".join([str(d) for d in row]) + " \\\\")
-        self.contents.append("\\bottomrule")
-        self.contents.append("\\end{tabular}")
-        self.contents.append("\\end{table}")
-
+        self.document.add_table(data, title)
 
     def add_ref(self, author: str, title: str, year: int = None):
-        self.refs.append((author, title, year))
+        self.document.add_ref(author, title, year)
 
     def add_author(self, author: str, title: str, year: int = None):
-        self.authors.append((author, title, year))
+        self.document.add_author(author, title)
 
     def set_double_column(self, mode: bool):
-        self.double_column = mode
-
-    def run(self, path: str):
-        doc_class = "twocolumn" if self.double_column else "onecolumn"
-        latex = []
-        latex.append("\\documentclass[{}]{{article}}".format(doc_class))
-        latex.append("\\usepackage[dvipdfmx]{graphicx}")
-        latex.append("\\usepackage{booktabs}")
-        latex.append("\\title{{{}}}".format(self.title))
-
-        if self.sub_title:
+        self.document.double_column = mode
+
+    def _create_latex(self, node):
+        """
+        文書モデルのノードを LaTeX の行のリストにする
+        """
+        if isinstance(node, SentenceNode):
+            return [node.text]
+        if isinstance(node, ChapterNode):
+            if node.rank == 1:
+                return ["\\section{{{}}}".format(node.title)]
+            elif node.rank == 2:
+                return ["\\subsection{{{}}}".format(node.title)]
+            else:
+                return ["\\paragraph{{{}}}".format(node.title)]
+        if isinstance(node, ImageNode):
+            return [
+                "\\begin{figure}[h]",
+                "\\centering",
+                "\\includegraphics[width=0.8\\linewidth]{{{}}}".format(node.path),
+                "\\caption{{{}}}".format(node.title),
+                "\\end{figure}",
+            ]
+        if isinstance(node, TableNode):
+            latex = []
+            latex.append("\\begin{table}[h]")
+            latex.append("\\centering")
+            latex.append("\\caption{{{}}}".format(node.title))
+            latex.append("\\begin{tabular}{" + "l"*len(node.columns) + "}")
+            latex.append("\\toprule")
+            for row in node.rows():
+                latex.append(" & ".join([str(d) for d in row]) + " \\\\")
+            latex.append("\\bottomrule")
+            latex.append("\\end{tabular}")
+            latex.append("\\end{table}")
+            return latex
+        raise ValueError(f'{node.__class__.__name__} is not a kind of content.')
+
+    def set_split_sections(self, mode: bool):
+        """
+        True の場合、最上位の章(add_chapter(..., 0))ごとに別の .tex ファイルへ書き出し、
+        run の path のファイルからは \input で読み込む。
+        章のファイルは path と同じ場所の「<path の拡張子を除いた名前>_sections」に置き、
+        内容が変わらないファイルは書き換えない(更新時刻が変わらない)。
+        """
+        self.split_sections = mode
+
+    def run(self, path=None):
+        """
+        path: 出力先のパス、ファイルオブジェクト(テキストまたはバイナリ)またはソケット。
+              None の場合は UTF-8 の LaTeX を memoryview で返す。
+              set_split_sections(True) の場合は章のファイルの置き場所を決めるためパスに限る
+        """
+        if self.split_sections:
+            if not output_sink.is_path(path):
+                raise ValueError('split_sections requires a path to write section files.')
+            self._run_split(path)
+            return
+        if path is None:
+            buffer = io.BytesIO()
+            with output_sink.open_text(buffer) as f:
+                self._write_lines(f, self._iter_latex(self._iter_body()))
+            return buffer.getbuffer()
+        with output_sink.open_text(path) as f:
+            self._write_lines(f, self._iter_latex(self._iter_body()))
+
+    def _run_split(self, path: str):
+        base = os.path.splitext(path)[0]
+        directory = base + '_sections'
+        os.makedirs(directory, exist_ok=True)
+        names = []
+        for i, nodes in enumerate(split_chapters(self.document.contents())):
+            name = f'section_{i + 1:03d}'
+            names.append(name)
+            lines = (line for node in nodes for line in self._create_latex(node))
+            self._write_if_changed(os.path.join(directory, name + '.tex'), lines)
+
+        # 章が減った場合は、前回の残りのファイルを消す
+        for filename in os.listdir(directory):
+            name, ext = os.path.splitext(filename)
+            if ext == '.tex' and name.startswith('section_') and name not in names:
+                os.remove(os.path.join(directory, filename))
+
+        prefix = os.path.basename(directory)
+        inputs = ("\\input{{{}/{}}}".format(prefix, name) for name in names)
+        self._write_if_changed(path, self._iter_latex(inputs))
+
+    def _iter_body(self):
+        # 文書モデルのノードはここで初めて LaTeX にする
+        for node in self.document.contents():
+            yield from self._create_latex(node)
+
+    def _iter_latex(self, body):
+        """
+        body の行の前後にプリアンブルと参考文献を付けた、文書全体の行を返すイテレータ
+        """
+        document = self.document
+        doc_class = "twocolumn" if document.double_column else "onecolumn"
+        yield "\\documentclass[{}]{{article}}".format(doc_class)
+        yield "\\usepackage[dvipdfmx]{graphicx}"
+        yield "\\usepackage{booktabs}"
+        yield "\\title{{{}}}".format(document.title)
+
+        if document.sub_title:
             print("Warning: Sub title is not supperted in this version!")
 
         # 著者はまとめて一行に
-        if self.authors:
-            author_line = ", ".join([a for a,_,_ in self.authors])
-            latex.append("\\author{{{}}}".format(author_line))
+        if document.authors:
+            author_line = ", ".join([a.name for a in document.authors])
+            yield "\\author{{{}}}".format(author_line)
         else:
-            latex.append("\\author{}")
-        latex.append("\\date{}")
-        latex.append("\\begin{document}")
-        latex.append("\\maketitle")
+            yield "\\author{}"
+        yield "\\date{}"
+        yield "\\begin{document}"
+        yield "\\maketitle"
 
 
-        if self.abstract:
-            latex.append("\\begin{abstract}")
-            latex.append(self.abstract)
-            latex.append("\\end{abstract}")
+        if document.abstract:
+            yield "\\begin{abstract}"
+            yield document.abstract
+            yield "\\end{abstract}"
 
-        for content in self.contents:
-            latex.append(content)
+        yield from body
 
         # 参考文献
-        if self.refs:
-            latex.append("\\begin{thebibliography}{99}")
-            for author, title, year in self.refs:
-                year_str = str(year) if year else ""
-                latex.append("\\bibitem{{}} {}. \\textit{{{}}} {}".format(author, title, year_str))
-            latex.append("\\end{thebibliography}")
-
-        latex.append("\\end{document}")
-
-        with open(path, 'w', encoding='utf-8') as f:
-            f.write("\n".join(latex))
+        if document.refs:
+            yield "\\begin{thebibliography}{99}"
+            for ref in document.refs:
+                year_str = str(ref.year) if ref.year else ""
+                yield "\\bibitem{{}} {}. \\textit{{{}}} {}".format(ref.author, ref.title, year_str)
+            yield "\\end{thebibliography}"
+
+        yield "\\end{document}"
+
+    def _write_lines(self, f, lines):
+        """
+        lines を改行でつないで f に書き込む(最後の行の後には改行を付けない)
+        """
+        separator = ""
+        for line in lines:
+            f.write(separator)
+            f.write(line)
+            separator = "\n"
+
+    def _write_if_changed(self, path: str, lines):
+        """
+        lines の内容が path の現在の内容と異なる場合だけ書き込む。
+        戻り値: 書き込んだ場合は True
+        """
+        buffer = io.StringIO()
+        self._write_lines(buffer, lines)
+        data = buffer.getvalue().encode('utf-8')
+        try:
+            if os.path.getsize(path) == len(data):
+                with open(path, 'rb') as f:
+                    if f.read() == data:
+                        return False
+        except FileNotFoundError:
+            pass
+        with open(path, 'wb') as f:
+            f.write(data)
+        return True
 
 if __name__ == '__main__':
+    from sample_tester import generate_sample
     path="sample_latex.tex"
     pg = LatexPaperGenerator()
     generate_sample(pg, path)
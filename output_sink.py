@@ -0,0 +1,114 @@
+"""
+run の出力先。
+
+run にはファイルのパスのほか、write を持つファイルオブジェクト(BytesIO、HTTP の応答など)や
+ソケットを渡せる。大きな出力は chunk_size ずつに分けて書き込むため、
+送信先のバッファを一度に大きく使わない。
+
+HTTP の応答を Content-Length なしで送る場合は ChunkedResponseWriter を使う。
+
+    self.send_response(200)
+    self.send_header('Content-Type', 'application/pdf')
+    self.send_header('Transfer-Encoding', 'chunked')
+    self.end_headers()
+    with ChunkedResponseWriter(self.wfile) as writer:
+        pg.run(writer)
+"""
+from contextlib import contextmanager
+import io
+import os
+import socket
+
+CHUNK_SIZE = 64 * 1024
+
+
+def is_path(target):
+    return isinstance(target, (str, os.PathLike))
+
+
+class ChunkWriter(io.RawIOBase):
+    """
+    書き込みを chunk_size ずつに分けて write_chunk に渡す
+    """
+    def __init__(self, write_chunk, chunk_size: int = CHUNK_SIZE):
+        self._write_chunk = write_chunk
+        self.chunk_size = chunk_size
+        self.bytes_written = 0
+
+    def writable(self):
+        return True
+
+    def tell(self):
+        # pypdf は書き込んだ位置で相互参照表を作る
+        return self.bytes_written
+
+    def write(self, data):
+        view = memoryview(data).cast('B')
+        for start in range(0, len(view), self.chunk_size):
+            self._write_chunk(view[start:start + self.chunk_size])
+        self.bytes_written += len(view)
+        return len(view)
+
+
+class ChunkedResponseWriter(ChunkWriter):
+    """
+    HTTP/1.1 の chunked 転送符号化で wfile に書き込む。close で終端のチャンクを送る
+    """
+    def __init__(self, wfile, chunk_size: int = CHUNK_SIZE):
+        ChunkWriter.__init__(self, self._send, chunk_size)
+        self._wfile = wfile
+
+    def _send(self, chunk):
+        if len(chunk):
+            self._wfile.write(f'{len(chunk):X}\r\n'.encode('ascii'))
+            self._wfile.write(chunk)
+            self._wfile.write(b'\r\n')
+
+    def close(self):
+        if not self.closed:
+            self._wfile.write(b'0\r\n\r\n')
+            self._wfile.flush()
+        ChunkWriter.close(self)
+
+
+@contextmanager
+def open_binary(target, chunk_size: int = CHUNK_SIZE):
+    """
+    target (パス、ファイルオブジェクトまたはソケット)に書き込むバイナリのファイルオブジェクト
+    """
+    if is_path(target):
+        with open(target, 'wb') as f:
+            yield f
+    elif isinstance(target, socket.socket):
+        yield ChunkWriter(target.sendall, chunk_size)
+    elif isinstance(target, io.TextIOBase):
+        if not hasattr(target, 'buffer'):
+            raise TypeError(f'{target!r} is a text stream without a binary buffer.')
+        target.flush()
+        yield ChunkWriter(target.buffer.write, chunk_size)
+        target.buffer.flush()
+    elif callable(getattr(target, 'write', None)):
+        yield ChunkWriter(target.write, chunk_size)
+    else:
+        raise TypeError(f'{target!r} is neither a path nor a writable object.')
+
+
+@contextmanager
+def open_text(target, chunk_size: int = CHUNK_SIZE):
+    """
+    target に UTF-8 で書き込むテキストのファイルオブジェクト
+    """
+    if is_path(target):
+        with open(target, 'w', encoding='utf-8') as f:
+            yield f
+    elif isinstance(target, io.TextIOBase):
+        yield target
+    else:
+        with open_binary(target, chunk_size) as raw:
+            writer = io.TextIOWrapper(io.BufferedWriter(raw, chunk_size), encoding='utf-8')
+            try:
+                yield writer
+            finally:
+                writer.flush()
+                # target は呼び出し元が閉じる
+                writer.detach()
@@ -1,167 +1,484 @@
 from reportlab.platypus import (
     BaseDocTemplate, PageTemplate, Frame, Paragraph, Spacer,
-    NextPageTemplate, PageBreak, FrameBreak, Image, TableStyle, Table
+    NextPageTemplate, PageBreak, FrameBreak, Image, TableStyle, Table, Flowable
 )
+from reportlab.platypus.flowables import PageBreakIfNotEmpty
+from reportlab.platypus.doctemplate import LayoutError
+from reportlab.pdfgen.canvas import Canvas
 from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import ParagraphStyle
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.cidfonts import UnicodeCIDFont
-from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfbase.pdfmetrics import stringWidth
 from reportlab.platypus.tableofcontents import TableOfContents
-from reportlab.lib.enums import TA_CENTER
 from reportlab.lib import colors
+import reportlab
 from reportlab.platypus import LongTable
-from decimal import Decimal, InvalidOperation
+from contextlib import contextmanager, nullcontext
+from decimal import Decimal
+from functools import partial
+import io
+import json
+import os
+import pickle
+import time
 
 from paper_generator_interface import PaperGeneratorInterface
-from sample_tester import generate_sample
-
-class Author:
-    def __init__(self, name: str, organization: str):
-        self.name = name
-        self.organization = organization
-
-    def __str__(self):
-        return f'{self.name}, {self.organization}'
-
-class Reference:
-    def __init__(self, author: str, title: str, year: int = None):
-        self.author = author
-        self.title = title
-        self.year = year
-
-    def __str__(self):
-        if self.year == None:
-            return f'{self.author}, {self.title}.'
-        return f'{self.author}, {self.title}, {self.year}.'
+from font_registry import register_font
+from paper_style import get_style_sheet, CHAPTER_LEVELS
+from table_formatter import get_scale, format_column
+from content_spool import ContentSpool
+from disk_cache import digest_file
+from document_model import (
+    Document, ChapterNode, SentenceNode, ImageNode, TableNode, PlotNode, SlotNode, split_chapters
+)
+import parallel_chapters
+import output_sink
+from cjk_paragraph import create_paragraph
+from large_table import LargeTable
+from report_template import ReportTemplate
+
+class ReservedPage(Flowable):
+    """
+    フレームの残り領域をすべて予約し、後から定義されるフォーム(XObject)を描画する
+    """
+    def __init__(self, form_name: str):
+        Flowable.__init__(self)
+        self.form_name = form_name
+
+    def wrap(self, availWidth, availHeight):
+        self.width = availWidth
+        self.height = availHeight
+        return availWidth, availHeight
+
+    def draw(self):
+        self.canv.doForm(self.form_name)
+
+class ImagePlaceholder(Flowable):
+    """
+    下書きで画像の代わりに描く枠。画像のファイルは読み込まない
+    """
+    def __init__(self, width: float, height: float, label: str, font_name: str):
+        Flowable.__init__(self)
+        self.width = width
+        self.height = height
+        self.label = label
+        self.font_name = font_name
+
+    def wrap(self, availWidth, availHeight):
+        return self.width, self.height
+
+    def draw(self):
+        canvas = self.canv
+        canvas.saveState()
+        canvas.setStrokeColor(colors.grey)
+        canvas.setLineWidth(0.5)
+        canvas.rect(0, 0, self.width, self.height)
+        canvas.lines([(0, 0, self.width, self.height), (0, self.height, self.width, 0)])
+        canvas.setFont(self.font_name, 8)
+        canvas.drawCentredString(self.width / 2, 4, self.label)
+        canvas.restoreState()
+
+class PageRangeCanvas(Canvas):
+    """
+    first ～ last ページ(1始まり)だけを PDF に加える Canvas。範囲外のページは描画しても捨てる
+    """
+    def __init__(self, *args, first: int = 1, last: int = None, **kw):
+        Canvas.__init__(self, *args, **kw)
+        self.first = first
+        self.last = last
+
+    def showPage(self):
+        page = self._pageNumber
+        if self.first <= page and (self.last is None or page <= self.last):
+            Canvas.showPage(self)
+            return
+        if self._onPage:
+            self._onPage(page)
+        self._startPage()
+
+class SpooledContents(Flowable):
+    """
+    ContentSpool に書き出した本文のうち、offset 以降を表す。
+    MyDocTemplate が処理する直前に、次の数件だけを flowable にして自分と置き換える。
+    """
+    def __init__(self, spool, offset: int, create_flowables, batch: int = 64):
+        Flowable.__init__(self)
+        self.spool = spool
+        self.offset = offset
+        self.create_flowables = create_flowables
+        self.batch = batch
+
+    def expand(self):
+        nodes, offset = self.spool.read(self.offset, self.batch)
+        flowables = []
+        for node in nodes:
+            flowables.extend(self.create_flowables(node))
+        if nodes:
+            flowables.append(SpooledContents(self.spool, offset, self.create_flowables, self.batch))
+        return flowables
 
 class MyDocTemplate(BaseDocTemplate):
 
-    def __init__(self, filename, **kw):
+    def __init__(self, filename, chapter_levels=None, profiler=None, page_numbers=True, **kw):
+        """
+        page_numbers: False の場合、ページ番号を描画しない(並列に組む断片で使う)
+        """
         self.allowSplitting = 0
+        self.toc_entries = []
+        self.page_numbers = page_numbers
+        # このページより後は組まない(下書きでページの範囲を指定した場合)
+        self.last_page = None
+        self._profiler = profiler
+        # ディスクから展開した本文の、計測中の章と flowable の数
+        self._profiled_chapter = None
+        self._profiled_count = 0
+        # 見出しのスタイル名 → 目次のレベル
+        self._chapter_levels = chapter_levels or {f'CapterRank{level + 1}': level for level in range(CHAPTER_LEVELS)}
         BaseDocTemplate.__init__(self, filename, **kw)
 #        template = PageTemplate('normal', [Frame(2.5*cm, 2.5*cm, 15*cm, 25*cm, id='F1')])
 #        self.addPageTemplates(template)
 
+    def beforeDocument(self):
+        # multiBuild ではパスごとに呼ばれるため、見出しの記録をやり直す
+        self.toc_entries = []
+        self._profiled_chapter = None
+        self._profiled_count = 0
+        if self._profiler:
+            self._profiler.attach_canvas(self.canv)
+
+    def _register_toc_entry(self, level: int, text: str):
+        start = time.perf_counter()
+        self.toc_entries.append((level, text, self.page))
+        self.notify('TOCEntry', (level, text, self.page))
+        if self._profiler:
+            self._profiler.add_toc_notification(time.perf_counter() - start)
+
+    def filterFlowables(self, flowables):
+        if self.last_page is not None and self.page > self.last_page:
+            flowables[:] = [None]
+            return
+        # ディスクに書き出した本文は、処理する直前に少しずつ flowable にする
+        while flowables and isinstance(flowables[0], SpooledContents):
+            expanded = flowables[0].expand()
+            if self._profiler and expanded:
+                self._profiled_chapter = self._profiler.instrument(
+                    expanded, self._chapter_levels, self._profiled_chapter, self._profiled_count)
+                self._profiled_count += len(expanded)
+            flowables[0:1] = expanded or [None]
+            # build は先頭の PageBreakIfNotEmpty を展開前に判定するため、ここで同じ処理をする
+            if isinstance(flowables[0], PageBreakIfNotEmpty) and self._curPageFlowableCount == 0:
+                del flowables[0]
+
     def afterFlowable(self, flowable):
         "Registers TOC entries."
         if flowable.__class__.__name__ == 'Paragraph':
-            text = flowable.getPlainText()
-            style = flowable.style.name
-            if style == 'CapterRank1':
-                self.notify('TOCEntry', (0, text, self.page))
-            if style == 'CapterRank2':
-                self.notify('TOCEntry', (1, text, self.page))
-            if style == 'CapterRank3':
-                self.notify('TOCEntry', (2, text, self.page))
-            if style == 'CapterRank4':
-                self.notify('TOCEntry', (3, text, self.page))
-            if style == 'CapterRank5':
-                self.notify('TOCEntry', (4, text, self.page))
-            if style == 'CapterRank6':
-                self.notify('TOCEntry', (5, text, self.page))
-            if style == 'CapterRank7':
-                self.notify('TOCEntry', (6, text, self.page))
-            if style == 'CapterRank8':
-                self.notify('TOCEntry', (7, text, self.page))
+            level = self._chapter_levels.get(flowable.style.name)
+            if level is not None:
+                self._register_toc_entry(level, flowable.getPlainText())
 
 class PaperGenerator(PaperGeneratorInterface):
-    def __init__(self, font='HeiseiMin-W3', path_to_font=None):
+    _IMAGE_SIZE = (200, 150)    # 画像の幅・高さをpt単位で指定
+    _PLOT_SIZE = (240, 160)     # add_plot のグラフの幅・高さ(pt)
+    DRAFT_FONT = 'HeiseiMin-W3'   # 下書きで TTF の代わりに使う CID フォント
+
+    def __init__(self, font='HeiseiMin-W3', path_to_font=None, style_sheet=None):
+        """
+        style_sheet: PaperStyleSheet。省略した場合は font の既定のスタイルシートを共有する
+        """
         self._font = font
-        self._title = 'NO TITLE...'
-        self._sub_title = None
-        self._authors = []
-        self._abstract = 'no abstract...'
-        self._contents = []
-        self._refs = []
-        self._images = {}
-        self._tables = {}
-        self._double_colmuns = False
-        self._chapter_numbers = [0, 0, 0, 0, 0, 0, 0, 0]
-        self._body_style = ParagraphStyle(
-            'Body', fontName=self._font, fontSize=10.5, leading=11, spaceAfter=5
-        )
+        self._path_to_font = path_to_font
+        self._document = Document('NO TITLE...', 'no abstract...')
+        self._single_pass = False
+        self._toc_cache = None
+        self._image_cache = None
+        self._compact_tables = False
+        self._cjk_paragraphs = False
+        self._large_table_rows = 0
+        self._profiler = None
+        self._parallel_chapters = 0
+        self._build_cache = None
+        self._page_compression = None
+        self._draft = False
+        self._draft_pages = None
+        self._draft_chapters = None
+        self._static_flowables = None
+        self._toc_page_counts = None
+        if style_sheet is None:
+            style_sheet = get_style_sheet(self._font)
+        self._use_style_sheet(style_sheet)
+
+        register_font(self._font, path_to_font)
+
+    def __setstate__(self, state):
+        # 別のプロセス(AsyncRenderer のプロセスの executor など)で復元した場合は __init__ を通らないため、
+        # そのプロセスでフォントを登録する
+        self.__dict__.update(state)
+        register_font(self._font, self._path_to_font)
+
+    def _use_style_sheet(self, style_sheet):
+        self._style_sheet = style_sheet
+        self._body_style = style_sheet.body
+        self._image_description_style = style_sheet.image_description
+        self._table_description_style = style_sheet.table_description
+        self._table_number_style = style_sheet.table_number
+        self._table_string_style = style_sheet.table_string
+        self._chapter_styles = style_sheet.chapters
 
-        self._image_description_style = ParagraphStyle(
-            'ImageDescription', fontName=self._font, fontSize=10.5, leading=11, spaceAfter=25, alignment=1, 
-        )
 
-        self._table_description_style = ParagraphStyle(
-            'TableDescription', fontName=self._font, fontSize=10.5, leading=11, spaceAfter=25, alignment=1, 
-        )
-        self._table_number_style = ParagraphStyle(
-            'Body', fontName=self._font, fontSize=9, leading=11, spaceAfter=5, alignment=2
-        )
-        self._table_string_style = ParagraphStyle(
-            'Body', fontName=self._font, fontSize=9, leading=11, spaceAfter=5, alignment=0
-        )
 
-        self._chapter_styles = [
-            ParagraphStyle('CapterRank1', fontName=self._font, fontSize=15, leading=17, spaceBefore=10, spaceAfter=5, leftIndent=10, outlineLevel=0), 
-            ParagraphStyle('CapterRank2', fontName=self._font, fontSize=14, leading=16, spaceBefore=9, spaceAfter=5, leftIndent=10, outlineLevel=1), 
-            ParagraphStyle('CapterRank3', fontName=self._font, fontSize=13, leading=15, spaceBefore=8, spaceAfter=5, leftIndent=10, outlineLevel=2), 
-            ParagraphStyle('CapterRank4', fontName=self._font, fontSize=12, leading=14, spaceBefore=7, spaceAfter=5, leftIndent=10, outlineLevel=3), 
-            ParagraphStyle('CapterRank5', fontName=self._font, fontSize=11, leading=13, spaceBefore=6, spaceAfter=5, leftIndent=10, outlineLevel=4), 
-            ParagraphStyle('CapterRank6', fontName=self._font, fontSize=11, leading=13, spaceBefore=6, spaceAfter=5, leftIndent=10, outlineLevel=5), 
-            ParagraphStyle('CapterRank7', fontName=self._font, fontSize=11, leading=13, spaceBefore=6, spaceAfter=5, leftIndent=10, outlineLevel=6), 
-            ParagraphStyle('CapterRank8', fontName=self._font, fontSize=11, leading=13, spaceBefore=6, spaceAfter=5, leftIndent=10, outlineLevel=7), 
-        ]
+    def set_double_column(self, mode: bool):
+        self._document.double_column = mode
 
-        if path_to_font:
-            pdfmetrics.registerFont(TTFont(self._font, path_to_font))
-        else:
-            pdfmetrics.registerFont(UnicodeCIDFont(self._font))
-        
+    def set_single_pass(self, mode: bool):
+        """
+        True の場合、本文のレイアウトを1回だけ行い、目次のページ番号は後から書き込む
+        """
+        self._single_pass = mode
 
+    def set_toc_cache(self, path: str):
+        """
+        前回ビルド時の見出し→ページ番号の対応を保存・再利用するファイルを指定する
+        """
+        self._toc_cache = path
 
+    def set_streaming(self, mode: bool, path: str = None):
+        """
+        True の場合、本文の内容を flowable にせずディスクに書き出しておき、
+        レイアウトの進行に合わせて少しずつ flowable にする。
+        非常に大きな文書でもメモリ使用量がほぼ一定になる。
+        path: 書き出し先のファイル。省略した場合は一時ファイル
+        """
+        self._document.set_spool(ContentSpool(path) if mode else None)
 
-    def set_double_column(self, mode: bool):
-        self._double_colmuns = mode
+    def set_profiler(self, profiler):
+        """
+        profiler: BuildProfiler。指定すると run の各段階と flowable ごとの時間を計測する
+        """
+        self._profiler = profiler
+
+    def set_compact_table(self, mode: bool):
+        """
+        True の場合、add_table の単純なセルを Paragraph にせず文字列のまま保持する
+        """
+        self._compact_tables = mode
+
+    def set_large_tables(self, min_rows: int):
+        """
+        min_rows 行以上の表を LargeTable で組む(列幅を見本の行から見積もり、ページごとに見出しの行を繰り返す)。
+        セルのマークアップは解釈しない。0 の場合は無効
+        """
+        self._large_table_rows = min_rows
+
+    def set_cjk_paragraphs(self, mode: bool):
+        """
+        True の場合、add_sentence の本文を CJKParagraph で組む(禁則処理を行い、フレームの境界で分割する)。
+        マークアップを含む本文は従来どおり Paragraph で組む
+        """
+        self._cjk_paragraphs = mode
+
+    def set_parallel_chapters(self, workers: int):
+        """
+        workers が 1 以上の場合、最上位の章(add_chapter(..., 0))を新しいページから始める。
+        2 以上の場合はさらに、章ごとに別プロセスで組んでから1つの PDF にまとめる(pypdf が必要)。
+        1 の場合は同じレイアウトを並列化せずに組む。0 の場合は無効
+        """
+        self._parallel_chapters = workers
+
+    def set_build_cache(self, build_cache):
+        """
+        build_cache: BuildCache。指定すると入力が同じ run では保存済みの PDF を使い、
+        set_parallel_chapters で章ごとに組む場合は変更のない章の断片を再利用する
+        """
+        self._build_cache = build_cache
+
+    def set_page_compression(self, mode: bool):
+        """
+        True の場合はページの内容を圧縮し、False の場合は圧縮しない。
+        圧縮しないと PDF は大きくなるが、生成にかかる CPU 時間は短くなる。
+        None の場合は reportlab.rl_config.pageCompression に従う
+        """
+        self._page_compression = mode
+
+    def set_draft(self, mode: bool, pages=None, chapters=None):
+        """
+        True の場合、確認用の下書きを速く組む。本文は1回だけレイアウトし、目次にはページ番号を入れない。
+        add_image の画像は読み込まずに枠だけを描き、path_to_font の TTF の代わりに
+        埋め込みの不要な CID フォント(DRAFT_FONT)を使う。ビルドキャッシュと章ごとの並列化は使わない。
+        pages: (最初, 最後) のページ番号(1始まり)。その範囲だけを出力し、最後のページより後は組まない
+        chapters: 章番号('2'、'3.1' など)のリスト。表紙・目次・引用文献を省き、その章と下位の章だけを組む
+        """
+        self._draft = mode
+        self._draft_pages = tuple(pages) if pages else None
+        self._draft_chapters = [str(number) for number in chapters] if chapters else None
+
+    def set_image_cache(self, image_cache):
+        """
+        image_cache: ImageCache。指定すると add_image の画像を描画サイズに縮小してから埋め込む
+        """
+        self._image_cache = image_cache
+
+    def get_document(self):
+        """
+        追加した内容を記録した Document
+        """
+        return self._document
+
+    def set_document(self, document: Document):
+        """
+        document: 別の生成器や Document.from_bytes で得た Document。これまでに追加した内容と置き換える
+        """
+        self._document = document
 
     def set_title(self, title: str):
-        self._title = title 
+        self._document.title = title 
 
     def set_sub_title(self, sub_title : str):
-        self._sub_title = sub_title 
+        self._document.sub_title = sub_title 
 
     def add_author(self, name: str, organization: str):
-        self._authors.append(Author(name, organization))
+        self._document.add_author(name, organization)
 
     def set_abstract(self, abstract: str):
-        self._abstract = abstract
+        self._document.abstract = abstract
+
+    def add_table(self, data, title: str):
+        """
+        data: 1行目を見出しとする行のリスト、列名→値の列の dict、
+              または名前付きフィールドを持つ NumPy の構造化配列
+        """
+        self._document.add_table(data, title)
+
+    def _create_table(self, node: TableNode):
+        columns = node.columns
+        # Document.format_tables で整形済みならそれを使う
+        column_texts = node.format_texts()
+        if self._large_table_rows and columns and len(columns[0][1]) >= self._large_table_rows:
+            return [Paragraph(f'表{node.index}. {node.title}', self._table_description_style),
+                    self._create_large_table(columns, column_texts)]
 
-    def add_table(self, data: list, title: str):
-        if len(data) == 0:
-            return
         # Table オブジェクト生成
-        data = self._transpose(data)
-        for line in data:
-            quant = self._get_quantize(line[1:])
-            line[0] = self._get_table_value(line[0], 0)
-            line[1:] = [self._get_table_value(d, quant) for d in line[1:]]
-        data = self._transpose(data)
+        cells = []
+        compact_styles = []
+        for i, ((header, values), texts) in enumerate(zip(columns, column_texts)):
+            if self._compact_tables:
+                column, alignment = self._get_compact_table_column(header, values, len(columns), texts)
+                compact_styles.append(('ALIGN', (i,1), (i,-1), alignment))
+            else:
+                column = self._get_table_column(header, values, texts)
+            cells.append(column)
+        data = self._transpose(cells)
 
         table = LongTable(data)  # 列幅をpt単位で指定（省略可）
 
         # スタイル設定
-        table.setStyle(TableStyle([
+        table_styles = [
             ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),   # 1行目背景色
             ('TEXTCOLOR',  (0,0), (-1,0), colors.black),       # 1行目文字色
             ('ALIGN',      (0,0), (-1,-1), 'CENTER'),          # 全セル中央寄せ
             ('GRID',       (0,0), (-1,-1), 0.5, colors.grey),  # 枠線
             ('FONTNAME',   (0,0), (-1,0), self._font),   # 1行目フォント太字
             ('BOTTOMPADDING', (0,0), (-1,0), 8),               # 1行目下余白
-        ]))
-
-        index = len(self._tables) + 1
-        self._contents.append(Paragraph(f'表{index}. {title}', self._table_description_style))
-        self._contents.append(table)
-        if title in self._tables:
-            print(f'{title} is already registed.')
+        ]
+        if self._compact_tables:
+            # 文字列のままのセルは表のスタイルで描画されるため、Paragraph のスタイルに合わせる
+            table_styles += [
+                ('FONTNAME',   (0,0), (-1,-1), self._font),
+                ('FONTSIZE',   (0,0), (-1,-1), self._table_string_style.fontSize),
+                ('LEADING',    (0,0), (-1,-1), self._table_string_style.leading),
+                ('ALIGN',      (0,0), (-1,0), 'LEFT'),
+            ] + compact_styles
+        table.setStyle(TableStyle(table_styles))
+
+        return [Paragraph(f'表{node.index}. {node.title}', self._table_description_style), table]
+
+    def _create_large_table(self, columns, column_texts):
+        """
+        列を文字列にして LargeTable を作る。数値が多数派の列は右寄せ、それ以外は左寄せにする
+        """
+        header = []
+        cells = []
+        alignments = []
+        for (name, values), texts in zip(columns, column_texts):
+            if not isinstance(values, list):
+                values = values.tolist()
+            numbers = len(texts) - texts.count(None)
+            alignments.append('RIGHT' if numbers > 0 and numbers * 2 >= len(texts) else 'LEFT')
+            header.append(str(name))
+            cells.append([str(value) if text is None else text for value, text in zip(values, texts)])
+        style = self._table_string_style
+        return LargeTable(header, list(zip(*cells)), alignments, self._font, style.fontSize, style.leading)
+
+    def _get_table_column(self, header, values, texts=None):
+        """
+        列の数値を小数部の桁数をそろえて一括で整形する。結果は _get_table_value と同じ。
+        texts: 整形済みの文字列(TableNode.format_texts)
+        """
+        if texts is None:
+            texts = format_column(values, get_scale(values))
+        if not isinstance(values, list):
+            values = values.tolist()
+        column = [self._get_table_value(header, 0)]
+        for value, text in zip(values, texts):
+            if text is None:
+                column.append(Paragraph(value, self._table_string_style))
+            else:
+                column.append(Paragraph(text, self._table_number_style))
+        return column
+
+    def _get_compact_table_column(self, header, values, column_count: int, texts=None):
+        """
+        列のセルを、できるだけ Paragraph を作らずに文字列のまま返す。
+        列の多数派(数値なら右寄せ、文字列なら左寄せ)を列全体の配置とし、
+        配置が異なるセル、マークアップを含むセル、折り返しが必要な長いセルだけ Paragraph にする。
+        戻り値: (セルのリスト, 列の配置)
+        """
+        if texts is None:
+            texts = format_column(values, get_scale(values))
+        if not isinstance(values, list):
+            values = values.tolist()
+        numbers = len(texts) - texts.count(None)
+        alignment = 'RIGHT' if numbers > 0 and numbers * 2 >= len(texts) else 'LEFT'
+        max_width = self._get_body_width() / column_count
+
+        if self._is_plain_table_text(header, max_width):
+            column = [header]
         else:
-            self._tables[title] = index
-
-        
+            column = [self._get_table_value(header, 0)]
+        for value, text in zip(values, texts):
+            if text is not None:
+                if alignment == 'RIGHT':
+                    column.append(text)
+                else:
+                    column.append(Paragraph(text, self._table_number_style))
+            elif alignment == 'LEFT' and self._is_plain_table_text(value, max_width):
+                column.append(value)
+            else:
+                column.append(Paragraph(value, self._table_string_style))
+        return column, alignment
+
+    def _is_plain_table_text(self, value, max_width: float):
+        """
+        Paragraph にせず文字列のまま表に置けるか
+        """
+        if type(value) is not str:
+            return False
+        if '<' in value or '&' in value or '\n' in value:
+            return False
+        font_size = self._table_string_style.fontSize
+        # 1文字の幅は高々 1em なので、短い文字列は幅を測らなくてよい
+        if len(value) * font_size <= max_width:
+            return True
+        return stringWidth(value, self._font, font_size) <= max_width
+
+    def _get_body_width(self):
+        """
+        本文のフレーム内で利用できる幅
+        """
+        page_width, _ = A4
+        margin = 40
+        gap = 20
+        padding = 6
+        if self._document.double_column:
+            return (page_width - 2*margin - gap) / 2 - 2*padding
+        return page_width - 2*margin - gap - 2*padding
 
     def _get_table_value(self, value: any, quant: int):
         if type(value) is int and quant >= 1:
@@ -171,63 +488,324 @@ class PaperGenerator(PaperGeneratorInterface):
         return Paragraph(value, self._table_string_style)
 
     def add_image(self, path: str, title: str):
-        # 画像を挿入
-        img = Image(path, width=200, height=150)   # 幅・高さをpt単位で指定
-        self._contents.append(img)
+        self._document.add_image(path, title)
 
-        # 画像の下にテキスト
-        index = len(self._images) + 1
-        self._contents.append(Spacer(1, 12))        
-        self._contents.append(Paragraph(f'図 {index}. {title}', self._image_description_style))
-        if title in self._images:
-            print(f'{title} is already registed.')
+    def _create_image(self, node: ImageNode):
+        # 画像を挿入
+        width, height = self._IMAGE_SIZE
+        if self._draft:
+            img = ImagePlaceholder(width, height, os.path.basename(node.path), self._font)
         else:
-            self._images[title] = index
-            
+            img = Image(self._get_image_path(node.path), width=width, height=height)
+        # 画像の下にテキスト
+        return [img, Spacer(1, 12), Paragraph(f'図 {node.index}. {node.title}', self._image_description_style)]
+
+    def add_plot(self, x, y, title: str, kind: str = 'line', decimation: str = 'minmax', columns: int = None):
+        """
+        NumPy の配列またはリストからグラフをベクター形式で描く。図番号は add_image の図と同じ番号の列で付ける
+        x: x の値(棒グラフの場合は棒の名前)。None の場合は 0, 1, 2, ...
+        y: 値の列。2次元の配列または列のリストの場合は複数の系列
+        kind: 'line'、'scatter' または 'bar'
+        decimation: 折れ線の点の間引き方('minmax' または 'lttb')。
+                    散布図は格子ごとに1点、棒グラフは絶対値が最大の棒を残す
+        columns: 間引く列の数。省略した場合は plot_decimation の COLUMNS、SCATTER_COLUMNS、BAR_COLUMNS
+        """
+        self._document.add_plot(x, y, title, kind, decimation, columns)
+
+    def _create_plot(self, node: PlotNode):
+        # reportlab.graphics はグラフを使う場合だけ読み込む
+        from plot_drawing import create_drawing
+        width, height = self._PLOT_SIZE
+        drawing = create_drawing(node, width, height, self._font)
+        return [drawing, Spacer(1, 12), Paragraph(f'図 {node.index}. {node.title}', self._image_description_style)]
+
+    def _get_image_path(self, path: str):
+        if self._image_cache:
+            return self._image_cache.get(path, *self._IMAGE_SIZE)
+        return path
 
     def add_sentence(self, sentence: str):
-        self._contents.append(Paragraph(sentence, self._body_style))
+        self._document.add_sentence(sentence)
 
     def add_chapter(self, chapter: str, chapter_rank = 0):
-        self._chapter_numbers[chapter_rank] += 1
-        title = f'{self._get_chapter_number(chapter_rank)}. {chapter}'
-        self._contents.append(Paragraph(title, self._chapter_styles[chapter_rank]))
-        for i in range(chapter_rank+1, len(self._chapter_numbers)):
-            self._chapter_numbers[i] = 0
-    
-    def _get_chapter_number(self, chapter_rank):
-        return '.'.join([str(d) for d in self._chapter_numbers[:chapter_rank + 1]])
-        
+        self._document.add_chapter(chapter, chapter_rank)
+
+    def _create_flowables(self, node):
+        """
+        文書モデルのノードを flowable のリストにする
+        """
+        static = self._get_static_flowables(id(node))
+        if static is not None:
+            return static
+        if isinstance(node, SentenceNode):
+            if self._cjk_paragraphs:
+                return [create_paragraph(node.text, self._body_style)]
+            return [Paragraph(node.text, self._body_style)]
+        if isinstance(node, ChapterNode):
+            heading = Paragraph(node.heading(), self._chapter_styles[node.rank])
+            if node.rank == 0 and self._parallel_chapters:
+                # 最上位の章は新しいページから始める
+                return [PageBreakIfNotEmpty(), heading]
+            return [heading]
+        if isinstance(node, ImageNode):
+            return self._create_image(node)
+        if isinstance(node, TableNode):
+            return self._create_table(node)
+        if isinstance(node, PlotNode):
+            return self._create_plot(node)
+        if isinstance(node, SlotNode):
+            raise ValueError(f'Slot {node.name} is not filled. Use compile_template to fill slots.')
+        raise ValueError(f'{node.__class__.__name__} is not a kind of content.')
 
     def add_ref(self, author: str, title: str, year: int = None):
-        self._refs.append(Reference(author, title, year))
+        self._document.add_ref(author, title, year)
+
+    def add_slot(self, name: str):
+        """
+        compile_template で作るテンプレートの、文書ごとに内容を差し込む位置
+        """
+        self._document.add_slot(name)
+
+    def compile_template(self):
+        """
+        これまでに追加した内容を固定部分とし、add_slot の位置に文書ごとの内容を差し込む ReportTemplate を作る。
+        固定部分の flowable はこの時点で作る
+        """
+        return ReportTemplate(self)
+
+    @contextmanager
+    def _filling_template(self, document: Document, static_flowables: dict, toc_page_counts: dict):
+        """
+        ReportTemplate が1件の文書を組む間、固定部分の flowable を再利用し、本文を1回だけレイアウトする。
+        toc_page_counts: {目次の項目: 目次のページ数}。見出しが同じ文書の間で再利用する
+        """
+        saved = (self._document, self._single_pass, self._parallel_chapters, self._static_flowables,
+                 self._toc_page_counts)
+        self._document = document
+        self._single_pass = True
+        self._parallel_chapters = 0
+        self._static_flowables = static_flowables
+        self._toc_page_counts = toc_page_counts
+        try:
+            yield
+        finally:
+            (self._document, self._single_pass, self._parallel_chapters, self._static_flowables,
+             self._toc_page_counts) = saved
+
+    def _get_static_flowables(self, key):
+        if self._static_flowables is None:
+            return None
+        return self._static_flowables.get(key)
 
     # --- ページ番号を描画する関数 ---
     def _add_page_number(self, canvas, doc):
         """
         各ページ下部中央にページ番号を描画
         """
-        page_num = canvas.getPageNumber()
+        if doc.page_numbers:
+            self._draw_page_number(canvas, canvas.getPageNumber())
+
+    def _draw_page_number(self, canvas, page_num: int):
         text = f"Page {page_num}"
         canvas.setFont(self._font, 9)
         # 下部中央に配置
         canvas.drawCentredString(A4[0] / 2.0, 15, text)
 
-    def run(self, path: str):
+    def run(self, path=None):
+        """
+        path: 出力先のパス、ファイルオブジェクト(write を持つもの)またはソケット。
+              ファイルオブジェクトとソケットには output_sink.CHUNK_SIZE ずつ書き込む。
+              None の場合は PDF を memoryview で返す
+        set_profiler で計測を指定した場合は、計測結果の dict を返す
+        (path が None の場合は profiler.report() で参照する)
+        """
+        if path is None:
+            buffer = io.BytesIO()
+            self._run(buffer)
+            return buffer.getbuffer()
+        if output_sink.is_path(path):
+            return self._run(path)
+        with output_sink.open_binary(path) as output:
+            return self._run(output)
+
+    def _run(self, path):
+        if not self._profiler:
+            self._build(path)
+            return None
+        self._profiler.start()
+        try:
+            self._build(path)
+        except BaseException:
+            # 組版が失敗しても、flowable の差し替えと tracemalloc は元に戻す
+            self._profiler.abort()
+            raise
+        return self._profiler.finish()
+
+    def _build(self, path):
+        if self._draft:
+            self._run_draft(path)
+            return
 
-        doc = MyDocTemplate(path, pagesize=A4)
+        key = None
+        target = None
+        if self._build_cache:
+            with self._phase('build_cache'):
+                key = self._get_build_key()
+                restored = self._build_cache.restore_document(key, path)
+            if restored:
+                return
+            if not output_sink.is_path(path):
+                # キャッシュに保存するため、一度メモリに書き出す
+                target, path = path, io.BytesIO()
+
+        if self._parallel_chapters > 1 and not parallel_chapters.available():
+            print('pypdf is required to render chapters in parallel. Chapters are rendered serially.')
+        if self._parallel_chapters > 1 and parallel_chapters.available():
+            self._run_parallel(path)
+        elif self._single_pass:
+            self._run_single_pass(path)
+        else:
+            doc = self._create_doc(path)
 
-        doc = self._setup_template(doc)
+            with self._phase('story'):
+                story = self._create_story(self._add_table_of_contents)
+
+            doc.multiBuild(story)
 
+            self._save_toc_cache(doc.toc_entries)
+
+        if key:
+            self._build_cache.save_document(key, path)
+        if target is not None:
+            target.write(path.getbuffer())
+
+    def _run_draft(self, path):
+        """
+        set_draft の下書きを doc.build で1回だけ組む
+        """
+        with self._draft_font():
+            doc = self._create_doc(path)
+            with self._phase('story'):
+                if self._draft_chapters:
+                    story = self._add_body([])
+                    template_id = 'BodyPagesInDoubleColumn' if self._document.double_column else 'BodyPagesInSingleColumn'
+                    doc._firstPageTemplateIndex = [template.id for template in doc.pageTemplates].index(template_id)
+                else:
+                    story = self._create_story(self._add_draft_table_of_contents)
+            if not story:
+                story = [Spacer(1, 1)]
+            canvasmaker = Canvas
+            if self._draft_pages:
+                first, last = self._draft_pages
+                doc.last_page = last
+                canvasmaker = partial(PageRangeCanvas, first=first, last=last)
+            # 他の組み方と同じく、書き出しはパスの計測の外で行う
+            doc._doSave = 0
+            doc.build(story, canvasmaker=canvasmaker)
+            doc.canv.save()
+
+    @contextmanager
+    def _draft_font(self):
+        """
+        TTF を使う場合、下書きを組む間だけ DRAFT_FONT のスタイルシートに切り替える
+        """
+        if not self._path_to_font:
+            yield
+            return
+        font, style_sheet = self._font, self._style_sheet
+        register_font(self.DRAFT_FONT)
+        self._font = self.DRAFT_FONT
+        self._use_style_sheet(style_sheet.with_font(self.DRAFT_FONT))
+        try:
+            yield
+        finally:
+            self._font = font
+            self._use_style_sheet(style_sheet)
+
+    def _add_draft_table_of_contents(self, story):
+        # 目次には見出しだけを載せ、ページ番号は求めない
+        story.append(Paragraph("目次", self._style_sheet.toc_title))
+        toc_levels = self._style_sheet.toc_levels
+        for node in self._document.contents():
+            if isinstance(node, ChapterNode):
+                story.append(Paragraph(node.heading(), toc_levels[node.rank]))
+        return story
+
+    def _select_chapters(self, numbers):
+        """
+        numbers の章(と下位の章)のノードだけを flowable にする関数。ノードは先頭から順に渡す
+        """
+        selected = [False]
+
+        def create_flowables(node):
+            if isinstance(node, ChapterNode):
+                selected[0] = any(node.number == number or node.number.startswith(number + '.')
+                                  for number in numbers)
+            return self._create_flowables(node) if selected[0] else []
+        return create_flowables
+
+    def _get_build_key(self):
+        """
+        出力に影響する入力すべてのハッシュ
+        """
+        document = self._document
+        chunks = [self._get_options_key()]
+        chunks.append(pickle.dumps((document.title, document.sub_title, document.abstract,
+                                    document.authors, document.refs), protocol=pickle.HIGHEST_PROTOCOL))
+        chunks.extend(self._get_nodes_key(document.contents()))
+        return self._build_cache.key(*chunks)
+
+    def _get_options_key(self):
+        """
+        フォント、スタイル、出力に影響する設定を表す文字列
+        """
+        font_file = digest_file(self._path_to_font) if self._path_to_font else None
+        image_cache = (self._image_cache.dpi, self._image_cache.quality) if self._image_cache else None
+        # 目次のキャッシュは、単一パスで予約する目次のページ数と multiBuild の最初のパスの目次を変える
+        # (章の並列化では使わないため、断片のキーには含めない)
+        parallel = self._parallel_chapters > 1 and parallel_chapters.available()
+        toc_entries = None if parallel else self._load_toc_cache()
+        return repr((
+            reportlab.Version, self._font, font_file, self._style_sheet.key,
+            self._document.double_column, self._compact_tables, self._cjk_paragraphs, self._large_table_rows,
+            self._single_pass,
+            min(self._parallel_chapters, 2), image_cache, self._page_compression, toc_entries,
+        ))
+
+    def _get_nodes_key(self, nodes):
+        """
+        ノードごとに、その内容(画像はファイルの内容)を表すバイト列を返すイテレータ
+        """
+        for node in nodes:
+            if isinstance(node, TableNode):
+                # 整形済みの文字列は値から決まるため、キーには含めない
+                node = TableNode(node.columns, node.title, node.index)
+            yield pickle.dumps(node, protocol=pickle.HIGHEST_PROTOCOL)
+            if isinstance(node, ImageNode):
+                yield digest_file(node.path)
+
+    def _create_doc(self, path: str):
+        doc = MyDocTemplate(path, chapter_levels=self._style_sheet.chapter_levels,
+                            profiler=self._profiler, pagesize=A4, pageCompression=self._page_compression)
+        if self._profiler:
+            self._profiler.attach(doc)
+        return self._setup_template(doc)
+
+    def _phase(self, name: str):
+        if self._profiler:
+            return self._profiler.phase(name)
+        return nullcontext()
+
+    def _create_story(self, add_table_of_contents):
         story = []
 
         story = self._add_title(story)
 
         story.append(NextPageTemplate('TableOfContents'))
         story.append(PageBreak())
-        story = self._add_table_of_contents(story)
+        story = add_table_of_contents(story)
 
-        if self._double_colmuns:
+        if self._document.double_column:
             story.append(NextPageTemplate('BodyPagesInDoubleColumn'))
         else:
             story.append(NextPageTemplate('BodyPagesInSingleColumn'))
@@ -241,45 +819,287 @@ class PaperGenerator(PaperGeneratorInterface):
 
         story = self._add_reference(story)
 
-        doc.multiBuild(story)
+        if self._profiler:
+            # ディスクに書き出した本文は MyDocTemplate.filterFlowables で展開するときに計測する
+            self._profiler.instrument([f for f in story if not isinstance(f, SpooledContents)],
+                                      self._style_sheet.chapter_levels)
+        return story
+
+    def _run_parallel(self, path: str):
+        """
+        最上位の章ごとに別プロセスで本文の断片を組み、表紙・目次・引用文献と連結する。
+        目次のページ番号と各ページのページ番号は、断片ごとのページのずれから求める。
+        """
+        with self._phase('fragments'):
+            nodes = self._document.contents()
+            if self._image_cache:
+                # 画像の縮小は親プロセスで行い、ワーカーには縮小後のパスを渡す
+                nodes = (ImageNode(self._get_image_path(node.path), node.title, node.index)
+                         if isinstance(node, ImageNode) else node for node in nodes)
+            options = {
+                'font': self._font,
+                'path_to_font': self._path_to_font,
+                'style_sheet': self._style_sheet,
+                'double_column': self._document.double_column,
+                'compact_tables': self._compact_tables,
+                'cjk_paragraphs': self._cjk_paragraphs,
+                'large_table_rows': self._large_table_rows,
+                'workers': self._parallel_chapters,
+                'page_compression': self._page_compression,
+            }
+            fragments = split_chapters(nodes)
+            keys = [None] * len(fragments)
+            bodies = [None] * len(fragments)
+            if self._build_cache:
+                # 変更のない章は保存済みの断片を使う
+                options_key = self._get_options_key()
+                for i, fragment in enumerate(fragments):
+                    keys[i] = self._build_cache.key(options_key, *self._get_nodes_key(fragment))
+                    bodies[i] = self._build_cache.get_fragment(keys[i])
+            missing = [i for i, body in enumerate(bodies) if body is None]
+            rendered, references = parallel_chapters.render_fragments(
+                [fragments[i] for i in missing], options, self._parallel_chapters,
+                lambda: self._render_fragment(self._add_reference([]), 'References'))
+            for i, body in zip(missing, rendered):
+                bodies[i] = body
+                if self._build_cache:
+                    self._build_cache.put_fragment(keys[i], body)
+
+        with self._phase('table_of_contents'):
+            width, height = self._get_table_of_contents_size()
+            headings = [entry for _, _, local_entries in bodies for entry in local_entries]
+            front_pages = 1 + self._count_table_of_contents_pages(headings, width, height)
+            front_passes = 0
+            while True:
+                front_passes += 1
+                entries = []
+                offset = front_pages
+                for _, pages, local_entries in bodies:
+                    entries.extend((level, text, page + offset) for level, text, page in local_entries)
+                    offset += pages
+                front, pages, _ = self._render_front(entries)
+                if pages == front_pages:
+                    break
+                front_pages = pages
+
+        with self._phase('write'):
+            parts = [front] + [data for data, _, _ in bodies]
+            if references[1] > 0:
+                parts.append(references[0])
+                offset += references[1]
+            page_numbers = io.BytesIO()
+            canvas = Canvas(page_numbers, pagesize=A4, pageCompression=self._page_compression)
+            for page in range(front_pages + 1, offset + 1):
+                self._draw_page_number(canvas, page)
+                canvas.showPage()
+            canvas.save()
+            parallel_chapters.stitch(parts, page_numbers.getvalue(), front_pages, path)
+        self._save_toc_cache(entries)
+        if self._profiler:
+            # パス数は表紙と目次を組んだ回数(本文の断片はそれぞれ1回だけ組む)
+            self._profiler.set_pages(offset, front_passes)
+            self._profiler.add_note('Body fragments are rendered in worker processes; '
+                                    'their flowables are not timed.')
+
+    def _render_front(self, entries):
+        """
+        表紙と、entries をページ番号とする目次を組む
+        """
+        story = self._add_title([])
+        story.append(NextPageTemplate('TableOfContents'))
+        story.append(PageBreak())
+        story = self._add_table_of_contents(story, entries)
+        return self._render_fragment(story, 'FirstPage', page_numbers=True)
+
+    def _render_body_fragment(self, nodes):
+        """
+        本文のノードをページ番号なしで組む。parallel_chapters のワーカーから呼ばれる。
+        """
+        story = []
+        for node in nodes:
+            story.extend(self._create_flowables(node))
+        if self._document.double_column:
+            return self._render_fragment(story, 'BodyPagesInDoubleColumn')
+        return self._render_fragment(story, 'BodyPagesInSingleColumn')
 
-    def _add_table_of_contents(self, story):
-        style_toc = ParagraphStyle(name='TOCTitle', fontName=self._font,
-                          fontSize=18, alignment=TA_CENTER, spaceAfter=20)
+    def _render_fragment(self, story, template_id: str, page_numbers: bool = False):
+        """
+        template_id のページから story を組む。
+        戻り値: (PDF のバイト列, ページ数, 目次の項目)
+        """
+        buffer = io.BytesIO()
+        doc = MyDocTemplate(buffer, chapter_levels=self._style_sheet.chapter_levels,
+                            page_numbers=page_numbers, pagesize=A4, pageCompression=self._page_compression)
+        doc = self._setup_template(doc)
+        doc._firstPageTemplateIndex = [template.id for template in doc.pageTemplates].index(template_id)
+        if not story:
+            return b'', 0, []
+        doc.build(story)
+        return buffer.getvalue(), doc.page, doc.toc_entries
 
-        story.append(Paragraph("目次", style_toc))
+    def _run_single_pass(self, path: str):
+        """
+        目次用のページを見出し数から見積もって予約し、本文を1回だけレイアウトする。
+        目次のページ番号は本文のレイアウト後にフォームとして書き込む。
+        予約したページ数で足りなかった場合のみ、ページ数を増やしてもう一度レイアウトする。
+        """
+        entries = self._load_toc_cache()
+        if entries is None:
+            entries = [(rank, title, 0) for rank, title in self._document.headings]
+        width, height = self._get_table_of_contents_size()
+        pages = self._count_table_of_contents_pages(entries, width, height)
+
+        while True:
+            doc = self._create_doc(path)
+            with self._phase('story'):
+                story = self._create_story(
+                    lambda story: self._add_reserved_table_of_contents(story, pages))
+            doc._doSave = 0
+            # multiBuild と同様に、レイアウト中に flowable へ付いた印を次のパスの前に消す
+            edits = []
+            doc._multiBuildEdits = edits.append
+            doc.build(story)
+            for edit in edits:
+                edit[0](*edit[1:])
+
+            required = self._count_table_of_contents_pages(doc.toc_entries, width, height)
+            if required <= pages:
+                break
+            pages = required
+
+        with self._phase('table_of_contents'):
+            self._draw_table_of_contents(doc.canv, doc.toc_entries, pages, width, height)
+        doc.canv.save()
+        self._save_toc_cache(doc.toc_entries)
+
+    def _get_table_of_contents_size(self):
+        """
+        目次ページのフレーム内で利用できる幅と高さ
+        """
+        page_width, page_height = A4
+        margin = 40
+        gap = 20
+        padding = 6
+        return page_width - 2*margin - gap - 2*padding, page_height - 2*margin - 2*padding
+
+    def _add_reserved_table_of_contents(self, story, pages: int):
+        for i in range(pages):
+            if i > 0:
+                story.append(PageBreak())
+            story.append(ReservedPage(f'TableOfContentsPage{i}'))
+        return story
+
+    def _count_table_of_contents_pages(self, entries, width, height):
+        key = tuple(entries)
+        if self._toc_page_counts is not None and key in self._toc_page_counts:
+            return self._toc_page_counts[key]
+        canvas = Canvas(io.BytesIO(), pagesize=A4)
+        flowables = self._add_table_of_contents([], entries)
+        pages = self._fill_pages(flowables, canvas, width, height)
+        if self._toc_page_counts is not None:
+            self._toc_page_counts[key] = pages
+        return pages
+
+    def _draw_table_of_contents(self, canvas, entries, pages, width, height):
+        flowables = self._add_table_of_contents([], entries)
+        form_names = [f'TableOfContentsPage{i}' for i in range(pages)]
+        self._fill_pages(flowables, canvas, width, height, form_names)
+
+    def _fill_pages(self, flowables, canvas, width, height, form_names=None):
+        """
+        flowables を width x height の領域へ順に流し込み、使用したページ数を返す。
+        form_names を指定した場合は各ページをその名前のフォームとして描画する。
+        """
+        flowables = list(flowables)
+        pages = 0
+        while flowables or (form_names and pages < len(form_names)):
+            if form_names:
+                canvas.beginForm(form_names[pages], 0, 0, width, height)
+            frame = Frame(0, 0, width, height, leftPadding=0, bottomPadding=0, rightPadding=0, topPadding=0)
+            placed = 0
+            while flowables:
+                if frame.add(flowables[0], canvas):
+                    del flowables[0]
+                    placed += 1
+                    continue
+                parts = frame.split(flowables[0], canvas)
+                if len(parts) == 0:
+                    break
+                flowables[0:1] = parts
+                if frame.add(flowables[0], canvas):
+                    del flowables[0]
+                    placed += 1
+                else:
+                    break
+            if form_names:
+                canvas.endForm()
+            if flowables and placed == 0:
+                raise LayoutError('Table of contents does not fit in a page.')
+            pages += 1
+        return pages
+
+    def _load_toc_cache(self):
+        """
+        前回のビルドで保存した見出しとページ番号を読み込む。
+        見出しの構成が変わっている場合は使用しない。
+        """
+        if not self._toc_cache or not os.path.exists(self._toc_cache):
+            return None
+        with open(self._toc_cache, encoding='utf-8') as f:
+            entries = [tuple(entry) for entry in json.load(f)]
+        if [(level, text) for level, text, _ in entries] != self._document.headings:
+            return None
+        return entries
+
+    def _save_toc_cache(self, entries):
+        if not self._toc_cache:
+            return
+        with open(self._toc_cache, 'w', encoding='utf-8') as f:
+            json.dump([list(entry) for entry in entries], f, ensure_ascii=False)
+
+    def _add_table_of_contents(self, story, entries=None):
+        story.append(Paragraph("目次", self._style_sheet.toc_title))
         toc = TableOfContents()
         # TOCのスタイルをカスタマイズ
-        toc.levelStyles = [
-            ParagraphStyle('toc_level1', fontName=self._font, fontSize=12, leftIndent=20, firstLineIndent=-20, spaceBefore=5),
-            ParagraphStyle('toc_level2', fontName=self._font, fontSize=10, leftIndent=40, firstLineIndent=-20, spaceBefore=2),
-            ParagraphStyle('toc_level3', fontName=self._font, fontSize=10, leftIndent=50, firstLineIndent=-20, spaceBefore=2),
-            ParagraphStyle('toc_level4', fontName=self._font, fontSize=10, leftIndent=60, firstLineIndent=-20, spaceBefore=2),
-            ParagraphStyle('toc_level5', fontName=self._font, fontSize=10, leftIndent=70, firstLineIndent=-20, spaceBefore=2),
-            ParagraphStyle('toc_level6', fontName=self._font, fontSize=10, leftIndent=80, firstLineIndent=-20, spaceBefore=2),
-            ParagraphStyle('toc_level7', fontName=self._font, fontSize=10, leftIndent=90, firstLineIndent=-20, spaceBefore=2),
-            ParagraphStyle('toc_level8', fontName=self._font, fontSize=10, leftIndent=100, firstLineIndent=-20, spaceBefore=2),
-        ]
+        toc.levelStyles = list(self._style_sheet.toc_levels)
+        if entries is not None:
+            # ページ番号が確定済みの目次をそのまま描画する
+            toc.addEntries(entries)
+            toc.beforeBuild()
+        else:
+            # 前回のページ番号を与えておくと、multiBuild の1回目のパスから目次が確定する
+            toc.addEntries(self._load_toc_cache() or [])
 
         story.append(toc)
         return story
 
     def _add_reference(self, story):
-        reference_style = ParagraphStyle(
-            'Reference', fontName=self._font, fontSize=9, leading=11
-        )
+        static = self._get_static_flowables('references')
+        if static is not None:
+            story.extend(static)
+            return story
+        reference_style = self._style_sheet.reference
 
         # 最後のページ：引用文献
-        if len(self._refs) > 0:
-            for i in range(len(self._refs)):
-                story.append(Paragraph(f'{i + 1}. {self._refs[i]}', reference_style))
+        refs = self._document.refs
+        if len(refs) > 0:
+            for i in range(len(refs)):
+                story.append(Paragraph(f'{i + 1}. {refs[i]}', reference_style))
         return story
 
     def _add_body(self, story):
 
         # 本文（1ページ目下部2段組から開始）
-        for content in self._contents:
-            story.append(content)
+        # 文書モデルのノードはここで初めて flowable にする
+        create_flowables = self._create_flowables
+        if self._draft and self._draft_chapters:
+            create_flowables = self._select_chapters(self._draft_chapters)
+        spool = self._document.spool
+        if spool is not None:
+            story.append(SpooledContents(spool, 0, create_flowables))
+            return story
+        for node in self._document.contents():
+            story.extend(create_flowables(node))
         return story
 
     def _setup_template(self, doc):
@@ -348,40 +1168,27 @@ class PaperGenerator(PaperGeneratorInterface):
 
 
     def _add_title(self, story):
+        static = self._get_static_flowables('title')
+        if static is not None:
+            story.extend(static)
+            return story
         # タイトル
-        # --- スタイル定義 ---
-        title_style = ParagraphStyle(
-            'Title', fontName=self._font, fontSize=24, leading=28, alignment=1, spaceAfter=20
-        )
-        sub_title_style = ParagraphStyle(
-            'SubTitle', fontName=self._font, fontSize=20, leading=28, alignment=1, spaceAfter=20
-        )
-
-        authors_style = ParagraphStyle(
-            'Authors', fontName=self._font, fontSize=12, leading=14, alignment=1, spaceAfter=5
-        )
-
-
-        abstract_title_style = ParagraphStyle(
-            'Abstract', fontName=self._font, fontSize=14, leading=16, spaceAfter=20, alignment=1, leftIndent=80, rightIndent=80
-        )
-        abstract_body_style = ParagraphStyle(
-            'Abstract', fontName=self._font, fontSize=10, leading=12, alignment=1, leftIndent=80, rightIndent=80
-        )
+        sheet = self._style_sheet
 
         story.append(NextPageTemplate('FirstPage'))
 
-        story.append(Paragraph(self._title, title_style))
-        if self._sub_title:
-            story.append(Paragraph(f' - {self._sub_title} - ', sub_title_style))
+        document = self._document
+        story.append(Paragraph(document.title, sheet.title))
+        if document.sub_title:
+            story.append(Paragraph(f' - {document.sub_title} - ', sheet.sub_title))
 
-        for author in self._authors:
-            story.append(Paragraph(str(author), authors_style))
+        for author in document.authors:
+            story.append(Paragraph(str(author), sheet.authors))
 
         story.append(FrameBreak())
         
-        story.append(Paragraph('要旨', abstract_title_style))
-        story.append(Paragraph(self._abstract, abstract_body_style))
+        story.append(Paragraph('要旨', sheet.abstract_title))
+        story.append(Paragraph(document.abstract, sheet.abstract_body))
         return story
 
     def _transpose(self, matrix):
@@ -391,45 +1198,8 @@ class PaperGenerator(PaperGeneratorInterface):
         # zip(*matrix) はタプルを返すので list に変換
         return [list(row) for row in zip(*matrix)]
 
-    '''
-    量子化(quantize)する単位を調べる。
-    例：
-    [12, 2.3, 0.03] => 0.01
-    '''
-    def _get_quantize(self, values, digits=None):
-        """
-        values: 数値 or 文字列のリスト（例: [1, 2.3, '4.567']）
-        digits: そろえる小数桁数。Noneなら入力の中で最大の小数桁数に自動合わせ
-
-        戻り値: 小数部の桁数をそろえた文字列リスト
-        """
-        decs = []
-        max_frac = 0
-
-        # 1) Decimal化 & 最大小数桁数の決定
-        for v in values:
-            # 文字列化してからDecimalに渡すと見た目どおりの桁が保てます
-            s = str(v)
-            try:
-                d = Decimal(s)
-            except InvalidOperation:
-                # NaN/INFなどや数値でない場合はそのまま返すために保持
-                decs.append(s)
-                continue
-
-            decs.append(d)
-            if d.is_finite():
-                # 小数桁数 = 負のexponentの絶対値
-                frac = -d.as_tuple().exponent if d.as_tuple().exponent < 0 else 0
-                if frac > max_frac:
-                    max_frac = frac
-
-        # 2) そろえる桁数を決定
-        scale = max_frac if digits is None else int(digits)
-        quant = Decimal(1).scaleb(-scale)  # 10**(-scale)
-        return quant
-
 if __name__ == '__main__':
+    from sample_tester import generate_sample
     path="sample_paper_with_pagenum.pdf"
     pg = PaperGenerator('ShipporiMincho', './Shippori_Mincho/ShipporiMincho-Regular.ttf')
     generate_sample(pg, path)
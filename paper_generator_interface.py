@@ -29,5 +29,17 @@ class PaperGeneratorInterface(object):
     def set_double_column(self, mode: bool):
         raise Exception
 
-    def run(self, path: str):
-        raise Exception
+    def run(self, path=None):
+        """
+        path: 出力先のパス、ファイルオブジェクトまたはソケット。None の場合は出力を memoryview で返す
+        """
+        raise Exception
+
+    async def run_async(self, path: str, renderer=None, timeout: float = None):
+        """
+        イベントループを止めずに run を実行する。
+        renderer: AsyncRenderer。省略時はスレッドで実行する既定の AsyncRenderer
+        timeout: 秒数。超えた場合は asyncio.TimeoutError
+        """
+        from async_renderer import get_default_renderer
+        return await (renderer or get_default_renderer()).run(self, path, timeout)
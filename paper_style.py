@@ -0,0 +1,109 @@
+"""
+PaperGenerator が使う ParagraphStyle をまとめたスタイルシート。
+
+スタイルシートはフォントとパラメータの組ごとに1回だけ作り、get_style_sheet で
+複数の PaperGenerator から共有する。ParagraphStyle は描画中に変更されないため共有してよい。
+
+パラメータは スタイルシートの属性名 → ParagraphStyle の引数 の dict で指定する。
+    get_style_sheet('HeiseiMin-W3', {'body': {'fontSize': 12, 'leading': 14}})
+章や目次の各レベルは 'chapter1' ～ 'chapter8'、'toc_level1' ～ 'toc_level8' で指定する。
+"""
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.styles import ParagraphStyle
+import threading
+
+from document_model import CHAPTER_LEVELS
+
+_DEFAULT_STYLES = {
+    'body': dict(name='Body', fontSize=10.5, leading=11, spaceAfter=5),
+    'image_description': dict(name='ImageDescription', fontSize=10.5, leading=11, spaceAfter=25, alignment=1),
+    'table_description': dict(name='TableDescription', fontSize=10.5, leading=11, spaceAfter=25, alignment=1),
+    'table_number': dict(name='Body', fontSize=9, leading=11, spaceAfter=5, alignment=2),
+    'table_string': dict(name='Body', fontSize=9, leading=11, spaceAfter=5, alignment=0),
+    'toc_title': dict(name='TOCTitle', fontSize=18, alignment=TA_CENTER, spaceAfter=20),
+    'reference': dict(name='Reference', fontSize=9, leading=11),
+    'title': dict(name='Title', fontSize=24, leading=28, alignment=1, spaceAfter=20),
+    'sub_title': dict(name='SubTitle', fontSize=20, leading=28, alignment=1, spaceAfter=20),
+    'authors': dict(name='Authors', fontSize=12, leading=14, alignment=1, spaceAfter=5),
+    'abstract_title': dict(name='Abstract', fontSize=14, leading=16, spaceAfter=20, alignment=1, leftIndent=80, rightIndent=80),
+    'abstract_body': dict(name='Abstract', fontSize=10, leading=12, alignment=1, leftIndent=80, rightIndent=80),
+    'chapter1': dict(name='CapterRank1', fontSize=15, leading=17, spaceBefore=10, spaceAfter=5, leftIndent=10, outlineLevel=0),
+    'chapter2': dict(name='CapterRank2', fontSize=14, leading=16, spaceBefore=9, spaceAfter=5, leftIndent=10, outlineLevel=1),
+    'chapter3': dict(name='CapterRank3', fontSize=13, leading=15, spaceBefore=8, spaceAfter=5, leftIndent=10, outlineLevel=2),
+    'chapter4': dict(name='CapterRank4', fontSize=12, leading=14, spaceBefore=7, spaceAfter=5, leftIndent=10, outlineLevel=3),
+    'chapter5': dict(name='CapterRank5', fontSize=11, leading=13, spaceBefore=6, spaceAfter=5, leftIndent=10, outlineLevel=4),
+    'chapter6': dict(name='CapterRank6', fontSize=11, leading=13, spaceBefore=6, spaceAfter=5, leftIndent=10, outlineLevel=5),
+    'chapter7': dict(name='CapterRank7', fontSize=11, leading=13, spaceBefore=6, spaceAfter=5, leftIndent=10, outlineLevel=6),
+    'chapter8': dict(name='CapterRank8', fontSize=11, leading=13, spaceBefore=6, spaceAfter=5, leftIndent=10, outlineLevel=7),
+    'toc_level1': dict(name='toc_level1', fontSize=12, leftIndent=20, firstLineIndent=-20, spaceBefore=5),
+    'toc_level2': dict(name='toc_level2', fontSize=10, leftIndent=40, firstLineIndent=-20, spaceBefore=2),
+    'toc_level3': dict(name='toc_level3', fontSize=10, leftIndent=50, firstLineIndent=-20, spaceBefore=2),
+    'toc_level4': dict(name='toc_level4', fontSize=10, leftIndent=60, firstLineIndent=-20, spaceBefore=2),
+    'toc_level5': dict(name='toc_level5', fontSize=10, leftIndent=70, firstLineIndent=-20, spaceBefore=2),
+    'toc_level6': dict(name='toc_level6', fontSize=10, leftIndent=80, firstLineIndent=-20, spaceBefore=2),
+    'toc_level7': dict(name='toc_level7', fontSize=10, leftIndent=90, firstLineIndent=-20, spaceBefore=2),
+    'toc_level8': dict(name='toc_level8', fontSize=10, leftIndent=100, firstLineIndent=-20, spaceBefore=2),
+}
+
+
+class PaperStyleSheet:
+    def __init__(self, font: str, params: dict = None):
+        self.font = font
+        # フォントとパラメータが同じスタイルシートは同じキーになる
+        self.key = (font, _freeze(params))
+        params = params or {}
+        self.params = params
+        for key in params:
+            if key not in _DEFAULT_STYLES:
+                raise ValueError(f'{key} is not a style of PaperStyleSheet.')
+        styles = {}
+        for key, default in _DEFAULT_STYLES.items():
+            kwargs = dict(default, fontName=font)
+            kwargs.update(params.get(key, {}))
+            styles[key] = ParagraphStyle(**kwargs)
+
+        self.body = styles['body']
+        self.image_description = styles['image_description']
+        self.table_description = styles['table_description']
+        self.table_number = styles['table_number']
+        self.table_string = styles['table_string']
+        self.toc_title = styles['toc_title']
+        self.reference = styles['reference']
+        self.title = styles['title']
+        self.sub_title = styles['sub_title']
+        self.authors = styles['authors']
+        self.abstract_title = styles['abstract_title']
+        self.abstract_body = styles['abstract_body']
+        self.chapters = [styles[f'chapter{level + 1}'] for level in range(CHAPTER_LEVELS)]
+        self.toc_levels = [styles[f'toc_level{level + 1}'] for level in range(CHAPTER_LEVELS)]
+        # 見出しのスタイル名 → 目次のレベル
+        self.chapter_levels = {style.name: level for level, style in enumerate(self.chapters)}
+
+    def with_font(self, font: str):
+        """
+        パラメータが同じで、フォントだけが異なるスタイルシート
+        """
+        return get_style_sheet(font, self.params)
+
+
+_style_sheets = {}
+_lock = threading.Lock()
+
+
+def _freeze(params: dict):
+    if not params:
+        return ()
+    return tuple(sorted((key, tuple(sorted(value.items()))) for key, value in params.items()))
+
+
+def get_style_sheet(font: str, params: dict = None):
+    """
+    フォントとパラメータの組ごとに作ったスタイルシートを返す
+    """
+    key = (font, _freeze(params))
+    with _lock:
+        sheet = _style_sheets.get(key)
+        if sheet is None:
+            sheet = PaperStyleSheet(font, params)
+            _style_sheets[key] = sheet
+        return sheet
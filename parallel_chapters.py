@@ -0,0 +1,74 @@
+"""
+最上位の章(add_chapter(..., 0))ごとに別プロセスで PDF の断片を組み、1つの PDF にまとめる。
+
+PaperGenerator.set_parallel_chapters で使う。最上位の章は新しいページから始まるため、
+各章のレイアウトは前の章に依存しない。断片はページ番号を描かずに組み、
+まとめる際に断片ごとのページのずれを使って目次のページ番号とページ番号を補正する。
+
+断片をまとめるには pypdf が必要。
+"""
+from concurrent.futures import ProcessPoolExecutor
+import importlib.util
+import io
+
+# ワーカープロセスごとの PaperGenerator
+_worker = None
+
+
+def available():
+    # pypdf は読み込みに時間がかかるため、まとめる時まで読み込まない
+    return importlib.util.find_spec('pypdf') is not None
+
+
+def _init_worker(options: dict):
+    global _worker
+    from paper_generator import PaperGenerator
+    from reportlab import rl_config
+    # ASCII85 で符号化したストリームは、まとめる際の重複の判定で復号に時間がかかる
+    rl_config.useA85 = 0
+    _worker = PaperGenerator(options['font'], options['path_to_font'], options['style_sheet'])
+    _worker.set_double_column(options['double_column'])
+    _worker.set_compact_table(options['compact_tables'])
+    _worker.set_cjk_paragraphs(options['cjk_paragraphs'])
+    _worker.set_large_tables(options['large_table_rows'])
+    _worker.set_parallel_chapters(options['workers'])
+    _worker.set_page_compression(options['page_compression'])
+
+
+def _render_body(nodes):
+    return _worker._render_body_fragment(nodes)
+
+
+def render_fragments(fragments, options: dict, workers: int, render_in_parent=None):
+    """
+    fragments の各断片をプロセスプールで組み、入力と同じ順に (PDF, ページ数, 目次の項目) を返す。
+    render_in_parent: 指定すると、ワーカーの処理中に親プロセスで呼び出す。戻り値は2番目に返す。
+    """
+    if not fragments:
+        return [], render_in_parent() if render_in_parent else None
+    with ProcessPoolExecutor(max_workers=min(workers, max(1, len(fragments))),
+                             initializer=_init_worker, initargs=(options,)) as executor:
+        results = executor.map(_render_body, fragments)
+        parent = render_in_parent() if render_in_parent else None
+        return list(results), parent
+
+
+def stitch(parts, page_numbers: bytes, first_numbered: int, output):
+    """
+    parts の PDF を順に連結し、first_numbered ページ目(0始まり)以降に page_numbers の各ページを重ねる。
+    output: 出力先のパスまたはファイルオブジェクト
+    """
+    from pypdf import PdfReader, PdfWriter
+    writer = PdfWriter()
+    readers = [PdfReader(io.BytesIO(data)) for data in parts]
+    for reader in readers:
+        writer.append(reader)
+    if readers and readers[0].metadata:
+        writer.add_metadata(readers[0].metadata)
+    numbers = PdfReader(io.BytesIO(page_numbers))
+    for page, number in zip(writer.pages[first_numbered:], numbers.pages):
+        # 直列に組んだ場合と同じく、ページ番号を本文より先に描画する
+        page.merge_page(number, over=False)
+    # 断片ごとに埋め込まれた同じ画像やフォントを1つにする
+    writer.compress_identical_objects(remove_identicals=True, remove_orphans=True)
+    writer.write(output)
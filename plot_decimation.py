@@ -0,0 +1,242 @@
+"""
+グラフの系列の点を減らす(間引く)。
+
+数百万点の系列をそのまま描くと、描画にかかる時間と PDF の大きさが点の数に比例する。
+グラフの幅を columns 個の列(ピクセルの列に相当する)に分け、列ごとに表示に必要な点だけを残す。
+
+- 'minmax': 列ごとに y が最小の点と最大の点を残す。線の上下の振れ幅は間引く前と変わらない
+- 'lttb': Largest-Triangle-Three-Buckets。点を columns 個の区間に分け、区間ごとに
+          前後の区間の点と作る三角形の面積が最大の点を1つ残す。線の形が自然に見える
+
+散布図は、グラフを点の大きさ程度の格子に分け、点のある格子ごとに最初の1点を残す。
+棒グラフは、列ごとに全系列で絶対値が最大の棒の位置を残す(系列の間で同じ位置にそろえる)。
+NumPy の配列はベクトル演算で処理し、リストは Python で処理する。
+"""
+import math
+import sys
+
+# NumPy の配列は NumPy を読み込んだ呼び出し元からしか渡されないため、ここでは読み込まない
+numpy = None
+
+COLUMNS = 500           # 幅 240pt のグラフを 150dpi で表示した場合のピクセル数程度
+SCATTER_COLUMNS = 150   # 散布図の格子の列の数(行の数は高さに合わせる)
+BAR_COLUMNS = 120       # 棒グラフの棒の数の上限
+METHODS = ('minmax', 'lttb')
+KINDS = ('line', 'scatter', 'bar')
+
+
+def _is_array(values):
+    global numpy
+    if numpy is None:
+        numpy = sys.modules.get('numpy')
+    return numpy is not None and isinstance(values, numpy.ndarray)
+
+
+def split_series(y):
+    """
+    y (1次元の列、2次元の配列、または列のリスト)を系列のリストにする
+    """
+    if _is_array(y):
+        return list(y) if y.ndim == 2 else [y]
+    y = list(y)
+    if y and (_is_array(y[0]) or isinstance(y[0], (list, tuple))):
+        return y
+    return [y]
+
+
+def decimate(x, y, columns: int = COLUMNS, method: str = 'minmax'):
+    """
+    (x, y) の点を columns 列分に減らし、x の昇順に並べた (x のリスト, y のリスト) を返す。
+    x が None の場合は 0, 1, 2, ... とする。有限でない値の点は除く
+    """
+    if method not in METHODS:
+        raise ValueError(f'{method} is not a decimation method. Use one of {", ".join(METHODS)}.')
+    if _is_array(x) or _is_array(y):
+        x, y = _finite_arrays(x, y)
+        if len(x) > columns:
+            x, y = (_minmax_arrays if method == 'minmax' else _lttb_arrays)(x, y, columns)
+        return x.tolist(), y.tolist()
+    x, y = _finite_lists(x, y)
+    if len(x) > columns:
+        x, y = (_minmax_lists if method == 'minmax' else _lttb_lists)(x, y, columns)
+    return x, y
+
+
+def decimate_scatter(x, y, columns: int = SCATTER_COLUMNS, rows: int = None):
+    """
+    (x, y) の点を columns x rows の格子ごとに1点にし、(x のリスト, y のリスト) を返す。
+    rows を省略した場合は columns の 2/3 とする
+    """
+    rows = rows or max(1, columns * 2 // 3)
+    if _is_array(x) or _is_array(y):
+        x, y = _finite_arrays(x, y, sort=False)
+        if len(x) > columns:
+            cells = _cells_array(x, columns) * rows + _cells_array(y, rows)
+            _, keep = numpy.unique(cells, return_index=True)
+            keep.sort()
+            x, y = x[keep], y[keep]
+        return x.tolist(), y.tolist()
+    x, y = _finite_lists(x, y, sort=False)
+    if len(x) > columns:
+        seen = set()
+        keep = []
+        for i, cell in enumerate(zip(_cells_list(x, columns), _cells_list(y, rows))):
+            if cell not in seen:
+                seen.add(cell)
+                keep.append(i)
+        x, y = [x[i] for i in keep], [y[i] for i in keep]
+    return x, y
+
+
+def decimate_bars(series, columns: int = BAR_COLUMNS):
+    """
+    同じ長さの棒の値の列のリストを columns 本以下にする。
+    どの系列も同じ位置の棒を残す(列ごとに、全系列で絶対値が最大の棒の位置)。
+    戻り値: (残した棒の位置のリスト, 系列ごとの値のリストのリスト)
+    """
+    if any(_is_array(values) for values in series):
+        matrix = numpy.asarray([numpy.asarray(values, dtype=numpy.float64) for values in series])
+        size = matrix.shape[1]
+        if size <= columns:
+            return list(range(size)), matrix.tolist()
+        scores = numpy.abs(matrix)
+        scores[~numpy.isfinite(scores)] = -1
+        starts = (numpy.arange(columns) * size) // columns
+        indexes = _extreme_indices(scores.max(axis=0), starts, numpy.maximum)
+        return indexes.tolist(), matrix[:, indexes].tolist()
+    series = [[float(v) for v in values] for values in series]
+    size = len(series[0])
+    if size <= columns:
+        return list(range(size)), series
+    scores = [max(abs(v) if math.isfinite(v) else -1 for v in column) for column in zip(*series)]
+    indexes = []
+    for column in range(columns):
+        start, end = column * size // columns, (column + 1) * size // columns
+        indexes.append(max(range(start, end), key=lambda i: scores[i]))
+    return indexes, [[values[i] for i in indexes] for values in series]
+
+
+# --- NumPy の配列 ---
+
+def _finite_arrays(x, y, sort: bool = True):
+    y = numpy.asarray(y, dtype=numpy.float64)
+    x = numpy.arange(len(y), dtype=numpy.float64) if x is None else numpy.asarray(x, dtype=numpy.float64)
+    finite = numpy.isfinite(x) & numpy.isfinite(y)
+    if not finite.all():
+        x, y = x[finite], y[finite]
+    if sort and len(x) > 1 and (x[1:] < x[:-1]).any():
+        order = numpy.argsort(x, kind='stable')
+        x, y = x[order], y[order]
+    return x, y
+
+
+def _column_starts(x, columns: int):
+    """
+    x の昇順に並んだ点を x の値で columns 列に分けた、空でない列の先頭の位置
+    """
+    span = x[-1] - x[0]
+    if span <= 0:
+        return numpy.zeros(1, dtype=numpy.int64)
+    bins = numpy.minimum(((x - x[0]) * (columns / span)).astype(numpy.int64), columns - 1)
+    return numpy.flatnonzero(numpy.r_[True, bins[1:] != bins[:-1]])
+
+
+def _cells_array(values, count: int):
+    low, high = values.min(), values.max()
+    if high <= low:
+        return numpy.zeros(len(values), dtype=numpy.int64)
+    return numpy.minimum(((values - low) * (count / (high - low))).astype(numpy.int64), count - 1)
+
+
+def _extreme_indices(values, starts, ufunc):
+    """
+    starts で区切った区間ごとに、ufunc (numpy.minimum / numpy.maximum) で選ぶ値の最初の位置
+    """
+    extremes = ufunc.reduceat(values, starts)
+    segments = numpy.repeat(numpy.arange(len(starts)), numpy.diff(numpy.r_[starts, len(values)]))
+    candidates = numpy.flatnonzero(values == extremes[segments])
+    _, first = numpy.unique(segments[candidates], return_index=True)
+    return candidates[first]
+
+
+def _minmax_arrays(x, y, columns: int):
+    starts = _column_starts(x, columns)
+    keep = numpy.union1d(_extreme_indices(y, starts, numpy.minimum), _extreme_indices(y, starts, numpy.maximum))
+    return x[keep], y[keep]
+
+
+def _lttb_arrays(x, y, columns: int):
+    size = len(x)
+    every = (size - 2) / (columns - 2)
+    keep = numpy.empty(columns, dtype=numpy.int64)
+    keep[0], keep[-1] = 0, size - 1
+    a = 0
+    for i in range(columns - 2):
+        start, end = int(i * every) + 1, int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, size)
+        if next_end > end:
+            next_x, next_y = x[end:next_end].mean(), y[end:next_end].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        areas = numpy.abs((x[a] - next_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (next_y - y[a]))
+        a = start + int(areas.argmax())
+        keep[i + 1] = a
+    return x[keep], y[keep]
+
+
+# --- リスト ---
+
+def _finite_lists(x, y, sort: bool = True):
+    y = list(y)
+    x = range(len(y)) if x is None else list(x)
+    points = [(float(px), float(py)) for px, py in zip(x, y)]
+    points = [p for p in points if math.isfinite(p[0]) and math.isfinite(p[1])]
+    if sort and any(points[i][0] > points[i + 1][0] for i in range(len(points) - 1)):
+        points.sort(key=lambda p: p[0])
+    return [p[0] for p in points], [p[1] for p in points]
+
+
+def _cells_list(values, count: int):
+    low, high = min(values), max(values)
+    scale = count / (high - low) if high > low else 0
+    return [min(int((v - low) * scale), count - 1) for v in values]
+
+
+def _minmax_lists(x, y, columns: int):
+    span = x[-1] - x[0]
+    scale = columns / span if span > 0 else 0
+    keep = []
+    low = high = 0
+    column = 0
+    for i in range(len(x)):
+        c = min(int((x[i] - x[0]) * scale), columns - 1)
+        if c != column:
+            keep.extend(sorted({low, high}))
+            low = high = i
+            column = c
+        elif y[i] < y[low]:
+            low = i
+        elif y[i] > y[high]:
+            high = i
+    keep.extend(sorted({low, high}))
+    return [x[i] for i in keep], [y[i] for i in keep]
+
+
+def _lttb_lists(x, y, columns: int):
+    size = len(x)
+    every = (size - 2) / (columns - 2)
+    keep = [0]
+    a = 0
+    for i in range(columns - 2):
+        start, end = int(i * every) + 1, int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, size)
+        if next_end > end:
+            next_x = sum(x[end:next_end]) / (next_end - end)
+            next_y = sum(y[end:next_end]) / (next_end - end)
+        else:
+            next_x, next_y = x[-1], y[-1]
+        a = max(range(start, end),
+                key=lambda j: abs((x[a] - next_x) * (y[j] - y[a]) - (x[a] - x[j]) * (next_y - y[a])))
+        keep.append(a)
+    keep.append(size - 1)
+    return [x[i] for i in keep], [y[i] for i in keep]
@@ -0,0 +1,82 @@
+"""
+PlotNode を reportlab.graphics の Drawing (ベクター形式の図)にする。
+
+系列は Document.add_plot で間引いてあるため、描画する点の数はグラフの幅で決まる上限を超えない。
+"""
+from reportlab.graphics.charts.barcharts import VerticalBarChart
+from reportlab.graphics.charts.lineplots import LinePlot
+from reportlab.graphics.shapes import Drawing, Group, Path
+from reportlab.lib import colors
+
+SERIES_COLORS = [
+    colors.HexColor('#1f77b4'), colors.HexColor('#ff7f0e'), colors.HexColor('#2ca02c'),
+    colors.HexColor('#d62728'), colors.HexColor('#9467bd'), colors.HexColor('#8c564b'),
+]
+# 棒の名前を軸に描く棒の数の上限
+_MAX_BAR_LABELS = 20
+_FONT_SIZE = 7
+_DOT_SIZE = 1.5
+
+
+class _ScatterPlot(LinePlot):
+    """
+    系列ごとの点を1つの Path として描く LinePlot。
+    各点は長さ 0 の線分を丸い端で描いて点にする(点ごとに図形を作らないため、点が多くても速い)
+    """
+    def makeLines(self):
+        group = Group()
+        for row, style in zip(self._positions, self.lines):
+            path = Path(strokeColor=style.strokeColor, strokeWidth=_DOT_SIZE, strokeLineCap=1, fillColor=None)
+            for x, y in row:
+                path.moveTo(x, y)
+                path.lineTo(x, y)
+            group.add(path)
+        return group
+
+
+def create_drawing(node, width: float, height: float, font_name: str):
+    """
+    width x height (pt) の Drawing。軸の目盛りは font_name で描く
+    """
+    drawing = Drawing(width, height)
+    drawing.hAlign = 'CENTER'
+    if node.kind == 'bar':
+        chart = _create_bar_chart(node)
+        x_axis, y_axis = chart.categoryAxis, chart.valueAxis
+    else:
+        chart = _create_line_plot(node)
+        x_axis, y_axis = chart.xValueAxis, chart.yValueAxis
+    chart.x, chart.y = 32, 18
+    chart.width, chart.height = width - 40, height - 26
+    for axis in (x_axis, y_axis):
+        axis.labels.fontName = font_name
+        axis.labels.fontSize = _FONT_SIZE
+        axis.strokeWidth = 0.5
+    drawing.add(chart)
+    return drawing
+
+
+def _create_line_plot(node):
+    chart = _ScatterPlot() if node.kind == 'scatter' else LinePlot()
+    chart.data = [list(zip(x, y)) for x, y in node.series]
+    for i in range(len(node.series)):
+        chart.lines[i].strokeColor = SERIES_COLORS[i % len(SERIES_COLORS)]
+        chart.lines[i].strokeWidth = 0.5
+    return chart
+
+
+def _create_bar_chart(node):
+    chart = VerticalBarChart()
+    chart.data = [values for _, values in node.series]
+    chart.barSpacing = 0
+    chart.groupSpacing = 1 if len(chart.data[0]) > _MAX_BAR_LABELS else 4
+    chart.valueAxis.forceZero = 1
+    chart.categoryAxis.tickDown = 0
+    if node.labels and len(node.labels) <= _MAX_BAR_LABELS:
+        chart.categoryAxis.categoryNames = node.labels
+    else:
+        chart.categoryAxis.visibleLabels = 0
+    for i in range(len(chart.data)):
+        chart.bars[i].fillColor = SERIES_COLORS[i % len(SERIES_COLORS)]
+        chart.bars[i].strokeColor = None
+    return chart
@@ -0,0 +1,130 @@
+"""
+呼び出しを1回だけ記録し、複数の実装(バックエンド)へ並行して出力する。
+
+    pg = RecordingGenerator()
+    pg.add_target('pdf', 'paper.pdf', font='HeiseiMin-W3', calls=[['set_cjk_paragraphs', True]])
+    pg.add_target('latex', 'paper.tex')
+    pg.set_title('論文タイトル')
+    pg.add_chapter('チャプターA', 0)
+    ...
+    pg.run()
+
+set_* / add_* の内容は Document に記録する。章・図・表・参考文献の番号は追加時に、
+表の数値の整形は run の最初に1回だけ求め、Document.to_bytes で1回だけ直列化して
+すべてのワーカープロセスに渡す。各ワーカーは backends から実装を作って set_document し、run する。
+"""
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+from paper_generator_interface import PaperGeneratorInterface
+from document_model import Document
+from backends import create_generator
+import output_sink
+
+
+def _render_target(data: bytes, backend: str, path, options: dict, calls: list):
+    """
+    戻り値: path が None の場合は出力のバイト列、そうでなければ run の戻り値
+    """
+    pg = create_generator(backend, **options)
+    pg.set_document(Document.from_bytes(data))
+    for call in calls:
+        getattr(pg, call[0])(*call[1:])
+    result = pg.run(path)
+    if path is None:
+        # memoryview は pickle できない
+        return bytes(result)
+    return result
+
+
+class RecordingGenerator(PaperGeneratorInterface):
+    def __init__(self, workers: int = None):
+        """
+        workers: 同時に出力するプロセスの数。1 の場合はこのプロセスで順に出力する
+        """
+        self.workers = workers
+        self._document = Document()
+        self._targets = []
+
+    def add_target(self, backend: str, path=None, calls=None, **options):
+        """
+        backend: backends に登録した名前('pdf'、'latex' など)
+        path: 出力先のパスまたはファイルオブジェクト。None の場合は run の戻り値に出力を含める
+        calls: 実装に固有の設定の呼び出し [[メソッド名, 引数...]]
+        options: 実装のコンストラクタの引数
+        """
+        self._targets.append((backend, path, options, list(calls or [])))
+
+    def get_document(self):
+        return self._document
+
+    def set_document(self, document: Document):
+        self._document = document
+
+    def set_title(self, title: str):
+        self._document.title = title
+
+    def set_sub_title(self, sub_title: str):
+        self._document.sub_title = sub_title
+
+    def set_abstract(self, abstract: str):
+        self._document.abstract = abstract
+
+    def add_chapter(self, chapter: str, rank: int):
+        self._document.add_chapter(chapter, rank)
+
+    def add_sentence(self, sentence: str):
+        self._document.add_sentence(sentence)
+
+    def add_image(self, path: str, title: str):
+        self._document.add_image(path, title)
+
+    def add_table(self, data, title: str):
+        self._document.add_table(data, title)
+
+    def add_ref(self, author: str, title: str, year: int = None):
+        self._document.add_ref(author, title, year)
+
+    def add_author(self, author: str, title: str, year: int = None):
+        self._document.add_author(author, title)
+
+    def set_double_column(self, mode: bool):
+        self._document.double_column = mode
+
+    def run(self, path=None):
+        """
+        add_target で指定したすべての出力を作る。
+        path: 指定すると、add_target の相対パスをこのディレクトリからの相対パスとする
+        戻り値: 出力先ごとの結果のリスト(path が None の出力先は出力のバイト列)
+        """
+        if not self._targets:
+            raise ValueError('No target is added. Call add_target first.')
+        # 表の整形と直列化は、出力先の数によらず1回だけ行う
+        self._document.format_tables()
+        data = self._document.to_bytes()
+        jobs = [(backend, self._resolve(path, target), options, calls)
+                for backend, target, options, calls in self._targets]
+
+        workers = min(self.workers or os.cpu_count(), len(jobs))
+        if workers <= 1:
+            results = [_render_target(data, *job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(workers) as executor:
+                futures = [executor.submit(_render_target, data, *job) for job in jobs]
+                results = [future.result() for future in futures]
+
+        # ファイルオブジェクトは他のプロセスに渡せないため、ここで書き込む
+        for i, (_, target, _, _) in enumerate(self._targets):
+            if target is not None and not output_sink.is_path(target):
+                with output_sink.open_binary(target) as output:
+                    output.write(results[i])
+                results[i] = None
+        return results
+
+    def _resolve(self, directory, target):
+        if target is None or not output_sink.is_path(target):
+            # ファイルオブジェクトにはワーカーの出力を後で書き込む
+            return None
+        if directory is not None:
+            return os.path.join(directory, target)
+        return target
@@ -0,0 +1,97 @@
+"""
+render_server のクライアント。ReportLab を読み込まないため、すぐに起動できる。
+
+    client = RenderClient('http://127.0.0.1:8765')       # または RenderClient(unix_socket='/tmp/paper_generator.sock')
+    pdf = client.render({'calls': [['set_title', 'タイトル'], ['add_sentence', '本文']]})
+    client.render_to_path({'path': '/srv/out/report.pdf', 'calls': [...]})
+"""
+from urllib.parse import urlsplit
+import argparse
+import http.client
+import json
+import socket
+import sys
+
+
+class RenderQueueFull(Exception):
+    pass
+
+
+class RenderError(Exception):
+    pass
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float = None):
+        http.client.HTTPConnection.__init__(self, 'localhost', timeout=timeout)
+        self._unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self._unix_path)
+
+
+class RenderClient:
+    def __init__(self, url: str = 'http://127.0.0.1:8765', unix_socket: str = None, timeout: float = 300):
+        self.url = url
+        self.unix_socket = unix_socket
+        self.timeout = timeout
+
+    def render(self, spec: dict):
+        """
+        spec を PDF にしてバイト列を返す。spec に path がある場合はサーバーが書き出したパスを返す
+        """
+        status, headers, body = self._request('POST', '/render', json.dumps(spec, ensure_ascii=False).encode('utf-8'))
+        if status == 503:
+            raise RenderQueueFull(body.decode('utf-8'))
+        if status != 200:
+            raise RenderError(f'{status}: {body.decode("utf-8")}')
+        if headers.get('Content-Type') == 'application/json':
+            return json.loads(body)['path']
+        return body
+
+    def render_to_path(self, spec: dict):
+        if not spec.get('path'):
+            raise ValueError('spec needs a path to be rendered on the server.')
+        return self.render(spec)
+
+    def stats(self):
+        _, _, body = self._request('GET', '/stats')
+        return json.loads(body)
+
+    def _connection(self):
+        if self.unix_socket:
+            return _UnixHTTPConnection(self.unix_socket, self.timeout)
+        url = urlsplit(self.url)
+        return http.client.HTTPConnection(url.hostname, url.port or 80, timeout=self.timeout)
+
+    def _request(self, method: str, path: str, body: bytes = None):
+        connection = self._connection()
+        try:
+            headers = {'Content-Type': 'application/json'} if body is not None else {}
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            return response.status, dict(response.getheaders()), response.read()
+        finally:
+            connection.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='render_server に文書の仕様を送って PDF を受け取る')
+    parser.add_argument('spec', help='文書の仕様の JSON ファイル')
+    parser.add_argument('output', nargs='?', help='PDF の保存先。省略時は仕様の path にサーバーが書き出す')
+    parser.add_argument('--url', default='http://127.0.0.1:8765')
+    parser.add_argument('--unix-socket', default=None)
+    args = parser.parse_args()
+
+    with open(args.spec, encoding='utf-8') as f:
+        spec = json.load(f)
+    client = RenderClient(args.url, args.unix_socket)
+    if args.output:
+        spec.pop('path', None)
+        with open(args.output, 'wb') as f:
+            f.write(client.render(spec))
+    else:
+        print(client.render_to_path(spec))
+    sys.exit(0)
@@ -0,0 +1,272 @@
+"""
+PDF を生成し続ける常駐サーバー。
+
+起動時にワーカープロセスを立ち上げてフォントの登録とスタイルシートの作成を済ませておき、
+HTTP (TCP または Unix ソケット) で受け取った文書の仕様(batch_generator と同じ形式)を PDF にする。
+
+    python render_server.py --port 8765 --workers 4
+    python render_server.py --unix-socket /tmp/paper_generator.sock
+
+    POST /render   本文は文書の仕様の JSON。
+                   仕様に "path" がある場合はサーバー側でそのパスに書き出し、{"path": ..., "seconds": ...} を返す。
+                   無い場合は PDF のバイト列を返す。
+    GET  /stats    待ち・実行中の数などの JSON
+
+待ちと実行中の合計が --max-queue に達している間は、新しい要求に 503 を返す。
+クライアントは render_client.RenderClient を使う。
+"""
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import signal
+import threading
+import time
+import traceback
+
+from batch_generator import apply_spec
+from font_registry import register_font, prewarm
+from paper_style import get_style_sheet
+
+# ワーカープロセスごとのフォント設定
+_worker_font = None
+_worker_path_to_font = None
+# warm_up で各ワーカーに1件ずつ処理させるための、全ワーカーで共有するバリア
+_worker_barrier = None
+
+
+def _init_worker(font: str, path_to_font: str, barrier=None):
+    global _worker_font, _worker_path_to_font, _worker_barrier
+    _worker_font = font
+    _worker_path_to_font = path_to_font
+    _worker_barrier = barrier
+    register_font(font, path_to_font)
+    get_style_sheet(font)
+    # ReportLab の描画まわりを読み込んでおく
+    import paper_generator
+
+
+def _warm_up(timeout: float):
+    # すべてのワーカーがここに来るまで待つので、1つのワーカーが2件を処理することはない
+    _worker_barrier.wait(timeout)
+    return os.getpid()
+
+
+def _render(spec: dict):
+    """
+    戻り値: (出力先のパスまたは PDF のバイト列, 秒数)
+    """
+    from paper_generator import PaperGenerator
+    start = time.perf_counter()
+    pg = PaperGenerator(_worker_font, _worker_path_to_font)
+    apply_spec(pg, spec)
+    path = spec.get('path')
+    if path:
+        pg.run(path)
+        return path, time.perf_counter() - start
+    buffer = io.BytesIO()
+    pg.run(buffer)
+    return buffer.getvalue(), time.perf_counter() - start
+
+
+class RenderService:
+    def __init__(self, font='HeiseiMin-W3', path_to_font=None, workers: int = None,
+                 max_queue: int = 64, timeout: float = 120):
+        """
+        max_queue: 同時に受け付ける要求(待ちと実行中の合計)の上限。タイムアウトした要求も生成が終わるまで数える
+        timeout: 1件の生成を待つ秒数
+        """
+        self.workers = workers or os.cpu_count()
+        self.max_queue = max_queue
+        self.timeout = timeout
+        # fork で起動するワーカーは、親プロセスで読み込んだフォントを共有できる
+        prewarm([(font, path_to_font)])
+        self._executor = ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                             initargs=(font, path_to_font, multiprocessing.Barrier(self.workers)))
+        self._slots = threading.BoundedSemaphore(max_queue)
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.render_seconds = 0.0
+
+    def warm_up(self):
+        """
+        すべてのワーカーを起動し、初期化を済ませる
+        """
+        futures = [self._executor.submit(_warm_up, self.timeout) for _ in range(self.workers)]
+        return sorted(future.result() for future in futures)
+
+    def render(self, spec: dict):
+        """
+        戻り値: _render と同じ。受け付けられない場合は None
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            return None
+        with self._lock:
+            self.pending += 1
+        try:
+            future = self._executor.submit(_render, spec)
+        except BaseException:
+            self._release()
+            raise
+        # 枠は要求を待つのをやめても、生成が実際に終わる(または取り消される)まで解放しない
+        future.add_done_callback(self._release)
+        try:
+            result = future.result(self.timeout)
+        except Exception:
+            # タイムアウトの場合、まだ始まっていなければ取り消す
+            future.cancel()
+            with self._lock:
+                self.failed += 1
+            raise
+        with self._lock:
+            self.completed += 1
+            self.render_seconds += result[1]
+        return result
+
+    def _release(self, future=None):
+        with self._lock:
+            self.pending -= 1
+        self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                'pending': self.pending,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'render_seconds': self.render_seconds,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path != '/stats':
+            self._send_json(404, {'error': 'not found'})
+            return
+        self._send_json(200, self.server.service.stats())
+
+    def do_POST(self):
+        if self.path != '/render':
+            self._send_json(404, {'error': 'not found'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            spec = json.loads(self.rfile.read(length))
+        except ValueError as e:
+            self._send_json(400, {'error': str(e)})
+            return
+        try:
+            result = self.server.service.render(spec)
+        except TimeoutError:
+            self._send_json(504, {'error': 'rendering timed out'})
+            return
+        except Exception:
+            self._send_json(500, {'error': traceback.format_exc()})
+            return
+        if result is None:
+            self._send_json(503, {'error': 'render queue is full'}, {'Retry-After': '1'})
+            return
+        output, seconds = result
+        if isinstance(output, str):
+            self._send_json(200, {'path': output, 'seconds': seconds})
+            return
+        self._send(200, 'application/pdf', output, {'X-Render-Seconds': f'{seconds:.6f}'})
+
+    def _send_json(self, status: int, body: dict, headers: dict = None):
+        self._send(status, 'application/json', json.dumps(body, ensure_ascii=False).encode('utf-8'), headers)
+
+    def _send(self, status: int, content_type: str, body: bytes, headers: dict = None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # Unix ソケットでは接続元のアドレスが無い
+        if isinstance(self.client_address, tuple):
+            return self.client_address[0]
+        return 'unix'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+
+class UnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+        UnixStreamServer.server_bind(self)
+        # HTTPServer と同じ属性
+        self.server_name = 'localhost'
+        self.server_port = 0
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def create_server(service: RenderService, port: int = None, host: str = '127.0.0.1',
+                  unix_socket: str = None, verbose: bool = False):
+    """
+    unix_socket を指定した場合は Unix ソケット、そうでなければ host:port で待ち受けるサーバーを作る
+    """
+    if unix_socket:
+        server = UnixHTTPServer(unix_socket, RenderRequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), RenderRequestHandler)
+    server.service = service
+    server.verbose = verbose
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='文書の仕様を受け取って PDF を生成する常駐サーバー')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix-socket', default=None, help='指定すると TCP の代わりに Unix ソケットで待ち受ける')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--max-queue', type=int, default=64)
+    parser.add_argument('--timeout', type=float, default=120)
+    parser.add_argument('--font', default='HeiseiMin-W3')
+    parser.add_argument('--path-to-font', default=None)
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    service = RenderService(args.font, args.path_to_font, args.workers, args.max_queue, args.timeout)
+    pids = service.warm_up()
+    server = create_server(service, args.port, args.host, args.unix_socket, args.verbose)
+    print(f'listening on {args.unix_socket or f"{args.host}:{args.port}"} with workers {pids}', flush=True)
+    # SIGTERM でも KeyboardInterrupt と同じく終了処理を行い、ワーカープロセスを残さない
+    signal.signal(signal.SIGTERM, _interrupt)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+        if args.unix_socket and os.path.exists(args.unix_socket):
+            os.remove(args.unix_socket)
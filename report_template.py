@@ -0,0 +1,209 @@
+"""
+差し込み印刷用の、固定部分を組み立て済みのテンプレート。
+
+表紙、スタイル、固定の章が同じで、数か所の本文や表だけが異なる文書を大量に作る場合に使う。
+
+    pg = PaperGenerator()
+    pg.set_title('月次報告')
+    pg.add_chapter('概要', 0)
+    pg.add_sentence('固定の本文')
+    pg.add_slot('summary')              # 文書ごとに内容を差し込む位置
+    pg.add_chapter('明細', 0)
+    pg.add_slot('details')
+    template = pg.compile_template()
+
+    template.render({'summary': '今月の売上は…',
+                     'details': [['add_table', rows, '明細'], ['add_sentence', '備考']]}, 'out/0001.pdf')
+
+compile_template の時点で固定部分(表紙、本文のノード、引用文献)の flowable を1回だけ作る。
+段落の行分割の結果はフレームの幅ごとに覚えておき、文書をまたいで再利用する。
+各文書の本文は1回だけレイアウトし(set_single_pass と同じ)、目次のページ番号は後から書き込む。
+
+差し込める内容は add_sentence、add_table、add_image に限る(章の構成は変えない)。
+差し込んだ図・表より後にある固定の図・表は、番号がずれる場合だけ flowable を作り直す。
+"""
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+import time
+import traceback
+
+from reportlab.platypus import Paragraph, Table
+
+from batch_generator import BatchResult
+from document_model import Document, SlotNode, SentenceNode, ImageNode, TableNode, PlotNode, ChapterNode
+from table_formatter import to_columns
+
+# ワーカープロセスが fork で引き継ぐテンプレート
+_worker_template = None
+
+
+class StaticParagraph(Paragraph):
+    """
+    テンプレートの固定部分の段落。行分割の結果をフレームの幅ごとに覚えておき、文書をまたいで再利用する
+    """
+    def wrap(self, availWidth, availHeight):
+        layouts = self.__dict__.setdefault('_layouts', {})
+        layout = layouts.get(availWidth)
+        if layout is None:
+            width, height = Paragraph.wrap(self, availWidth, availHeight)
+            if not hasattr(self, 'blPara'):
+                # フレームの幅が狭すぎて組めない場合
+                return width, height
+            layout = layouts[availWidth] = (self._wrapWidths, self.blPara, self.height)
+        self.width = availWidth
+        self._wrapWidths, self.blPara, self.height = layout
+        return self.width, self.height
+
+
+def _freeze(flowable):
+    """
+    段落(表のセルの段落を含む)を StaticParagraph にする
+    """
+    if type(flowable) is Paragraph:
+        return StaticParagraph(None, flowable.style, flowable.bulletText, frags=flowable.frags)
+    if isinstance(flowable, Table):
+        for row in flowable._cellvalues:
+            for i, value in enumerate(row):
+                row[i] = [_freeze(v) for v in value] if isinstance(value, list) else _freeze(value)
+    return flowable
+
+
+def _slot_nodes(name: str, content):
+    """
+    スロットの内容を本文のノードのリストにする。図・表の番号は ReportTemplate.fill で付ける
+    """
+    if isinstance(content, str):
+        content = [content]
+    nodes = []
+    for call in content:
+        if isinstance(call, str):
+            call = ['add_sentence', call]
+        method, args = call[0], call[1:]
+        if method == 'add_sentence':
+            nodes.append(SentenceNode(*args))
+        elif method == 'add_image':
+            nodes.append(ImageNode(*args, 0))
+        elif method == 'add_table':
+            data, title = args
+            columns = to_columns(data)
+            if columns:
+                nodes.append(TableNode(columns, title, 0))
+        else:
+            raise ValueError(f'{method} is not supported in slot {name}.')
+    return nodes
+
+
+def _render_record(job):
+    index, values, path = job
+    start = time.perf_counter()
+    error = None
+    try:
+        _worker_template.render(values, path)
+    except Exception:
+        error = traceback.format_exc()
+    return BatchResult(index, path, time.perf_counter() - start, error)
+
+
+class ReportTemplate:
+    def __init__(self, generator):
+        """
+        generator: 固定部分と add_slot の位置を追加した PaperGenerator。
+                   テンプレートは生成器の設定(フォント、スタイル、段組など)を引き継ぎ、生成器を使って組む
+        """
+        self._generator = generator
+        self._document = generator.get_document()
+        self._nodes = list(self._document.contents())
+        self.slots = [node.name for node in self._nodes if isinstance(node, SlotNode)]
+        for name in self.slots:
+            if self.slots.count(name) > 1:
+                raise ValueError(f'Slot {name} is added more than once.')
+
+        # {'title' / 'references' / id(ノード): flowable のリスト}
+        static = {
+            'title': [_freeze(f) for f in generator._add_title([])],
+            'references': [_freeze(f) for f in generator._add_reference([])],
+        }
+        for node in self._nodes:
+            if isinstance(node, SlotNode):
+                continue
+            flowables = generator._create_flowables(node)
+            if not isinstance(node, ChapterNode):
+                # 見出しは目次に登録するため Paragraph のまま使う
+                flowables = [_freeze(f) for f in flowables]
+            static[id(node)] = flowables
+        self._static_flowables = static
+        self._toc_page_counts = {}
+
+    def fill(self, values: dict):
+        """
+        values を差し込んだ Document。values に無いスロットは空にする
+        """
+        unknown = set(values).difference(self.slots)
+        if unknown:
+            raise ValueError(f'{", ".join(sorted(unknown))} is not a slot of the template.')
+        source = self._document
+        document = Document(source.title, source.abstract)
+        document.sub_title = source.sub_title
+        document.double_column = source.double_column
+        document.authors = source.authors
+        document.refs = source.refs
+        document.headings = source.headings
+        images = tables = 0
+        for node in self._nodes:
+            if isinstance(node, SlotNode):
+                nodes = _slot_nodes(node.name, values.get(node.name, ()))
+            else:
+                nodes = [node]
+            for node in nodes:
+                if isinstance(node, ImageNode):
+                    images += 1
+                    if node.index != images:
+                        node = ImageNode(node.path, node.title, images)
+                    document.images.setdefault(node.title, node.index)
+                elif isinstance(node, PlotNode):
+                    # グラフは図と同じ番号の列
+                    images += 1
+                    if node.index != images:
+                        node = PlotNode(node.kind, node.series, node.labels, node.title, images)
+                    document.images.setdefault(node.title, node.index)
+                elif isinstance(node, TableNode):
+                    tables += 1
+                    if node.index != tables:
+                        node = TableNode(node.columns, node.title, tables, node.texts)
+                    document.tables.setdefault(node.title, node.index)
+                document._append(node)
+        return document
+
+    def render(self, values: dict, path=None):
+        """
+        values: {スロット名: 内容}。内容は本文の文字列、または
+                [['add_sentence', 本文], ['add_table', data, 題名], ['add_image', パス, 題名]] のような呼び出しのリスト
+        path: PaperGenerator.run と同じ
+        """
+        generator = self._generator
+        with generator._filling_template(self.fill(values), self._static_flowables, self._toc_page_counts):
+            return generator.run(path)
+
+    def render_batch(self, records, path_format: str = None, workers: int = None):
+        """
+        records の各 values を組み、入力と同じ順に BatchResult を返すイテレータ。
+        path_format: 出力先のパスの書式(例: 'out/report_{index:05d}.pdf')。None の場合は出力しない(計測用)
+        workers: ワーカープロセスの数。省略した場合は CPU 数。ワーカーは fork でテンプレートを引き継ぐ
+        """
+        global _worker_template
+        jobs = ((index, values, path_format.format(index=index) if path_format else None)
+                for index, values in enumerate(records))
+        workers = workers or os.cpu_count() or 1
+        if workers > 1 and 'fork' not in multiprocessing.get_all_start_methods():
+            print('Templates are rendered serially because fork is not available.')
+            workers = 1
+        _worker_template = self
+        try:
+            if workers <= 1:
+                yield from map(_render_record, jobs)
+                return
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as executor:
+                yield from executor.map(_render_record, jobs, chunksize=16)
+        finally:
+            _worker_template = None
@@ -88,3 +88,63 @@ def generate_sample(pg: PaperGeneratorInterface, path: str):
     pg.run(path)
 
 
+
+def generate_scaled_sample(pg: PaperGeneratorInterface, path: str,
+                           chapters: int = 3, depth: int = 3, paragraphs: int = 10,
+                           table_rows: int = 3, table_columns: int = 3,
+                           images: int = 1, refs: int = 3, double_column: bool = True,
+                           image_path: str = './image/sample.jpg'):
+    """
+    generate_sample と同じ内容の文書を、大きさを指定して生成する。
+    chapters: 最上位の章の数
+    depth: 各章の中の見出しの深さ(1なら章のみ)
+    paragraphs: 見出しごとの段落数
+    table_rows, table_columns: 各章に入れる表の行数(見出しを除く)と列数。0なら表を入れない
+    images: 文書全体の画像の数(先頭の章から順に1枚ずつ入れる)
+    refs: 参考文献の数
+    """
+    pg.set_title('論文タイトル：PythonによるPDF論文自動生成')
+    pg.set_sub_title('サブタイトル')
+    pg.set_abstract(
+        "ここに論文の概要(Abstract)を記載します。"
+        "この部分は1段組みで小さな文字サイズです。"
+        "ReportLabを用いてタイトルページから本文、引用文献まで自動生成する手法を示します。")
+
+    for c in range(chapters):
+        for rank in range(depth):
+            pg.add_chapter(f"チャプター{c + 1}" + "A" * rank, rank)
+            for i in range(paragraphs):
+                pg.add_sentence(
+                    f"{i+1}段落目：これは2段組み本文のサンプルテキストです。"
+                    "論文本文として長い文章が続くことを想定しています。"
+                    "----------------------------------------------"
+                    "----------------------------------------------"
+                    "----------------------------------------------")
+        if c < images:
+            pg.add_image(image_path, f'サンプル画像{c + 1}')
+        if table_rows > 0 and table_columns > 0:
+            data = [[f"列{j + 1}" for j in range(table_columns)]]
+            for r in range(table_rows):
+                row = []
+                for j in range(table_columns):
+                    if j % 3 == 0:
+                        row.append(round((r + 1) * 1.25 / (j + 1), 2))
+                    elif j % 3 == 1:
+                        row.append((r + 1) * 100 + j)
+                    else:
+                        row.append(f"説明{r + 1}")
+                data.append(row)
+            pg.add_table(data, f'表サンプル{c + 1}')
+    # 画像の数が章の数より多い場合は最後の章に追加する
+    for i in range(chapters, images):
+        pg.add_image(image_path, f'サンプル画像{i + 1}')
+
+    for i in range(refs):
+        pg.add_ref(f"Author {i + 1}", f"Sample Reference {i + 1}", 2000 + i % 26)
+
+    pg.add_author('azarashin', 'pit-creation')
+    pg.add_author('azarashinX', 'pnc')
+
+    pg.set_double_column(double_column)
+
+    pg.run(path)
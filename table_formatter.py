@@ -0,0 +1,168 @@
+"""
+表の数値を列単位でまとめて整形する。
+
+セルごとに str → Decimal 変換と Decimal.quantize を行うと、大きな表では遅い。
+ここでは列ごとに小数桁数を求め、同じ桁数の書式で一括して文字列化する。
+結果はセルごとの Decimal による整形と一致する。
+Decimal の精度(28桁)を超えるような値や NaN などは従来どおり Decimal で整形する。
+"""
+from decimal import Decimal, InvalidOperation
+import sys
+
+# NumPy の配列は NumPy を読み込んだ呼び出し元からしか渡されないため、ここでは読み込まない
+numpy = None
+
+# Decimal.quantize が桁あふれしない範囲
+_DECIMAL_DIGITS = 27
+
+
+def to_columns(data):
+    """
+    表のデータを [(見出し, 値の列)] に変換する。
+    data: 1行目を見出しとする行のリスト、列名→値の列の dict、
+          または名前付きフィールドを持つ NumPy の構造化配列
+    """
+    if isinstance(data, dict):
+        return [(header, _to_sequence(values)) for header, values in data.items()]
+    if _is_array(data):
+        if data.dtype.names is None:
+            raise ValueError('NumPy array needs field names to be used as a table.')
+        return [(name, data[name]) for name in data.dtype.names]
+    if len(data) == 0:
+        return []
+    return [(column[0], list(column[1:])) for column in zip(*data)]
+
+
+def _is_array(values):
+    global numpy
+    if numpy is None:
+        numpy = sys.modules.get('numpy')
+    return numpy is not None and isinstance(values, numpy.ndarray)
+
+
+def _to_sequence(values):
+    if _is_array(values):
+        return values
+    return list(values)
+
+
+def get_scale(values):
+    """
+    列の値のうち、小数部の桁数が最大のものの桁数を返す。
+    各値を str で文字列化し、Decimal にしたときの小数部の桁数で数える。
+    """
+    if _is_array(values):
+        if values.dtype.kind in 'iu':
+            return 0
+        if values.dtype.kind == 'f':
+            return _get_float_array_scale(values.astype(numpy.float64))
+        values = values.tolist()
+    scale = 0
+    for v in values:
+        t = type(v)
+        if t is int:
+            continue
+        if t is float:
+            s = repr(v)
+            if 'e' not in s and 'n' not in s:
+                frac = len(s) - s.index('.') - 1
+                if frac > scale:
+                    scale = frac
+                continue
+        frac = _get_decimal_scale(v)
+        if frac > scale:
+            scale = frac
+    return scale
+
+
+def format_column(values, scale: int):
+    """
+    数値を小数部 scale 桁の文字列にした列を返す。数値でないセルは None になる。
+    """
+    if _is_array(values):
+        if values.dtype.kind in 'iu':
+            if scale == 0:
+                return values.astype(str).tolist()
+            values = values.tolist()
+        elif values.dtype.kind == 'f':
+            return _format_float_array(values.astype(numpy.float64), scale)
+        else:
+            values = values.tolist()
+
+    quant = Decimal(1).scaleb(-scale)
+    zeros = '.' + '0' * scale if scale > 0 else ''
+    limit = 10.0 ** (_DECIMAL_DIGITS - scale)
+    spec = f'.{scale}f'
+    result = []
+    append = result.append
+    for v in values:
+        t = type(v)
+        if t is int:
+            if scale == 0:
+                append(str(v))
+            elif -limit < v < limit:
+                append(f'{v}{zeros}')
+            else:
+                append(f'{Decimal(v).quantize(quant):f}')
+        elif t is float:
+            if -limit < v < limit:
+                append(format(v, spec))
+            else:
+                # NaN, 無限大、桁数の大きい値
+                append(f'{Decimal(v).quantize(quant):f}')
+        else:
+            append(None)
+    return result
+
+
+def _get_decimal_scale(value):
+    try:
+        d = Decimal(str(value))
+    except InvalidOperation:
+        return 0
+    if not d.is_finite():
+        return 0
+    exponent = d.as_tuple().exponent
+    return -exponent if exponent < 0 else 0
+
+
+def _get_float_array_scale(values):
+    values = values[numpy.isfinite(values)]
+    if values.size == 0:
+        return 0
+    magnitude = numpy.abs(values)
+    # repr が指数表記にならない値は、小数部が最低1桁になる(例: '12.0')
+    positional = ((magnitude >= 1e-4) & (magnitude < 1e16)) | (magnitude == 0)
+    scale = 1 if positional.any() else 0
+    # 小数部 k 桁の10進数で表せる(丸めて戻すと同じ値になる)最小の k が repr の小数部の桁数。
+    # x * 10**k が 2**52 未満なら numpy.round による判定は正確になる。
+    pending = values
+    rest = []
+    for k in range(23):
+        if pending.size == 0:
+            break
+        safe = numpy.abs(pending) * 10.0 ** k < 2.0 ** 52
+        rest.extend(pending[~safe].tolist())
+        pending = pending[safe]
+        resolved = numpy.round(pending, k) == pending
+        if resolved.any() and k > scale:
+            scale = k
+        pending = pending[~resolved]
+    rest.extend(pending.tolist())
+    for v in rest:
+        frac = _get_decimal_scale(repr(v))
+        if frac > scale:
+            scale = frac
+    return scale
+
+
+def _format_float_array(values, scale: int):
+    limit = 10.0 ** (_DECIMAL_DIGITS - scale)
+    spec = f'.{scale}f'
+    texts = [format(v, spec) for v in values.tolist()]
+    outliers = numpy.flatnonzero(~(numpy.abs(values) < limit))
+    if outliers.size:
+        quant = Decimal(1).scaleb(-scale)
+        for i in outliers.tolist():
+            texts[i] = f'{Decimal(float(values[i])).quantize(quant):f}'
+    return texts